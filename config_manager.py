@@ -175,6 +175,9 @@ class ConfigManager:
         self.game_config = self._load_config_with_default(config_dir / "game_config.json", {})
         
         self._pill_names_cache = None
+        self._build_level_cache()
+        self._build_technique_index()
+        self._build_breakthrough_pill_index()
 
         logger.info(
             f"配置管理器初始化完成，"
@@ -264,12 +267,16 @@ class ConfigManager:
         if name in self.techniques_data:
             return self.techniques_data[name]
         
-        # 然后遍历查找name字段匹配的
-        for tech_id, tech_config in self.techniques_data.items():
-            if tech_config.get("name") == name:
-                return tech_config
-        
-        return None
+        # 然后按name字段索引查找
+        return self._technique_by_name.get(name)
+
+    def _build_technique_index(self):
+        """构建功法名称索引（name -> 配置），同名时保留第一个"""
+        self._technique_by_name = {}
+        for tech_config in self.techniques_data.values():
+            tech_name = tech_config.get("name")
+            if tech_name and tech_name not in self._technique_by_name:
+                self._technique_by_name[tech_name] = tech_config
     
     def get_all_techniques(self) -> Dict[str, dict]:
         """获取所有功法配置
@@ -300,6 +307,47 @@ class ConfigManager:
             result[str(i)] = level
         return result
     
+    def _build_level_cache(self):
+        """预计算各境界的名称与突破所需修为（按修炼类型）"""
+        self._level_cache = {}
+        for cultivation_type, level_data in (("灵修", self.level_data), ("体修", self.body_level_data)):
+            names = tuple(level.get("level_name", "未知境界") for level in level_data)
+            required_exps = tuple(
+                level_data[i + 1].get("exp_needed", 0) if i + 1 < len(level_data) else 0
+                for i in range(len(level_data))
+            )
+            self._level_cache[cultivation_type] = (names, required_exps)
+
+    def get_level_name(self, level_index: int, cultivation_type: str = "灵修") -> str:
+        """获取境界名称
+
+        Args:
+            level_index: 境界索引
+            cultivation_type: 修炼类型
+
+        Returns:
+            境界名称，索引越界时返回"未知境界"
+        """
+        names, _ = self._level_cache["体修" if cultivation_type == "体修" else "灵修"]
+        if 0 <= level_index < len(names):
+            return names[level_index]
+        return "未知境界"
+
+    def get_required_exp(self, level_index: int, cultivation_type: str = "灵修") -> int:
+        """获取突破到下一境界所需的总修为
+
+        Args:
+            level_index: 境界索引
+            cultivation_type: 修炼类型
+
+        Returns:
+            所需修为，已是最高境界时返回0
+        """
+        _, required_exps = self._level_cache["体修" if cultivation_type == "体修" else "灵修"]
+        if 0 <= level_index < len(required_exps):
+            return required_exps[level_index]
+        return 0
+
     def get_body_level_config(self) -> Dict[str, dict]:
         """获取体修境界配置（字典格式，key为level_index字符串）
         
@@ -315,19 +363,20 @@ class ConfigManager:
     
     def is_pill(self, item_name: str) -> bool:
         """检查物品是否为丹药类型（统一的丹药判断方法）"""
-        if item_name in self.pills_data:
-            return True
-        if item_name in self.exp_pills_data:
-            return True
-        if item_name in self.utility_pills_data:
-            return True
-        
-        item_config = self.items_data.get(item_name)
-        if item_config and item_config.get("type") == "丹药":
-            return True
-        
-        return False
+        # 丹药名称集合已合并各丹药配置及 type 为“丹药”的物品，单次哈希查找
+        return item_name in self.get_all_pill_names()
     
+    def _build_breakthrough_pill_index(self):
+        """预先筛选出破境丹（subtype为breakthrough），key为丹药名称"""
+        self._breakthrough_pills = {
+            name: pill for name, pill in self.pills_data.items()
+            if pill.get("subtype") == "breakthrough"
+        }
+
+    def get_breakthrough_pill(self, pill_name: str) -> Optional[dict]:
+        """获取破境丹配置，非破境丹返回None"""
+        return self._breakthrough_pills.get(pill_name)
+
     def get_all_pill_names(self) -> set:
         """获取所有注册的丹药名称"""
         if self._pill_names_cache is not None:
@@ -348,3 +397,6 @@ class ConfigManager:
     def invalidate_cache(self):
         """清除缓存，在配置重载时调用"""
         self._pill_names_cache = None
+        self._build_level_cache()
+        self._build_technique_index()
+        self._build_breakthrough_pill_index()
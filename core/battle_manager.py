@@ -1088,12 +1088,14 @@ class BattleManager:
                 del stats.skill_cooldowns[skill_id]
     
     def generate_battle_summary(self, battle_result: dict, 
-                                include_full_log: bool = False) -> str:
+                                include_full_log: bool = False,
+                                footer: Optional[str] = None) -> str:
         """生成战斗摘要
         
         Args:
             battle_result: execute_battle的返回结果
             include_full_log: 是否包含完整战斗日志
+            footer: 附加在摘要之后（空一行）的文本，与摘要一次拼接完成
         
         Returns:
             格式化的战斗摘要文本
@@ -1126,4 +1128,8 @@ class BattleManager:
             lines.append("━━━ 战斗日志 ━━━")
             lines.extend(battle_result["log"])
         
+        if footer is not None:
+            lines.append("")
+            lines.append(footer)
+        
         return "\n".join(lines)
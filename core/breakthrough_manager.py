@@ -86,8 +86,8 @@ class BreakthroughManager:
 
         # 如果使用了破境丹
         if pill_name:
-            pill_data = self.config_manager.pills_data.get(pill_name)
-            if pill_data and pill_data.get("subtype") == "breakthrough":
+            pill_data = self.config_manager.get_breakthrough_pill(pill_name)
+            if pill_data:
                 breakthrough_bonus = pill_data.get("breakthrough_bonus", 0)
                 max_rate = pill_data.get("max_success_rate", 1.0)
 
@@ -6,6 +6,12 @@ from astrbot.api import AstrBotConfig, logger
 from ..config_manager import ConfigManager
 from ..models import Player
 
+
+def _calc_exp_kernel(minutes: int, base_exp: float, root_speed: float, technique_bonus: float, pill_bonus: float) -> int:
+    """闭关修为计算核心：基础修为 * 时长 * 灵根倍率 * (1 + 心法倍率) * 丹药倍率"""
+    return int(base_exp * minutes * (root_speed * (1.0 + technique_bonus) * pill_bonus))
+
+
 class CultivationManager:
     """修炼管理器，包含角色生成和闭关修炼功能"""
 
@@ -370,11 +376,8 @@ class CultivationManager:
         if pill_multipliers:
             cultivation_pill_bonus = pill_multipliers.get("cultivation_speed", 1.0)
 
-        # 计算总修为倍率：灵根倍率 * (1 + 心法倍率) * 丹药倍率
-        total_multiplier = root_speed * (1.0 + technique_bonus) * cultivation_pill_bonus
-
         # 计算总修为：基础修为 * 时长 * 总倍率
-        total_exp = int(base_exp * minutes * total_multiplier)
+        total_exp = _calc_exp_kernel(minutes, base_exp, root_speed, technique_bonus, cultivation_pill_bonus)
 
         logger.info(
             f"玩家 {player.user_id} 闭关 {minutes} 分钟，"
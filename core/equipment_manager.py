@@ -8,6 +8,20 @@ if TYPE_CHECKING:
     from ..config_manager import ConfigManager
     from .storage_ring_manager import StorageRingManager
 
+# 单件装备槽：物品类型 -> (玩家属性, 槽位名称, 替换时的槽位前缀)
+_EQUIP_SLOTS = {
+    "weapon": ("weapon", "武器", ""),
+    "armor": ("armor", "防具", ""),
+    "main_technique": ("main_technique", "主修心法", "主修心法"),
+}
+
+# 卸下命令中的槽位别名 -> 物品类型
+_UNEQUIP_SLOT_ALIASES = {
+    "武器": "weapon", "weapon": "weapon",
+    "防具": "armor", "armor": "armor",
+    "主修心法": "main_technique", "心法": "main_technique", "main_technique": "main_technique",
+}
+
 class EquipmentManager:
     """装备管理器 - 处理装备的穿戴、卸下和属性计算"""
 
@@ -140,6 +154,22 @@ class EquipmentManager:
 
         return equipped
 
+    def get_equipped_items_by_type(self, player: Player, items_data: dict, weapons_data: dict = None) -> Dict[str, Item]:
+        """获取玩家已装备物品，按装备类型索引（同类型保留最先装备的一件）
+
+        Args:
+            player: 玩家对象
+            items_data: 物品配置数据字典
+            weapons_data: 武器配置数据字典（可选）
+
+        Returns:
+            {item_type: Item} 字典
+        """
+        equipped_by_type: Dict[str, Item] = {}
+        for item in self.get_equipped_items(player, items_data, weapons_data):
+            equipped_by_type.setdefault(item.item_type, item)
+        return equipped_by_type
+
     def check_equipment_level_requirement(self, player: Player, item: Item) -> tuple[bool, str]:
         """检查玩家是否满足装备的境界要求
 
@@ -192,41 +222,20 @@ class EquipmentManager:
         if not can_equip:
             return False, error_msg
 
-        # 根据物品类型装备到相应位置
-        if item.item_type == "weapon":
-            old_item = player.weapon
-            player.weapon = item.name
-            await self.db.update_player(player)
-            if old_item:
-                # 尝试将旧装备存入储物戒
-                storage_msg = await self._store_old_equipment(player, old_item)
-                return True, f"已将【{old_item}】替换为【{item.name}】（{item.rank}）{storage_msg}"
-            else:
-                return True, f"已装备武器【{item.name}】（{item.rank}）"
-
-        elif item.item_type == "armor":
-            old_item = player.armor
-            player.armor = item.name
-            await self.db.update_player(player)
+        # 单件装备槽（武器/防具/主修心法）按类型查表装备
+        slot = _EQUIP_SLOTS.get(item.item_type)
+        if slot is not None:
+            attr, slot_name, replace_prefix = slot
+            old_item = getattr(player, attr)
+            setattr(player, attr, item.name)
+            await self._save_equipment(player)
             if old_item:
                 # 尝试将旧装备存入储物戒
                 storage_msg = await self._store_old_equipment(player, old_item)
-                return True, f"已将【{old_item}】替换为【{item.name}】（{item.rank}）{storage_msg}"
-            else:
-                return True, f"已装备防具【{item.name}】（{item.rank}）"
+                return True, f"已将{replace_prefix}【{old_item}】替换为【{item.name}】（{item.rank}）{storage_msg}"
+            return True, f"已装备{slot_name}【{item.name}】（{item.rank}）"
 
-        elif item.item_type == "main_technique":
-            old_item = player.main_technique
-            player.main_technique = item.name
-            await self.db.update_player(player)
-            if old_item:
-                # 尝试将旧心法存入储物戒
-                storage_msg = await self._store_old_equipment(player, old_item)
-                return True, f"已将主修心法【{old_item}】替换为【{item.name}】（{item.rank}）{storage_msg}"
-            else:
-                return True, f"已装备主修心法【{item.name}】（{item.rank}）"
-
-        elif item.item_type == "technique":
+        if item.item_type == "technique":
             techniques_list = player.get_techniques_list()
 
             # 检查是否已装备
@@ -240,12 +249,74 @@ class EquipmentManager:
             # 添加功法
             techniques_list.append(item.name)
             player.set_techniques_list(techniques_list)
-            await self.db.update_player(player)
+            await self._save_equipment(player)
             return True, f"已装备功法【{item.name}】（{item.rank}）（{len(techniques_list)}/3）"
 
         else:
             return False, f"未知的装备类型：{item.item_type}"
 
+    async def equip_from_storage_ring(self, player: Player, item: Item) -> tuple[bool, str]:
+        """从储物戒取出并装备物品（单槽位装备）
+
+        取出新装备、替换槽位、旧装备放回储物戒在同一事务内完成，只写库一次。
+
+        Args:
+            player: 玩家对象
+            item: 要装备的物品（类型须为武器/防具/主修心法）
+
+        Returns:
+            (是否成功, 消息)
+        """
+        slot = _EQUIP_SLOTS.get(item.item_type)
+        if slot is None:
+            return False, f"未知的装备类型：{item.item_type}"
+        attr, slot_name, replace_prefix = slot
+
+        can_equip, error_msg = self.check_equipment_level_requirement(player, item)
+        if not can_equip:
+            return False, error_msg
+
+        await self.db.conn.execute("BEGIN IMMEDIATE")
+        try:
+            player = await self.db.get_player_by_id(player.user_id)
+            if not player:
+                await self.db.conn.rollback()
+                return False, "玩家不存在或已被删除"
+
+            # 从储物戒取出新装备
+            items = player.get_storage_ring_items()
+            current_count = items.get(item.name, 0)
+            if current_count < 1:
+                await self.db.conn.rollback()
+                return False, f"储物戒中没有【{item.name}】"
+            if current_count > 1:
+                items[item.name] = current_count - 1
+            else:
+                del items[item.name]
+            player.set_storage_ring_items(items)
+
+            # 替换槽位，旧装备放回储物戒（与新装备一起写库）
+            old_item = getattr(player, attr)
+            setattr(player, attr, item.name)
+            storage_msg = ""
+            if old_item and self.storage_ring_manager:
+                stored, msg = await self.storage_ring_manager.store_item(
+                    player, old_item, 1, silent=True, external_transaction=True
+                )
+                if stored:
+                    storage_msg = f"\n旧装备【{old_item}】已存入储物戒"
+                else:
+                    storage_msg = f"\n⚠️ 旧装备【{old_item}】存入储物戒失败：{msg}"
+
+            await self.db.update_player(player)
+        except Exception:
+            await self.db.conn.rollback()
+            raise
+
+        if old_item:
+            return True, f"已将{replace_prefix}【{old_item}】替换为【{item.name}】（{item.rank}）{storage_msg}"
+        return True, f"已装备{slot_name}【{item.name}】（{item.rank}）"
+
     async def unequip_item(self, player: Player, slot_or_name: str) -> tuple[bool, str]:
         """卸下装备
 
@@ -257,40 +328,32 @@ class EquipmentManager:
             (是否成功, 消息)
         """
         # 尝试按槽位卸下
-        if slot_or_name in ["武器", "weapon"]:
-            if not player.weapon:
-                return False, "未装备武器"
-            item_name = player.weapon
-            player.weapon = ""
-            await self.db.update_player(player)
-            return True, f"已卸下武器【{item_name}】"
-
-        elif slot_or_name in ["防具", "armor"]:
-            if not player.armor:
-                return False, "未装备防具"
-            item_name = player.armor
-            player.armor = ""
-            await self.db.update_player(player)
-            return True, f"已卸下防具【{item_name}】"
-
-        elif slot_or_name in ["主修心法", "心法", "main_technique"]:
-            if not player.main_technique:
-                return False, "未装备主修心法"
-            item_name = player.main_technique
-            player.main_technique = ""
-            await self.db.update_player(player)
-            return True, f"已卸下主修心法【{item_name}】"
+        slot_type = _UNEQUIP_SLOT_ALIASES.get(slot_or_name)
+        if slot_type is not None:
+            attr, slot_name, _ = _EQUIP_SLOTS[slot_type]
+            item_name = getattr(player, attr)
+            if not item_name:
+                return False, f"未装备{slot_name}"
+            setattr(player, attr, "")
+            await self._save_equipment(player)
+            return True, f"已卸下{slot_name}【{item_name}】"
 
         # 尝试从功法列表中卸下（按名称）
         techniques_list = player.get_techniques_list()
         if slot_or_name in techniques_list:
             techniques_list.remove(slot_or_name)
             player.set_techniques_list(techniques_list)
-            await self.db.update_player(player)
+            await self._save_equipment(player)
             return True, f"已卸下功法【{slot_or_name}】"
 
         return False, f"未找到装备：{slot_or_name}"
 
+    async def _save_equipment(self, player: Player):
+        """只写回装备栏相关字段，避免整行更新"""
+        await self.db.ext.update_player_equipment(
+            player.user_id, player.weapon, player.armor, player.main_technique, player.techniques
+        )
+
     async def _store_old_equipment(self, player: Player, item_name: str) -> str:
         """尝试将旧装备存入储物戒
 
@@ -12,6 +12,13 @@ from ..config_manager import ConfigManager
 class PillManager:
     """丹药管理器 - 处理丹药效果、属性加成和限制机制"""
 
+    # 查看类指令结算丹药效果的最小间隔（秒）
+    EFFECT_CHECK_INTERVAL = 30
+    # 节流记录达到该条目数时，顺带清理已超过结算间隔的用户
+    _EFFECT_CHECK_PRUNE_THRESHOLD = 256
+    # user_id -> 上次结算丹药效果的时间戳；各处理器各自持有实例，节流记录在类上共享
+    _last_effect_check: Dict[str, int] = {}
+
     def __init__(self, db: DataBase, config_manager: ConfigManager):
         self.db = db
         self.config_manager = config_manager
@@ -86,6 +93,9 @@ class PillManager:
         Args:
             player: 玩家对象
         """
+        if not player.active_pill_effects or player.active_pill_effects == "[]":
+            return
+
         effects = player.get_active_pill_effects()
         current_time = int(time.time())
         updated_effects = []
@@ -106,6 +116,22 @@ class PillManager:
             player.set_active_pill_effects(updated_effects)
             await self.db.update_player(player)
 
+    async def update_temporary_effects_throttled(self, player: Player, now: int):
+        """结算临时丹药效果（查看类指令使用），同一用户在结算间隔内只结算一次
+
+        Args:
+            player: 玩家对象
+            now: 当前时间戳
+        """
+        checks = self._last_effect_check
+        if now - checks.get(player.user_id, 0) <= self.EFFECT_CHECK_INTERVAL:
+            return
+        await self.update_temporary_effects(player)
+        if len(checks) >= self._EFFECT_CHECK_PRUNE_THRESHOLD:
+            for user_id in [uid for uid, ts in checks.items() if now - ts > self.EFFECT_CHECK_INTERVAL]:
+                del checks[user_id]
+        checks[player.user_id] = now
+
     async def use_pill(
         self,
         player: Player,
@@ -1,5 +1,6 @@
 # core/shop_manager.py
 
+import heapq
 import random
 import time
 import json
@@ -15,6 +16,10 @@ class ShopManager:
     def __init__(self, config: AstrBotConfig, config_manager: ConfigManager):
         self.config = config
         self.config_manager = config_manager
+        # 阁楼候选物品列表缓存（配置为静态数据，只需构建一次）
+        self._display_cache: Dict[str, List[Dict]] = {}
+        # 可售物品名称索引（name -> 展示数据），首次查找时构建
+        self._item_name_index: Optional[Dict[str, Dict]] = None
 
     def _format_required_level(self, level_index: int) -> str:
         """同时展示灵修/体修的需求境界名称"""
@@ -33,6 +38,10 @@ class ShopManager:
 
     def _get_all_shop_items(self) -> List[Dict]:
         """获取所有可以在商店出售的物品"""
+        return self._get_cached_display("shop", self._build_all_shop_items)
+
+    def _build_all_shop_items(self) -> List[Dict]:
+        """构建商店可售物品列表"""
         all_items = []
 
         # 添加武器
@@ -102,38 +111,27 @@ class ShopManager:
 
         return all_items
 
+    @staticmethod
+    def weighted_sample(items: List, weights: List[float], count: int) -> List:
+        """按权重不放回抽样（A-Res 算法，一次遍历完成）
+
+        每个物品生成键 u^(1/w)，取键最大的 count 个，与逐个按权重抽取再移除的结果分布一致。
+        权重为0的物品只会在正权重物品被取完后才被随机选中。
+        """
+        keyed = []
+        for index, (item, weight) in enumerate(zip(items, weights)):
+            if weight > 0:
+                key = random.random() ** (1.0 / weight)
+            else:
+                key = -random.random()
+            keyed.append((key, index, item))
+        return [item for _, _, item in heapq.nlargest(count, keyed)]
+
     def _weighted_random_choice(self, items: List[Dict], count: int) -> List[Dict]:
         """基于权重的随机选择（不重复）"""
         if len(items) <= count:
             return items.copy()
-
-        selected = []
-        available_items = items.copy()
-
-        for _ in range(count):
-            if not available_items:
-                break
-
-            # 计算总权重
-            total_weight = sum(item['weight'] for item in available_items)
-            if total_weight == 0:
-                # 如果所有权重都是0，则随机选择
-                choice = random.choice(available_items)
-            else:
-                # 基于权重选择
-                rand = random.uniform(0, total_weight)
-                cumulative = 0
-                choice = available_items[0]
-                for item in available_items:
-                    cumulative += item['weight']
-                    if rand <= cumulative:
-                        choice = item
-                        break
-
-            selected.append(choice)
-            available_items.remove(choice)
-
-        return selected
+        return self.weighted_sample(items, [item['weight'] for item in items], count)
 
     def _calculate_stock(self, weight: int) -> int:
         """根据权重计算库存数量
@@ -224,26 +222,31 @@ class ShopManager:
 
         return shop_items
 
-    def should_refresh_shop(self, last_refresh_time: int, refresh_hours: int = None) -> bool:
-        """检查是否需要刷新"""
+    def should_refresh_shop(self, last_refresh_time: int, refresh_hours: int = None, now: int = None) -> bool:
+        """检查是否需要刷新（now 为调用方已取得的当前时间戳，缺省时自动获取）"""
         if refresh_hours is None:
             refresh_hours = self.config.get("SHOP_REFRESH_HOURS", 6)
         if refresh_hours <= 0:
             return False
-        return (int(time.time()) - last_refresh_time) >= (refresh_hours * 3600)
+        if now is None:
+            now = int(time.time())
+        return (now - last_refresh_time) >= (refresh_hours * 3600)
 
     def generate_pavilion_items(self, item_getter, count: int) -> List[Dict]:
         """生成阁楼物品列表（带库存和折扣）"""
         base_items = item_getter(count * 2)  # 获取更多以便随机选择
-        selected = self._weighted_random_choice(
-            [{'weight': i.get('data', {}).get('shop_weight', 100), **i} for i in base_items], count
-        )
+        # 只取出权重列表参与抽样，不再为每个候选物品复制一份带权重的字典
+        weights = [i.get('data', {}).get('shop_weight', 100) for i in base_items]
+        if len(base_items) <= count:
+            selected = list(zip(base_items, weights))
+        else:
+            selected = self.weighted_sample(list(zip(base_items, weights)), weights, count)
         discount_min = self.config.get("SHOP_DISCOUNT_MIN", 0.8)
         discount_max = self.config.get("SHOP_DISCOUNT_MAX", 1.2)
         result = []
-        for item in selected:
+        for item, weight in selected:
             discount = random.uniform(discount_min, discount_max)
-            stock = self._calculate_stock(item.get('weight', 100))
+            stock = self._calculate_stock(weight)
             result.append({
                 'name': item['name'], 'type': item['type'], 'rank': item['rank'],
                 'original_price': item['price'], 'discount': discount,
@@ -251,8 +254,20 @@ class ShopManager:
             })
         return result
 
+    def _get_cached_display(self, key: str, builder) -> List[Dict]:
+        """获取缓存的阁楼候选列表，首次访问时构建（返回值只读，不可修改）"""
+        cached = self._display_cache.get(key)
+        if cached is None:
+            cached = builder()
+            self._display_cache[key] = cached
+        return cached
+
     def get_pills_for_display(self, count: int) -> List[Dict]:
         """获取丹药列表用于丹阁展示"""
+        return self._get_cached_display("pill", self._build_pills_for_display)
+
+    def _build_pills_for_display(self) -> List[Dict]:
+        """构建丹阁候选丹药列表"""
         all_pills = []
         for pill in self.config_manager.pills_data.values():
             if pill.get('price', 0) > 0:
@@ -267,6 +282,10 @@ class ShopManager:
 
     def get_weapons_for_display(self, count: int) -> List[Dict]:
         """获取武器列表用于器阁展示"""
+        return self._get_cached_display("weapon", self._build_weapons_for_display)
+
+    def _build_weapons_for_display(self) -> List[Dict]:
+        """构建器阁候选武器列表"""
         all_weapons = []
         for weapon in self.config_manager.weapons_data.values():
             if weapon.get('price', 0) > 0:
@@ -275,6 +294,10 @@ class ShopManager:
 
     def get_all_items_for_display(self, count: int) -> List[Dict]:
         """获取所有物品用于百宝阁展示"""
+        return self._get_cached_display("all", self._build_all_items_for_display)
+
+    def _build_all_items_for_display(self) -> List[Dict]:
+        """构建百宝阁候选物品列表"""
         all_items = []
         for weapon in self.config_manager.weapons_data.values():
             if weapon.get('price', 0) > 0:
@@ -334,27 +357,15 @@ class ShopManager:
         return original_type
 
     def find_item_by_name(self, name: str) -> Optional[Dict]:
-        """根据名称查找物品"""
-        for weapon in self.config_manager.weapons_data.values():
-            if weapon['name'] == name and weapon.get('price', 0) > 0:
-                return {'name': weapon['name'], 'type': 'weapon', 'price': weapon['price'], 'rank': weapon.get('rank', '凡品'), 'data': weapon}
-        for item in self.config_manager.items_data.values():
-            if item['name'] == name and item.get('price', 0) > 0:
-                # 映射旧格式类型到新格式
-                item_type = self._map_legacy_item_type(item)
-                return {'name': item['name'], 'type': item_type, 'price': item['price'], 'rank': item.get('rank', '凡品'), 'data': item}
-        for pill in self.config_manager.pills_data.values():
-            if pill['name'] == name and pill.get('price', 0) > 0:
-                return {'name': pill['name'], 'type': 'pill', 'price': pill['price'], 'rank': pill.get('rank', '凡品'), 'data': pill}
-        for pill in self.config_manager.exp_pills_data.values():
-            if pill['name'] == name and pill.get('price', 0) > 0:
-                return {'name': pill['name'], 'type': 'exp_pill', 'price': pill['price'], 'rank': pill.get('rank', '凡品'), 'data': pill}
-        for pill in self.config_manager.utility_pills_data.values():
-            if pill['name'] == name and pill.get('price', 0) > 0:
-                return {'name': pill['name'], 'type': 'utility_pill', 'price': pill['price'], 'rank': pill.get('rank', '凡品'), 'data': pill}
-        return None
-
-    def format_pavilion_display(self, pavilion_name: str, items: List[Dict], refresh_hours: int = 6, last_refresh: int = 0) -> str:
+        """根据名称查找物品（重名时按武器、物品、破境丹、修为丹、功能丹的顺序取第一个）"""
+        if self._item_name_index is None:
+            index = {}
+            for item in self.get_all_items_for_display(0):
+                index.setdefault(item['name'], item)
+            self._item_name_index = index
+        return self._item_name_index.get(name)
+
+    def format_pavilion_display(self, pavilion_name: str, items: List[Dict], refresh_hours: int = 6, last_refresh: int = 0, now: int = None) -> str:
         """格式化阁楼展示信息"""
         if not items:
             return f"{pavilion_name}暂无物品出售"
@@ -385,7 +396,9 @@ class ShopManager:
             lines.append(f"{i}. [{item['rank']}] {item['name']} ({type_label}){discount_text}\n   价格: {item['price']} 灵石 {stock_text}{effect_line}\n")
 
         if refresh_hours > 0 and last_refresh:
-            remaining = (last_refresh + refresh_hours * 3600) - int(time.time())
+            if now is None:
+                now = int(time.time())
+            remaining = (last_refresh + refresh_hours * 3600) - now
             if remaining > 0:
                 lines.append(f"\n下次刷新: {remaining // 3600}小时{(remaining % 3600) // 60}分钟后")
         lines.append(f"\n提示: 使用 '购买 [物品名]' 购买物品")
@@ -18,6 +18,11 @@ class SkillManager:
     def __init__(self, db: DataBase, config_manager: ConfigManager):
         self.db = db
         self.config_manager = config_manager
+        # 物理技能ID集合（伤害类型为静态配置，用于快速分组）
+        self._physical_skill_ids = frozenset(
+            skill_id for skill_id, skill in config_manager.get_all_skills().items()
+            if skill.get("damage_type") == "physical"
+        )
     
     def get_skill_by_id(self, skill_id: str) -> Optional[dict]:
         """根据技能ID获取技能配置"""
@@ -31,6 +36,25 @@ class SkillManager:
         """获取所有技能配置"""
         return self.config_manager.get_all_skills()
     
+    def partition_skills(self, skill_configs: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """将技能配置按伤害类型分组
+        
+        Args:
+            skill_configs: 技能配置列表
+            
+        Returns:
+            (物理技能列表, 法术技能列表)，保持原有顺序
+        """
+        physical_ids = self._physical_skill_ids
+        physical_skills = []
+        magic_skills = []
+        for skill in skill_configs:
+            if skill.get("id") in physical_ids:
+                physical_skills.append(skill)
+            else:
+                magic_skills.append(skill)
+        return physical_skills, magic_skills
+    
     def get_available_skills_for_player(self, player: Player) -> List[dict]:
         """获取玩家当前可学习的技能列表
         
@@ -17,6 +17,8 @@ class StorageRingManager:
     def __init__(self, db: "DataBase", config_manager: "ConfigManager"):
         self.db = db
         self.config_manager = config_manager
+        # 储物戒列表展示缓存：(配置字典, [(名称, 容量, 展示行), ...])
+        self._ring_listing_cache = None
 
     def get_storage_ring_config(self, ring_name: str) -> Optional[dict]:
         """获取储物戒配置"""
@@ -127,6 +129,84 @@ class StorageRingManager:
                 await self.db.conn.rollback()
             raise
 
+    async def store_items_bulk(self, player: Player, items: List[Tuple[str, int]], external_transaction: bool = False) -> List[bool]:
+        """批量存入物品（单个事务、单次写回）
+
+        Args:
+            external_transaction: 如果为True，表示外部已有事务，只修改传入的player对象，由外部事务统一写库
+
+        Returns:
+            与 items 一一对应的存入结果；不可存入或储物戒已满的物品为False
+        """
+        if not items:
+            return []
+
+        if external_transaction:
+            return self._fill_ring_items(player, items)
+
+        await self.db.conn.execute("BEGIN IMMEDIATE")
+        try:
+            fresh_player = await self.db.get_player_by_id(player.user_id)
+            if not fresh_player:
+                await self.db.conn.rollback()
+                return [False] * len(items)
+
+            results = self._fill_ring_items(fresh_player, items)
+            if not any(results):
+                await self.db.conn.rollback()
+                return results
+
+            await self.db.update_player(fresh_player, commit=False)
+            await self.db.conn.commit()
+            return results
+        except Exception:
+            await self.db.conn.rollback()
+            raise
+
+    def _fill_ring_items(self, player: Player, items: List[Tuple[str, int]]) -> List[bool]:
+        """将物品依次放入player的储物戒（仅修改对象，不写库），返回逐项存入结果"""
+        ring_items = player.get_storage_ring_items()
+        available = self.get_ring_capacity(player.storage_ring) - len(ring_items)
+        results = []
+        for item_name, count in items:
+            if not self.can_store_item(item_name)[0]:
+                results.append(False)
+                continue
+            if item_name not in ring_items:
+                if available <= 0:
+                    results.append(False)
+                    continue
+                available -= 1
+            ring_items[item_name] = ring_items.get(item_name, 0) + count
+            results.append(True)
+
+        if any(results):
+            player.set_storage_ring_items(ring_items)
+        return results
+
+    async def return_item_to_player(self, user_id: str, item_name: str, count: int) -> Tuple[bool, str]:
+        """将物品返还到指定玩家的储物戒（单次查询+单次写入，用于赠予退回）"""
+        await self.db.conn.execute("BEGIN IMMEDIATE")
+        try:
+            player = await self.db.get_player_by_id(user_id)
+            if not player:
+                await self.db.conn.rollback()
+                return False, "玩家不存在或已被删除"
+
+            success, message = await self.store_item(
+                player, item_name, count, silent=True, external_transaction=True
+            )
+            if not success:
+                await self.db.conn.rollback()
+                return False, message
+
+            await self.db.update_player(player, commit=False)
+            await self.db.conn.commit()
+            return True, message
+        except Exception:
+            await self.db.conn.rollback()
+            raise
+
     async def retrieve_item(self, player: Player, item_name: str, count: int = 1) -> Tuple[bool, str]:
         """从储物戒取出物品（带事务保护）"""
         await self.db.conn.execute("BEGIN IMMEDIATE")
@@ -134,11 +214,11 @@ class StorageRingManager:
             player = await self.db.get_player_by_id(player.user_id)
             items = player.get_storage_ring_items()
 
-            if item_name not in items:
+            current_count = items.get(item_name)
+            if current_count is None:
                 await self.db.conn.rollback()
                 return False, f"储物戒中没有【{item_name}】"
 
-            current_count = items[item_name]
             if count > current_count:
                 await self.db.conn.rollback()
                 return False, f"储物戒中【{item_name}】数量不足（当前：{current_count}个）"
@@ -166,11 +246,11 @@ class StorageRingManager:
             player = await self.db.get_player_by_id(player.user_id)
             items = player.get_storage_ring_items()
 
-            if item_name not in items:
+            current_count = items.get(item_name)
+            if current_count is None:
                 await self.db.conn.rollback()
                 return False, f"储物戒中没有【{item_name}】"
 
-            current_count = items[item_name]
             if count > current_count:
                 await self.db.conn.rollback()
                 return False, f"储物戒中【{item_name}】数量不足（当前：{current_count}个）"
@@ -297,11 +377,33 @@ class StorageRingManager:
         rings.sort(key=lambda x: x["capacity"])
         return rings
 
+    def get_ring_listing(self) -> List[Tuple[str, int, str]]:
+        """获取储物戒列表的预格式化展示行（按容量排序），配置重载后自动重建"""
+        rings_data = self.config_manager.storage_rings_data
+        cache = self._ring_listing_cache
+        if cache is None or cache[0] is not rings_data:
+            listing = [
+                (
+                    ring["name"],
+                    ring["capacity"],
+                    f"【{ring['name']}】({ring['rank']})\n"
+                    f"    容量：{ring['capacity']}格 | 需求：{self._format_required_level(ring['required_level_index'])}\n",
+                )
+                for ring in self.get_all_storage_rings()
+            ]
+            cache = self._ring_listing_cache = (rings_data, listing)
+        return cache[1]
+
     def get_item_count(self, player: Player, item_name: str) -> int:
         """获取储物戒中某物品的数量"""
         items = player.get_storage_ring_items()
         return items.get(item_name, 0)
 
+    def get_item_counts(self, player: Player, item_names: List[str]) -> Dict[str, int]:
+        """批量获取储物戒中多个物品的数量（只解析一次储物戒数据）"""
+        items = player.get_storage_ring_items()
+        return {name: items.get(name, 0) for name in item_names}
+
     def has_item(self, player: Player, item_name: str, count: int = 1) -> bool:
         """检查储物戒中是否有足够数量的物品"""
         return self.get_item_count(player, item_name) >= count
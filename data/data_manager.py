@@ -4,7 +4,7 @@ import aiosqlite
 import json
 from dataclasses import fields
 from pathlib import Path
-from typing import Tuple, List, Optional
+from typing import Callable, Dict, Tuple, List, Optional
 from astrbot.api import logger
 from ..models import Player
 from .database_extended import DatabaseExtended
@@ -19,12 +19,28 @@ class DataBase:
         self.db_path = Path(db_file)
         self.conn: aiosqlite.Connection = None
         self.ext: Optional[DatabaseExtended] = None  # 扩展操作类
+        # 玩家删除后的回调（参数为 user_id），供各管理器清理按用户缓存的数据
+        self._player_delete_hooks: List[Callable[[str], None]] = []
+        # 秘境表写入后的回调，供秘境管理器清理列表缓存；重连后由新的扩展操作类沿用
+        self._rift_change_hooks: List[Callable[[], None]] = []
+
+    def add_player_delete_hook(self, hook: Callable[[str], None]):
+        """注册玩家删除后的回调"""
+        self._player_delete_hooks.append(hook)
+
+    def add_rift_change_hook(self, hook: Callable[[], None]):
+        """注册秘境数据变更后的回调"""
+        self._rift_change_hooks.append(hook)
+
+    def _run_player_delete_hooks(self, user_id: str):
+        for hook in self._player_delete_hooks:
+            hook(user_id)
 
     async def connect(self):
         """连接数据库"""
         self.conn = await aiosqlite.connect(self.db_path)
         self.conn.row_factory = aiosqlite.Row
-        self.ext = DatabaseExtended(self.conn)  # 初始化扩展操作
+        self.ext = DatabaseExtended(self.conn, self._rift_change_hooks)  # 初始化扩展操作
 
     async def close(self):
         """关闭数据库连接"""
@@ -158,8 +174,8 @@ class DataBase:
                 return Player(**filtered_data)
             return None
 
-    async def update_player(self, player: Player):
-        """更新玩家信息"""
+    async def update_player(self, player: Player, commit: bool = True):
+        """更新玩家信息（commit为False时由调用方负责提交事务）"""
         await self.conn.execute(
             """
             UPDATE players SET
@@ -275,7 +291,8 @@ class DataBase:
                 player.user_id
             )
         )
-        await self.conn.commit()
+        if commit:
+            await self.conn.commit()
 
     async def delete_player(self, user_id: str):
         """删除玩家"""
@@ -284,6 +301,7 @@ class DataBase:
             (user_id,)
         )
         await self.conn.commit()
+        self._run_player_delete_hooks(user_id)
 
     async def delete_player_cascade(self, user_id: str):
         """级联删除玩家及所有关联数据"""
@@ -315,6 +333,7 @@ class DataBase:
 
         await self.conn.execute("DELETE FROM players WHERE user_id = ?", (user_id,))
         await self.conn.commit()
+        self._run_player_delete_hooks(user_id)
 
     async def get_all_players(self):
         """获取所有玩家"""
@@ -323,6 +342,14 @@ class DataBase:
             # 过滤掉 Player 模型中不存在的字段（兼容旧数据库/迁移未完成的情况）
             return [Player(**{k: v for k, v in dict(row).items() if k in PLAYER_FIELDS}) for row in rows]
 
+    async def get_player_exp_stats(self) -> Tuple[int, int]:
+        """获取玩家数量与修为总和（由SQLite聚合，不构造Player对象）"""
+        async with self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(experience), 0) FROM players"
+        ) as cursor:
+            row = await cursor.fetchone()
+            return row[0], row[1]
+
     # ===== 商店数据操作 =====
 
     async def get_shop_data(self, shop_id: str = "global") -> Tuple[int, List[dict]]:
@@ -348,6 +375,31 @@ class DataBase:
                 return last_refresh_time, current_items
             return 0, []
 
+    async def get_shops_data(self, shop_ids: List[str]) -> Dict[str, Tuple[int, List[dict]]]:
+        """批量获取多个商店数据（单次查询）
+
+        Args:
+            shop_ids: 商店ID列表
+
+        Returns:
+            {shop_id: (last_refresh_time, current_items)}，不存在的商店不包含在结果中
+        """
+        if not shop_ids:
+            return {}
+        placeholders = ",".join("?" * len(shop_ids))
+        result = {}
+        async with self.conn.execute(
+            f"SELECT shop_id, last_refresh_time, current_items FROM shop WHERE shop_id IN ({placeholders})",
+            tuple(shop_ids)
+        ) as cursor:
+            async for row in cursor:
+                try:
+                    current_items = json.loads(row[2])
+                except json.JSONDecodeError:
+                    current_items = []
+                result[row[0]] = (row[1], current_items)
+        return result
+
     async def update_shop_data(self, shop_id: str, last_refresh_time: int, current_items: List[dict]):
         """更新商店数据
 
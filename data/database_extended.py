@@ -5,17 +5,24 @@
 
 import aiosqlite
 import json
-from typing import List, Optional
+import time
+from typing import Callable, List, Optional
 from ..models_extended import (
-    Sect, BuffInfo, Boss, Rift, ImpartInfo, UserCd
+    Sect, BuffInfo, Boss, Rift, ImpartInfo, UserCd, UserStatus
 )
 
+# 过期赠予请求的清理间隔（秒）
+GIFT_CLEANUP_INTERVAL = 600
+
 
 class DatabaseExtended:
     """数据库扩展操作类"""
     
-    def __init__(self, conn: aiosqlite.Connection):
+    def __init__(self, conn: aiosqlite.Connection, rift_change_hooks: Optional[List[Callable[[], None]]] = None):
         self.conn = conn
+        self._rift_change_hooks = rift_change_hooks if rift_change_hooks is not None else []
+        self._last_gift_cleanup = 0.0
+        self._bounty_tables_ready = False
     
     # ===== 宗门系统 CRUD =====
     
@@ -278,11 +285,16 @@ class DatabaseExtended:
             (rift.rift_name, rift.rift_level, rift.required_level, rift.rewards)
         )
         await self.conn.commit()
+        self._run_rift_change_hooks()
         
         async with self.conn.execute("SELECT last_insert_rowid()") as cursor:
             row = await cursor.fetchone()
             return row[0] if row else None
     
+    def _run_rift_change_hooks(self):
+        for hook in self._rift_change_hooks:
+            hook()
+    
     async def get_rift_by_id(self, rift_id: int) -> Optional[Rift]:
         """根据ID获取秘境信息"""
         async with self.conn.execute(
@@ -346,16 +358,33 @@ class DatabaseExtended:
     
     # ===== 用户CD系统 CRUD =====
     
-    async def create_user_cd(self, user_id: str):
-        """初始化用户CD信息"""
-        await self.conn.execute(
+    async def create_user_cd(self, user_id: str) -> Optional[UserCd]:
+        """初始化用户CD信息，返回新建记录（与表默认值一致，无需回查）
+        
+        记录已存在时不做修改，返回None
+        """
+        cursor = await self.conn.execute(
             """
-            INSERT INTO user_cd (user_id, type, create_time, scheduled_time)
+            INSERT OR IGNORE INTO user_cd (user_id, type, create_time, scheduled_time)
             VALUES (?, 0, 0, 0)
             """,
             (user_id,)
         )
         await self.conn.commit()
+        if cursor.rowcount == 0:
+            return None
+        return UserCd(user_id=user_id)
+    
+    async def get_or_create_user_cd(self, user_id: str) -> UserCd:
+        """获取用户CD信息，不存在时初始化（新建时直接返回默认值，无需回查）"""
+        user_cd = await self.get_user_cd(user_id)
+        if user_cd:
+            return user_cd
+        user_cd = await self.create_user_cd(user_id)
+        if user_cd is None:
+            # 并发请求已抢先创建，读取其结果
+            return await self.get_user_cd(user_id)
+        return user_cd
     
     async def get_user_cd(self, user_id: str) -> Optional[UserCd]:
         """获取用户CD信息"""
@@ -380,18 +409,19 @@ class DatabaseExtended:
         )
         await self.conn.commit()
     
-    async def set_user_busy(self, user_id: str, busy_type: int, scheduled_time: int = 0, extra_data: dict = None):
+    async def set_user_busy(self, user_id: str, busy_type: int, scheduled_time: int = 0, extra_data=None):
         """设置用户忙碌状态
         
         Args:
             user_id: 用户ID
             busy_type: 0=空闲, 1=闭关, 2=历练, 3=探索秘境
             scheduled_time: 计划完成时间戳
-            extra_data: 额外数据（如秘境ID等）
+            extra_data: 额外数据（如秘境ID等），可传入字典或预先序列化好的JSON字符串
         """
-        import time
-        import json
-        extra_json = json.dumps(extra_data or {}, ensure_ascii=False)
+        if isinstance(extra_data, str):
+            extra_json = extra_data
+        else:
+            extra_json = json.dumps(extra_data or {}, ensure_ascii=False)
         await self.conn.execute(
             """
             UPDATE user_cd SET type = ?, create_time = ?, scheduled_time = ?, extra_data = ?
@@ -405,6 +435,33 @@ class DatabaseExtended:
         """设置用户为空闲状态"""
         await self.set_user_busy(user_id, 0, 0)
     
+    async def finish_adventure_atomic(self, user_id: str, exp_delta: int, gold_delta: int,
+                                      storage_ring_items: Optional[str] = None) -> bool:
+        """历练结算：一次提交内发放修为/灵石（可选同步储物戒）并将用户置为空闲
+        
+        仅当用户仍处于历练状态时生效，返回是否结算成功（防止重复领取）
+        """
+        cursor = await self.conn.execute(
+            """
+            UPDATE user_cd SET type = ?, create_time = ?, scheduled_time = 0, extra_data = '{}'
+            WHERE user_id = ? AND type = ?
+            """,
+            (UserStatus.IDLE, int(time.time()), user_id, UserStatus.ADVENTURING)
+        )
+        if cursor.rowcount != 1:
+            await self.conn.rollback()
+            return False
+        await self.conn.execute(
+            """
+            UPDATE players SET experience = experience + ?, gold = gold + ?,
+                storage_ring_items = COALESCE(?, storage_ring_items)
+            WHERE user_id = ?
+            """,
+            (exp_delta, gold_delta, storage_ring_items, user_id)
+        )
+        await self.conn.commit()
+        return True
+    
     # ===== Player扩展字段更新方法 =====
     
     async def update_player_hp_mp(self, user_id: str, hp: int, mp: int):
@@ -415,6 +472,15 @@ class DatabaseExtended:
         )
         await self.conn.commit()
     
+    async def update_player_equipment(self, user_id: str, weapon: str, armor: str,
+                                      main_technique: str, techniques: str):
+        """更新玩家装备栏（武器、防具、主修心法、功法列表JSON）"""
+        await self.conn.execute(
+            "UPDATE players SET weapon = ?, armor = ?, main_technique = ?, techniques = ? WHERE user_id = ?",
+            (weapon, armor, main_technique, techniques, user_id)
+        )
+        await self.conn.commit()
+    
     async def update_player_sect_info(self, user_id: str, sect_id: int, sect_position: int):
         """更新玩家宗门信息"""
         await self.conn.execute(
@@ -492,7 +558,9 @@ class DatabaseExtended:
     # ===== Phase 2: 悬赏令系统 CRUD =====
     
     async def ensure_bounty_tables(self):
-        """确保悬赏系统表存在（运行时检查）"""
+        """确保悬赏系统表存在（运行时检查，每个连接只执行一次）"""
+        if self._bounty_tables_ready:
+            return
         await self.conn.execute("""
             CREATE TABLE IF NOT EXISTS bounty_tasks (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -505,11 +573,22 @@ class DatabaseExtended:
                 rewards TEXT NOT NULL DEFAULT '{}',
                 start_time INTEGER NOT NULL,
                 expire_time INTEGER NOT NULL,
-                status INTEGER NOT NULL DEFAULT 1
+                status INTEGER NOT NULL DEFAULT 1,
+                reward_stone INTEGER NOT NULL DEFAULT 0,
+                reward_exp INTEGER NOT NULL DEFAULT 0,
+                difficulty_name TEXT NOT NULL DEFAULT '',
+                item_table TEXT NOT NULL DEFAULT '',
+                description TEXT NOT NULL DEFAULT '',
+                progress_tags TEXT NOT NULL DEFAULT ''
             )
         """)
         await self.conn.execute("CREATE INDEX IF NOT EXISTS idx_bounty_user ON bounty_tasks(user_id)")
+        # 仅覆盖进行中悬赏的部分索引，供过期扫描使用
+        await self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_bounty_active_expire ON bounty_tasks(expire_time) WHERE status = 1"
+        )
         await self.conn.commit()
+        self._bounty_tables_ready = True
     
     async def get_active_bounty(self, user_id: str) -> Optional[dict]:
         """获取用户当前进行中的悬赏任务"""
@@ -523,23 +602,40 @@ class DatabaseExtended:
                 return dict(row)
             return None
     
-    async def create_bounty(self, user_id: str, bounty_id: int, bounty_name: str, 
-                           target_type: str, target_count: int, rewards: str, 
-                           expire_time: int):
-        """创建悬赏任务"""
-        import time
-        await self.conn.execute(
-            """
-            INSERT INTO bounty_tasks (
-                user_id, bounty_id, bounty_name, target_type, 
-                target_count, current_progress, rewards, 
-                start_time, expire_time, status
-            ) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, 1)
-            """,
-            (user_id, bounty_id, bounty_name, target_type, 
-             target_count, rewards, int(time.time()), expire_time)
-        )
-        await self.conn.commit()
+    async def create_bounty(self, user_id: str, bounty_id: int, bounty_name: str,
+                           target_type: str, target_count: int, rewards: str,
+                           start_time: int, expire_time: int,
+                           reward_stone: int, reward_exp: int, difficulty_name: str,
+                           item_table: str, description: str, progress_tags: str) -> bool:
+        """创建悬赏任务（rewards 列保留完整JSON供旧版本读取，读取路径使用独立列）
+        
+        单条语句完成“无进行中悬赏才插入”，返回是否创建成功（False 表示已有进行中的悬赏）
+        """
+        try:
+            cursor = await self.conn.execute(
+                """
+                INSERT INTO bounty_tasks (
+                    user_id, bounty_id, bounty_name, target_type,
+                    target_count, current_progress, rewards,
+                    start_time, expire_time, status,
+                    reward_stone, reward_exp, difficulty_name,
+                    item_table, description, progress_tags
+                )
+                SELECT ?, ?, ?, ?, ?, 0, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM bounty_tasks WHERE user_id = ?1 AND status = 1
+                )
+                """,
+                (user_id, bounty_id, bounty_name, target_type,
+                 target_count, rewards, start_time, expire_time,
+                 reward_stone, reward_exp, difficulty_name,
+                 item_table, description, progress_tags)
+            )
+            await self.conn.commit()
+        except Exception:
+            await self.conn.rollback()
+            raise
+        return cursor.rowcount == 1
     
     async def update_bounty_progress(self, user_id: str, progress: int):
         """更新悬赏任务进度"""
@@ -565,6 +661,18 @@ class DatabaseExtended:
             (user_id,)
         )
         await self.conn.commit()
+
+    async def abandon_bounty(self, user_id: str, abandon_cd: int):
+        """放弃悬赏任务并写入玩家的放弃冷却截止时间"""
+        await self.conn.execute(
+            "UPDATE bounty_tasks SET status = 0 WHERE user_id = ? AND status = 1",
+            (user_id,)
+        )
+        await self.conn.execute(
+            "UPDATE players SET bounty_abandon_cd = ? WHERE user_id = ?",
+            (abandon_cd, user_id)
+        )
+        await self.conn.commit()
     
     # ===== 系统配置 CRUD =====
     
@@ -642,8 +750,11 @@ class DatabaseExtended:
         import time
         now = int(time.time())
         
-        # 先清理过期的请求
-        await self.cleanup_expired_gifts()
+        # 定期清理过期的请求（查询本身已按 expires_at 过滤）
+        mono_now = time.monotonic()
+        if mono_now - self._last_gift_cleanup >= GIFT_CLEANUP_INTERVAL:
+            self._last_gift_cleanup = mono_now
+            await self.cleanup_expired_gifts()
         
         async with self.conn.execute(
             """
@@ -669,6 +780,21 @@ class DatabaseExtended:
                 }
             return None
     
+    async def pop_pending_gift(self, receiver_id: str) -> Optional[dict]:
+        """取出并删除接收者最新的待处理赠予请求
+        
+        删除以影响行数为准，并发重复领取时只有一方能拿到该请求
+        """
+        gift = await self.get_pending_gift(receiver_id)
+        if not gift:
+            return None
+        cursor = await self.conn.execute(
+            "DELETE FROM pending_gifts WHERE id = ?",
+            (gift["id"],)
+        )
+        await self.conn.commit()
+        return gift if cursor.rowcount == 1 else None
+    
     async def get_all_pending_gifts(self, receiver_id: str) -> List[dict]:
         """获取接收者的所有待处理赠予请求"""
         import time
@@ -5,7 +5,7 @@ from typing import Dict, Callable, Awaitable
 from astrbot.api import logger
 from ..config_manager import ConfigManager
 
-LATEST_DB_VERSION = 21  # v21: 添加战斗属性和技能系统字段
+LATEST_DB_VERSION = 23  # v23: 悬赏放弃冷却改为玩家表独立列
 
 MIGRATION_TASKS: Dict[int, Callable[[aiosqlite.Connection, ConfigManager], Awaitable[None]]] = {}
 
@@ -365,7 +365,8 @@ async def _create_all_tables_v2(conn: aiosqlite.Connection):
             hit_rate REAL NOT NULL DEFAULT 0.95,
             dodge_rate REAL NOT NULL DEFAULT 0.05,
             learned_skills TEXT NOT NULL DEFAULT '[]',
-            equipped_skills TEXT NOT NULL DEFAULT '[]'
+            equipped_skills TEXT NOT NULL DEFAULT '[]',
+            bounty_abandon_cd INTEGER NOT NULL DEFAULT 0
         )
     """)
 
@@ -605,7 +606,7 @@ async def _create_all_tables_v2(conn: aiosqlite.Connection):
         )
     """)
 
-    # 添加悬赏任务表（v14）
+    # 添加悬赏任务表（v14，奖励字段v22）
     await conn.execute("""
         CREATE TABLE IF NOT EXISTS bounty_tasks (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -618,10 +619,17 @@ async def _create_all_tables_v2(conn: aiosqlite.Connection):
             rewards TEXT NOT NULL DEFAULT '{}',
             start_time INTEGER NOT NULL,
             expire_time INTEGER NOT NULL,
-            status INTEGER NOT NULL DEFAULT 1
+            status INTEGER NOT NULL DEFAULT 1,
+            reward_stone INTEGER NOT NULL DEFAULT 0,
+            reward_exp INTEGER NOT NULL DEFAULT 0,
+            difficulty_name TEXT NOT NULL DEFAULT '',
+            item_table TEXT NOT NULL DEFAULT '',
+            description TEXT NOT NULL DEFAULT '',
+            progress_tags TEXT NOT NULL DEFAULT ''
         )
     """)
     await conn.execute("CREATE INDEX IF NOT EXISTS idx_bounty_user ON bounty_tasks(user_id)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_bounty_active_expire ON bounty_tasks(expire_time) WHERE status = 1")
 
     # 插入初始秘境数据
     import json
@@ -1166,3 +1174,93 @@ async def _migrate_to_v21(conn: aiosqlite.Connection, config_manager: ConfigMana
     
     await conn.commit()
     logger.info("v21迁移完成：战斗属性和技能系统字段已添加")
+
+
+@migration(22)
+async def _migrate_to_v22(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    """迁移到v22 - 悬赏奖励从JSON拆分为独立列"""
+    logger.info("开始迁移到v22：悬赏奖励拆分为独立列")
+    
+    columns = (
+        "reward_stone INTEGER NOT NULL DEFAULT 0",
+        "reward_exp INTEGER NOT NULL DEFAULT 0",
+        "difficulty_name TEXT NOT NULL DEFAULT ''",
+        "item_table TEXT NOT NULL DEFAULT ''",
+        "description TEXT NOT NULL DEFAULT ''",
+        "progress_tags TEXT NOT NULL DEFAULT ''",
+    )
+    for column in columns:
+        try:
+            await conn.execute(f"ALTER TABLE bounty_tasks ADD COLUMN {column}")
+        except Exception as e:
+            logger.warning(f"添加bounty_tasks字段失败（可能已存在）: {e}")
+    
+    # 回填进行中的悬赏（已结束的悬赏不再读取奖励）
+    import json
+    async with conn.execute("SELECT id, rewards FROM bounty_tasks WHERE status = 1") as cursor:
+        rows = await cursor.fetchall()
+    for row_id, rewards_json in rows:
+        try:
+            rewards = json.loads(rewards_json or "{}")
+        except Exception:
+            rewards = {}
+        await conn.execute(
+            """
+            UPDATE bounty_tasks SET reward_stone = ?, reward_exp = ?, difficulty_name = ?,
+                item_table = ?, description = ?, progress_tags = ?
+            WHERE id = ?
+            """,
+            (
+                int(rewards.get("stone", 0)),
+                int(rewards.get("exp", 0)),
+                str(rewards.get("difficulty_name", rewards.get("difficulty", ""))),
+                str(rewards.get("item_table") or ""),
+                str(rewards.get("description", "")),
+                ",".join(str(tag).lower() for tag in rewards.get("progress_tags", [])),
+                row_id,
+            )
+        )
+    
+    await conn.commit()
+    logger.info(f"v22迁移完成：已回填 {len(rows)} 条进行中的悬赏")
+
+
+@migration(23)
+async def _migrate_to_v23(conn: aiosqlite.Connection, config_manager: ConfigManager):
+    """迁移到v23 - 悬赏放弃冷却从system_config迁移到玩家表"""
+    logger.info("开始迁移到v23：悬赏放弃冷却改为玩家表独立列")
+    
+    try:
+        await conn.execute("ALTER TABLE players ADD COLUMN bounty_abandon_cd INTEGER NOT NULL DEFAULT 0")
+    except Exception as e:
+        logger.warning(f"添加bounty_abandon_cd字段失败（可能已存在）: {e}")
+    
+    # 迁移旧的键值冷却记录（system_config 表可能尚未创建）
+    # 按字面前缀匹配（LIKE 中的 "_" 为通配符，不能用于匹配该前缀）
+    prefix = "bounty_abandon_cd_"
+    key_filter = "substr(key, 1, ?) = ? AND length(key) > ?"
+    key_params = (len(prefix), prefix, len(prefix))
+    migrated = 0
+    try:
+        async with conn.execute(
+            f"SELECT key, value FROM system_config WHERE {key_filter}",
+            key_params
+        ) as cursor:
+            rows = await cursor.fetchall()
+    except Exception:
+        rows = []
+    for key, value in rows:
+        try:
+            cd_time = int(value)
+        except (TypeError, ValueError):
+            continue
+        await conn.execute(
+            "UPDATE players SET bounty_abandon_cd = ? WHERE user_id = ?",
+            (cd_time, key[len(prefix):])
+        )
+        migrated += 1
+    if rows:
+        await conn.execute(f"DELETE FROM system_config WHERE {key_filter}", key_params)
+    
+    await conn.commit()
+    logger.info(f"v23迁移完成：已迁移 {migrated} 条悬赏放弃冷却")
@@ -18,21 +18,8 @@ class BountyHandlers:
     @player_required
     async def handle_bounty_list(self, player: Player, event: AstrMessageEvent):
         """显示悬赏列表"""
-        bounties = await self.bounty_mgr.get_bounty_list(player)
-        
-        lines = ["📜 悬赏令 · 今日委托", "━━━━━━━━━━━━━━━"]
-        for b in bounties:
-            reward = b.get("reward", {})
-            lines.append(
-                f"[{b['id']}] {b['name']}（{b.get('difficulty_name', '未知')}·{b.get('category', '任务')}）\n"
-                f"  - 目标：完成 {b.get('count')} 次 | 时限：{b.get('time_limit', 0) // 60} 分钟\n"
-                f"  - 奖励：{reward.get('stone', 0):,} 灵石 + {reward.get('exp', 0):,} 修为\n"
-                f"  - 说明：{b.get('description', '')}"
-            )
-        lines.append("━━━━━━━━━━━━━━━")
-        lines.append("💡 使用 /接取悬赏 <编号> 接取任务")
-        
-        yield event.plain_result("\n".join(lines))
+        board = await self.bounty_mgr.get_bounty_board(player)
+        yield event.plain_result(board)
     
     @player_required
     async def handle_accept_bounty(self, player: Player, event: AstrMessageEvent, bounty_id: int = 0):
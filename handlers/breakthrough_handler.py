@@ -10,6 +10,8 @@ from .utils import player_required
 CMD_BREAKTHROUGH = "突破"
 CMD_BREAKTHROUGH_INFO = "突破信息"
 
+_SEPARATOR = "=" * 28
+
 __all__ = ["BreakthroughHandler"]
 
 
@@ -108,7 +110,7 @@ class BreakthroughHandler:
                 f"• 突破成功：境界提升，肉身更强\n",
                 f"• 突破失败：损失10%修为，有概率死亡\n",
                 f"• 死亡后：所有数据清除，需重新入仙途\n",
-                f"=" * 28
+                _SEPARATOR
             ])
         else:
             info_lines.extend([
@@ -118,7 +120,7 @@ class BreakthroughHandler:
                 f"• 突破成功：境界提升，实力大增\n",
                 f"• 突破失败：损失10%修为，有概率死亡\n",
                 f"• 死亡后：所有数据清除，需重新入仙途\n",
-                f"=" * 28
+                _SEPARATOR
             ])
 
         yield event.plain_result("".join(info_lines))
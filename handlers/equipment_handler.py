@@ -194,12 +194,6 @@ class EquipmentHandler:
             )
             return
 
-        # 从储物戒取出物品
-        success, retrieve_msg = await self.storage_ring_manager.retrieve_item(player, item_name, 1)
-        if not success:
-            yield event.plain_result(f"❌ 无法从储物戒取出装备：{retrieve_msg}")
-            return
-
         # 创建Item对象
         from ..models import Item
         item = Item(
@@ -224,8 +218,8 @@ class EquipmentHandler:
             mp_bonus=item_config.get("mp_bonus", 0)
         )
 
-        # 装备物品
-        success, message = await self.equipment_manager.equip_item(player, item)
+        # 从储物戒取出并装备物品
+        success, message = await self.equipment_manager.equip_from_storage_ring(player, item)
 
         if success:
             # 显示属性加成
@@ -237,8 +231,6 @@ class EquipmentHandler:
             )
             yield event.plain_result(result_msg)
         else:
-            # 装备失败，将物品放回储物戒
-            await self.storage_ring_manager.store_item(player, item_name, 1, silent=True)
             yield event.plain_result(f"❌ {message}")
 
     @player_required
@@ -1,5 +1,6 @@
 # handlers/pill_handler.py
 
+import time
 from astrbot.api.event import AstrMessageEvent
 from ..data import DataBase
 from ..core import PillManager
@@ -76,8 +77,9 @@ class PillHandler:
             player: 玩家对象
             event: 事件对象
         """
-        # 先更新临时效果
-        await self.pill_manager.update_temporary_effects(player)
+        # 先更新临时效果（只读查询，短时间内重复查看不重复结算）
+        now = int(time.time())
+        await self.pill_manager.update_temporary_effects_throttled(player, now)
 
         # 获取丹药背包显示
         inventory_display = self.pill_manager.get_pill_inventory_display(player)
@@ -90,8 +92,7 @@ class PillHandler:
             effects_display.append("\n--- 当前生效的临时效果 ---")
             for effect in active_effects:
                 pill_name = effect.get("pill_name", "未知丹药")
-                import time
-                remaining_seconds = effect.get("expiry_time", 0) - int(time.time())
+                remaining_seconds = effect.get("expiry_time", 0) - now
                 if remaining_seconds > 0:
                     remaining_minutes = remaining_seconds // 60
                     hours = remaining_minutes // 60
@@ -1,11 +1,10 @@
 # handlers/player_handler.py
 import time
 import random
-from datetime import datetime
 from astrbot.api.event import AstrMessageEvent
 from astrbot.api import AstrBotConfig
 from ..data import DataBase
-from ..core import CultivationManager, PillManager
+from ..core import CultivationManager, PillManager, EquipmentManager
 from ..core.skill_manager import SkillManager
 from ..models import Player
 from ..models_extended import UserStatus
@@ -21,6 +20,72 @@ REBIRTH_COOLDOWN = 1 * 3600  # 1小时冷却
 
 __all__ = ["PlayerHandler"]
 
+# 功法被动效果名称
+_EFFECT_NAMES = {
+    "critical_rate": "暴击率",
+    "critical_damage": "暴击伤害",
+    "dodge_rate": "闪避率",
+    "hit_rate": "命中率",
+    "speed": "速度",
+    "physical_damage": "物伤",
+    "magic_damage": "法伤",
+    "physical_defense": "物防",
+    "magic_defense": "法防",
+    "hp_bonus": "HP",
+    "mp_bonus": "MP",
+    "lifesteal": "生命偷取",
+}
+
+# 功法成长修正名称
+_MODIFIER_NAMES = {
+    "physical_attack": "物攻成长",
+    "magic_attack": "法攻成长",
+    "physical_defense": "物防成长",
+    "magic_defense": "法防成长",
+    "hp": "HP成长",
+    "mp": "MP成长",
+    "speed": "速度成长",
+    "lifespan": "寿命成长",
+    "mental_power": "精神力成长",
+    "blood_qi": "气血成长",
+    "spiritual_qi": "灵气成长",
+}
+
+# 我的信息：按修炼类型展示的属性块
+_TIXIU_ATTR_TEMPLATE = (
+    "  气血：{blood_qi}/{max_blood_qi}\n"
+    "  物伤：{physical_damage}\n"
+    "  法伤：{magic_damage}\n"
+    "  物防：{physical_defense}\n"
+    "  法防：{magic_defense}\n"
+)
+_LINGXIU_ATTR_TEMPLATE = (
+    "  灵气：{spiritual_qi}/{max_spiritual_qi}\n"
+    "  法伤：{magic_damage}\n"
+    "  物伤：{physical_damage}\n"
+    "  法防：{magic_defense}\n"
+    "  物防：{physical_defense}\n"
+)
+
+# 忙碌状态名称（导入时构建一次）
+_STATUS_NAMES = {status: UserStatus.get_name(status) for status in UserStatus}
+
+# 签到日期缓存：按本地自然日缓存 "YYYY-MM-DD"，跨天时才重新格式化
+_TODAY_CACHE = {"day": -1, "s": "", "offset": time.localtime().tm_gmtoff}
+
+
+def _get_today_str() -> str:
+    """获取今天的日期字符串（YYYY-MM-DD），同一自然日内复用缓存结果"""
+    now = time.time()
+    epoch_day = int(now + _TODAY_CACHE["offset"]) // 86400
+    if _TODAY_CACHE["day"] != epoch_day:
+        local_time = time.localtime(now)
+        _TODAY_CACHE["s"] = time.strftime("%Y-%m-%d", local_time)
+        _TODAY_CACHE["offset"] = local_time.tm_gmtoff
+        _TODAY_CACHE["day"] = int(now + local_time.tm_gmtoff) // 86400
+    return _TODAY_CACHE["s"]
+
+
 class PlayerHandler:
     """玩家基础信息处理器 - 支持灵修/体修选择"""
 
@@ -31,6 +96,14 @@ class PlayerHandler:
         self.cultivation_manager = CultivationManager(config, config_manager)
         self.pill_manager = PillManager(self.db, self.config_manager)
         self.skill_manager = SkillManager(self.db, self.config_manager)
+        self.equipment_manager = EquipmentManager(self.db, self.config_manager)
+
+        # 签到奖励范围配置（确保最小值不大于最大值）
+        check_in_gold_min = config["VALUES"].get("CHECK_IN_GOLD_MIN", 50)
+        check_in_gold_max = config["VALUES"].get("CHECK_IN_GOLD_MAX", 500)
+        if check_in_gold_min > check_in_gold_max:
+            check_in_gold_min, check_in_gold_max = check_in_gold_max, check_in_gold_min
+        self._check_in_range = (check_in_gold_min, check_in_gold_max)
 
     async def handle_start_xiuxian(self, event: AstrMessageEvent, cultivation_type: str = ""):
         """处理创建角色
@@ -115,20 +188,23 @@ class PlayerHandler:
         """处理查看玩家信息 - 展示新属性"""
         display_name = event.get_sender_name()
         required_exp = player.get_required_exp(self.config_manager)
+        now = int(time.time())
 
-        # 更新丹药效果并计算最终属性倍率
-        await self.pill_manager.update_temporary_effects(player)
+        # 更新丹药效果并计算最终属性倍率（只读查询，短时间内不重复结算）
+        await self.pill_manager.update_temporary_effects_throttled(player, now)
         pill_multipliers = self.pill_manager.calculate_pill_attribute_effects(player)
 
         # 获取装备加成后的属性
-        from ..core import EquipmentManager
-        equipment_manager = EquipmentManager(self.db, self.config_manager)
-        equipped_items = equipment_manager.get_equipped_items(
+        equipped_items = self.equipment_manager.get_equipped_items(
             player,
             self.config_manager.items_data,
             self.config_manager.weapons_data
         )
-        total_attrs = player.get_total_attributes(equipped_items, pill_multipliers)
+        if not equipped_items and all(v == 1.0 for v in pill_multipliers.values()):
+            # 无装备且无丹药加成时，总属性即基础属性
+            total_attrs = player.get_base_attributes()
+        else:
+            total_attrs = player.get_total_attributes(equipped_items, pill_multipliers)
 
         # 获取战力（综合攻防）
         combat_power = (
@@ -187,22 +263,15 @@ class PlayerHandler:
         )
         
         # 根据修炼类型添加不同属性
+        attr_ctx = {
+            **total_attrs,
+            "blood_qi": player.blood_qi,
+            "spiritual_qi": player.spiritual_qi,
+        }
         if player.cultivation_type == "体修":
-            reply_msg += (
-                f"  气血：{player.blood_qi}/{total_attrs.get('max_blood_qi', 0)}\n"
-                f"  物伤：{total_attrs['physical_damage']}\n"
-                f"  法伤：{total_attrs['magic_damage']}\n"
-                f"  物防：{total_attrs['physical_defense']}\n"
-                f"  法防：{total_attrs['magic_defense']}\n"
-            )
+            reply_msg += _TIXIU_ATTR_TEMPLATE.format_map(attr_ctx)
         else:
-            reply_msg += (
-                f"  灵气：{player.spiritual_qi}/{total_attrs.get('max_spiritual_qi', 0)}\n"
-                f"  法伤：{total_attrs['magic_damage']}\n"
-                f"  物伤：{total_attrs['physical_damage']}\n"
-                f"  法防：{total_attrs['magic_defense']}\n"
-                f"  物防：{total_attrs['physical_defense']}\n"
-            )
+            reply_msg += _LINGXIU_ATTR_TEMPLATE.format_map(attr_ctx)
         
         # 添加战斗属性
         reply_msg += (
@@ -211,10 +280,10 @@ class PlayerHandler:
             f"  HP：{player.hp}/{player.max_hp}\n"
             f"  MP：{player.mp}/{player.max_mp}\n"
             f"  速度：{player.speed}\n"
-            f"  暴击率：{player.critical_rate:.1%}\n"
+            f"  暴击率：{player.critical_rate * 100:.1f}%\n"
             f"  暴击伤害：{player.critical_damage:.1f}x\n"
-            f"  命中率：{player.hit_rate:.1%}\n"
-            f"  闪避率：{player.dodge_rate:.1%}\n"
+            f"  命中率：{player.hit_rate * 100:.1f}%\n"
+            f"  闪避率：{player.dodge_rate * 100:.1f}%\n"
         )
         
         # 获取已装备技能
@@ -245,37 +314,27 @@ class PlayerHandler:
         if player.main_technique:
             technique_config = self.config_manager.get_technique_by_name(player.main_technique)
             if technique_config:
-                passive_effects = technique_config.get("passive_effects", {})
-                growth_modifiers = technique_config.get("growth_modifiers", {})
-                
-                passive_lines = []
-                
-                # 被动效果
-                if passive_effects:
-                    for effect_key, effect_value in passive_effects.items():
-                        if effect_value != 0:
-                            effect_name = self._get_effect_name(effect_key)
-                            if isinstance(effect_value, float) and effect_value < 1:
-                                passive_lines.append(f"{effect_name}+{effect_value:.0%}")
-                            else:
-                                passive_lines.append(f"{effect_name}+{effect_value}")
-                
-                # 成长修正（只显示非1.0的）
-                growth_lines = []
-                for mod_key, mod_value in growth_modifiers.items():
-                    if mod_value != 1.0:
-                        mod_name = self._get_modifier_name(mod_key)
-                        if mod_value > 1.0:
-                            growth_lines.append(f"{mod_name}×{mod_value:.1f}")
-                        else:
-                            growth_lines.append(f"{mod_name}×{mod_value:.1f}")
-                
-                if passive_lines or growth_lines:
-                    reply_msg += f"\n【功法效果】\n"
-                    if passive_lines:
-                        reply_msg += f"  被动：{', '.join(passive_lines)}\n"
-                    if growth_lines:
-                        reply_msg += f"  成长：{', '.join(growth_lines)}\n"
+                passive_effects = technique_config.get("passive_effects") or {}
+                growth_modifiers = technique_config.get("growth_modifiers") or {}
+                if passive_effects or growth_modifiers:
+                    # 被动效果
+                    passive_lines = [
+                        f"{_EFFECT_NAMES.get(k, k)}+{v:.0%}" if isinstance(v, float) and v < 1
+                        else f"{_EFFECT_NAMES.get(k, k)}+{v}"
+                        for k, v in passive_effects.items() if v != 0
+                    ]
+                    # 成长修正（只显示非1.0的）
+                    growth_lines = [
+                        f"{_MODIFIER_NAMES.get(k, k)}×{v:.1f}"
+                        for k, v in growth_modifiers.items() if v != 1.0
+                    ]
+
+                    if passive_lines or growth_lines:
+                        reply_msg += f"\n【功法效果】\n"
+                        if passive_lines:
+                            reply_msg += f"  被动：{', '.join(passive_lines)}\n"
+                        if growth_lines:
+                            reply_msg += f"  成长：{', '.join(growth_lines)}\n"
         
         reply_msg += (
             f"\n"
@@ -287,12 +346,10 @@ class PlayerHandler:
         # 获取贷款信息
         loan = await self.db.ext.get_active_loan(player.user_id)
         if loan:
-            now = int(time.time())
             remaining_seconds = loan["due_at"] - now
-            remaining_days = remaining_seconds // 86400
-            remaining_hours = (remaining_seconds % 86400) // 3600
             
-            days_borrowed = max(1, (now - loan["borrowed_at"]) // 86400)
+            elapsed = now - loan["borrowed_at"]
+            days_borrowed = elapsed // 86400 if elapsed >= 86400 else 1
             interest = int(loan["principal"] * loan["interest_rate"] * days_borrowed)
             total_due = loan["principal"] + interest
             
@@ -300,12 +357,15 @@ class PlayerHandler:
             
             if remaining_seconds <= 0:
                 time_str = "⚠️ 已逾期！"
-            elif remaining_days <= 0:
-                time_str = f"🔴 {remaining_hours}小时"
-            elif remaining_days <= 1:
-                time_str = f"🟠 {remaining_days}天{remaining_hours}小时"
             else:
-                time_str = f"🟡 {remaining_days}天"
+                remaining_days, remaining_rem = divmod(remaining_seconds, 86400)
+                remaining_hours = remaining_rem // 3600
+                if remaining_days <= 0:
+                    time_str = f"🔴 {remaining_hours}小时"
+                elif remaining_days <= 1:
+                    time_str = f"🟠 {remaining_days}天{remaining_hours}小时"
+                else:
+                    time_str = f"🟡 {remaining_days}天"
             
             reply_msg += (
                 f"\n"
@@ -320,41 +380,6 @@ class PlayerHandler:
         
         yield event.plain_result(reply_msg)
 
-    def _get_effect_name(self, effect_key: str) -> str:
-        """获取效果名称"""
-        effect_names = {
-            "critical_rate": "暴击率",
-            "critical_damage": "暴击伤害",
-            "dodge_rate": "闪避率",
-            "hit_rate": "命中率",
-            "speed": "速度",
-            "physical_damage": "物伤",
-            "magic_damage": "法伤",
-            "physical_defense": "物防",
-            "magic_defense": "法防",
-            "hp_bonus": "HP",
-            "mp_bonus": "MP",
-            "lifesteal": "生命偷取",
-        }
-        return effect_names.get(effect_key, effect_key)
-    
-    def _get_modifier_name(self, mod_key: str) -> str:
-        """获取成长修正名称"""
-        modifier_names = {
-            "physical_attack": "物攻成长",
-            "magic_attack": "法攻成长",
-            "physical_defense": "物防成长",
-            "magic_defense": "法防成长",
-            "hp": "HP成长",
-            "mp": "MP成长",
-            "speed": "速度成长",
-            "lifespan": "寿命成长",
-            "mental_power": "精神力成长",
-            "blood_qi": "气血成长",
-            "spiritual_qi": "灵气成长",
-        }
-        return modifier_names.get(mod_key, mod_key)
-
     @player_required
     async def handle_start_cultivation(self, player: Player, event: AstrMessageEvent):
         """处理闭关指令"""
@@ -366,7 +391,7 @@ class PlayerHandler:
         # 检查是否在其他活动中（历练、秘境探索等）
         user_cd = await self.db.ext.get_user_cd(player.user_id)
         if user_cd and user_cd.type != UserStatus.IDLE:
-            current_status = UserStatus.get_name(user_cd.type)
+            current_status = _STATUS_NAMES.get(user_cd.type, "忙碌中")
             yield event.plain_result(f"❌ 道友当前正{current_status}，无法闭关修炼！")
             return
 
@@ -422,18 +447,15 @@ class PlayerHandler:
         # 获取主修心法的修为加成
         technique_bonus = 0.0
         if player.main_technique:
-            from ..core import EquipmentManager
-            equipment_manager = EquipmentManager(self.db, self.config_manager)
-            equipped_items = equipment_manager.get_equipped_items(
+            equipped_by_type = self.equipment_manager.get_equipped_items_by_type(
                 player,
                 self.config_manager.items_data,
                 self.config_manager.weapons_data
             )
             # 找到主修心法
-            for item in equipped_items:
-                if item.item_type == "main_technique":
-                    technique_bonus = item.exp_multiplier
-                    break
+            technique_item = equipped_by_type.get("main_technique")
+            if technique_item:
+                technique_bonus = technique_item.exp_multiplier
 
         # 计算获得的修为（使用有效时长）
         gained_exp = self.cultivation_manager.calculate_cultivation_exp(
@@ -444,38 +466,34 @@ class PlayerHandler:
         )
 
         # ========== 计算HP/MP回复 ==========
-        # 基础回复率：每分钟回复 0.5% 的最大HP/MP
+        # 基础回复率：每分钟回复 0.5% 的最大HP/MP（以万分比整数计算）
         # 功法加成：如果有主修心法，额外增加回复效率
-        base_recovery_rate = 0.005  # 每分钟 0.5%
+        base_recovery_bp = 50  # 每分钟 0.5%
         
         # 功法回复加成
-        technique_recovery_bonus = 0.0
+        technique_recovery_bp = 0
         if player.main_technique:
             technique_config = self.config_manager.get_technique_by_name(player.main_technique)
             if technique_config:
                 passive_effects = technique_config.get("passive_effects", {})
-                technique_recovery_bonus = passive_effects.get("regeneration", 0)
+                technique_recovery_bp = round(passive_effects.get("regeneration", 0) * 10000)
         
-        # 计算总回复率
-        total_recovery_rate = base_recovery_rate + technique_recovery_bonus
+        # 计算总回复率（万分比）
+        total_recovery_bp = base_recovery_bp + technique_recovery_bp
         
-        # 计算回复量（使用有效时长）
-        hp_recovery_percent = min(1.0, effective_minutes * total_recovery_rate)
-        mp_recovery_percent = min(1.0, effective_minutes * total_recovery_rate)
+        # 计算回复比例（使用有效时长，HP/MP共用，最多100%）
+        recovery_bp = min(10000, effective_minutes * total_recovery_bp)
         
-        # 计算实际回复量
-        hp_before = player.hp
-        mp_before = player.mp
-        
-        hp_recovery = int(player.max_hp * hp_recovery_percent)
-        mp_recovery = int(player.max_mp * mp_recovery_percent)
+        # 计算实际回复量（不超过缺失的HP/MP）
+        hp_recovery = min(player.max_hp - player.hp, player.max_hp * recovery_bp // 10000)
+        mp_recovery = min(player.max_mp - player.mp, player.max_mp * recovery_bp // 10000)
         
         # 应用回复
-        player.hp = min(player.max_hp, player.hp + hp_recovery)
-        player.mp = min(player.max_mp, player.mp + mp_recovery)
+        player.hp += hp_recovery
+        player.mp += mp_recovery
         
-        actual_hp_recovery = player.hp - hp_before
-        actual_mp_recovery = player.mp - mp_before
+        actual_hp_recovery = hp_recovery
+        actual_mp_recovery = mp_recovery
 
         # 更新玩家数据
         player.experience += gained_exp
@@ -523,7 +541,7 @@ class PlayerHandler:
     async def handle_check_in(self, player: Player, event: AstrMessageEvent):
         """处理签到指令"""
         # 获取今天的日期（格式：YYYY-MM-DD）
-        today = datetime.now().strftime("%Y-%m-%d")
+        today = _get_today_str()
 
         # 检查是否已经签到过
         if player.last_check_in_date == today:
@@ -533,16 +551,8 @@ class PlayerHandler:
             )
             return
 
-        # 获取签到奖励范围配置
-        check_in_gold_min = self.config["VALUES"].get("CHECK_IN_GOLD_MIN", 50)
-        check_in_gold_max = self.config["VALUES"].get("CHECK_IN_GOLD_MAX", 500)
-
-        # 确保最小值不大于最大值
-        if check_in_gold_min > check_in_gold_max:
-            check_in_gold_min, check_in_gold_max = check_in_gold_max, check_in_gold_min
-
         # 生成随机奖励
-        check_in_gold = random.randint(check_in_gold_min, check_in_gold_max)
+        check_in_gold = random.randint(*self._check_in_range)
 
         # 更新玩家数据
         player.gold += check_in_gold
@@ -564,7 +574,7 @@ class PlayerHandler:
         """弃道重修（1小时冷却）"""
         user_cd = await self.db.ext.get_user_cd(player.user_id)
         if user_cd and user_cd.type != UserStatus.IDLE:
-            status_name = UserStatus.get_name(user_cd.type)
+            status_name = _STATUS_NAMES.get(user_cd.type, "忙碌中")
             yield event.plain_result(f"❌ 你当前正在「{status_name}」，无法弃道重修。")
             return
 
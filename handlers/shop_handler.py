@@ -2,6 +2,7 @@
 
 import time
 import re
+from bisect import bisect_right
 from astrbot.api.event import AstrMessageEvent
 from astrbot.api import AstrBotConfig, logger
 from ..data import DataBase
@@ -13,6 +14,26 @@ from .utils import player_required
 
 __all__ = ["ShopHandler"]
 
+# 购买时按此顺序查找物品所在阁楼
+PAVILION_IDS = ("pill_pavilion", "weapon_pavilion", "treasure_pavilion")
+
+# 技能书品级推断：境界或价格达到对应门槛即升一级，取两者中较高的品级
+_SKILL_RANKS = ("凡品", "灵品", "地品", "天品", "皇品", "帝品", "仙品")
+_SKILL_RANK_LEVEL_THRESHOLDS = (2, 4, 7, 10, 15, 20)
+_SKILL_RANK_PRICE_THRESHOLDS = (1000, 2000, 5000, 10000, 20000, 50000)
+
+# 旧系统丹药效果：(配置键, 玩家属性, 提示名称)，属性为None的需特殊处理
+_LEGACY_PILL_EFFECTS = (
+    ('add_hp', None, None),
+    ('add_experience', 'experience', "修为"),
+    ('add_max_hp', None, None),
+    ('add_spiritual_power', 'magic_damage', "法伤"),      # 灵力映射到法伤
+    ('add_mental_power', 'mental_power', "精神力"),
+    ('add_attack', 'physical_damage', "物伤"),            # 攻击力映射到物伤
+    ('add_defense', 'physical_defense', "物防"),          # 防御力映射到物防
+    ('add_gold', 'gold', "灵石"),
+)
+
 class ShopHandler:
     """商店处理器"""
     
@@ -45,30 +66,36 @@ class ShopHandler:
             for user_id in access_control.get("SHOP_MANAGERS", [])
         }
 
-    async def _ensure_pavilion_refreshed(self, pavilion_id: str, item_getter, count: int) -> None:
-        """确保阁楼已刷新"""
-        last_refresh_time, current_items = await self.db.get_shop_data(pavilion_id)
-        if current_items:
-            updated = self.shop_manager.ensure_items_have_stock(current_items)
-            if updated:
-                await self.db.update_shop_data(pavilion_id, last_refresh_time, current_items)
-        refresh_hours = self.config.get("PAVILION_REFRESH_HOURS", 1)
-        if not current_items or self.shop_manager.should_refresh_shop(last_refresh_time, refresh_hours):
-            new_items = self.shop_manager.generate_pavilion_items(item_getter, count)
-            await self.db.update_shop_data(pavilion_id, int(time.time()), new_items)
+    async def _ensure_pavilion_refreshed(self, pavilion_id: str, item_getter, count: int, now: int) -> tuple:
+        """确保阁楼已刷新
+
+        Returns:
+            (last_refresh_time, current_items) 刷新后的阁楼数据
+        """
+        return await self._refresh_pavilion_if_needed(
+            pavilion_id, lambda: self.shop_manager.generate_pavilion_items(item_getter, count), now
+        )
 
-    async def _ensure_treasure_pavilion_refreshed(self) -> None:
-        """确保百宝阁已刷新（特殊逻辑：技能书+功法+材料，不含丹药和武器防具）"""
-        pavilion_id = "treasure_pavilion"
+    async def _ensure_treasure_pavilion_refreshed(self, now: int) -> tuple:
+        """确保百宝阁已刷新（特殊逻辑：技能书+功法+材料，不含丹药和武器防具）
+
+        Returns:
+            (last_refresh_time, current_items) 刷新后的百宝阁数据
+        """
+        return await self._refresh_pavilion_if_needed("treasure_pavilion", self._generate_treasure_pavilion_items, now)
+
+    async def _refresh_pavilion_if_needed(self, pavilion_id: str, generate_items, now: int) -> tuple:
+        """读取阁楼数据，到期则重新生成；每种情况最多写库一次"""
         last_refresh_time, current_items = await self.db.get_shop_data(pavilion_id)
-        if current_items:
-            updated = self.shop_manager.ensure_items_have_stock(current_items)
-            if updated:
-                await self.db.update_shop_data(pavilion_id, last_refresh_time, current_items)
         refresh_hours = self.config.get("PAVILION_REFRESH_HOURS", 1)
-        if not current_items or self.shop_manager.should_refresh_shop(last_refresh_time, refresh_hours):
-            new_items = self._generate_treasure_pavilion_items()
-            await self.db.update_shop_data(pavilion_id, int(time.time()), new_items)
+        if not current_items or self.shop_manager.should_refresh_shop(last_refresh_time, refresh_hours, now):
+            # 即将整体覆盖，无需先补全旧数据的库存字段
+            last_refresh_time = now
+            current_items = generate_items()
+            await self.db.update_shop_data(pavilion_id, last_refresh_time, current_items)
+        elif self.shop_manager.ensure_items_have_stock(current_items):
+            await self.db.update_shop_data(pavilion_id, last_refresh_time, current_items)
+        return last_refresh_time, current_items
 
     def _generate_treasure_pavilion_items(self) -> list:
         """生成百宝阁物品列表（技能书+功法+材料，不含丹药、武器防具和储物戒）"""
@@ -81,27 +108,10 @@ class ShopHandler:
         skills_data = self.config_manager.get_all_skills()
         
         if skills_data:
-            skill_list = list(skills_data.values())
-            # 按权重随机选择
+            # 按权重随机选择（权重为0的不参与）
+            skill_list = [s for s in skills_data.values() if s.get("shop_weight", 100) > 0]
             weights = [s.get("shop_weight", 100) for s in skill_list]
-            selected_skills = []
-            
-            for _ in range(min(skill_count, len(skill_list))):
-                if not skill_list:
-                    break
-                # 加权随机选择
-                total_weight = sum(weights)
-                if total_weight <= 0:
-                    break
-                r = random.uniform(0, total_weight)
-                cumulative = 0
-                for i, (skill, weight) in enumerate(zip(skill_list, weights)):
-                    cumulative += weight
-                    if r <= cumulative:
-                        selected_skills.append(skill)
-                        skill_list.pop(i)
-                        weights.pop(i)
-                        break
+            selected_skills = self.shop_manager.weighted_sample(skill_list, weights, skill_count)
             
             for skill in selected_skills:
                 items.append({
@@ -122,25 +132,9 @@ class ShopHandler:
         techniques_data = self.config_manager.get_all_techniques()
         
         if techniques_data:
-            technique_list = list(techniques_data.values())
+            technique_list = [t for t in techniques_data.values() if t.get("shop_weight", 100) > 0]
             weights = [t.get("shop_weight", 100) for t in technique_list]
-            selected_techniques = []
-            
-            for _ in range(min(technique_count, len(technique_list))):
-                if not technique_list:
-                    break
-                total_weight = sum(weights)
-                if total_weight <= 0:
-                    break
-                r = random.uniform(0, total_weight)
-                cumulative = 0
-                for i, (tech, weight) in enumerate(zip(technique_list, weights)):
-                    cumulative += weight
-                    if r <= cumulative:
-                        selected_techniques.append(tech)
-                        technique_list.pop(i)
-                        weights.pop(i)
-                        break
+            selected_techniques = self.shop_manager.weighted_sample(technique_list, weights, technique_count)
             
             for tech in selected_techniques:
                 tech_type = tech.get('type', 'technique')
@@ -164,24 +158,9 @@ class ShopHandler:
                 materials.append(item)
         
         if materials:
+            materials = [m for m in materials if m.get("shop_weight", 100) > 0]
             weights = [m.get("shop_weight", 100) for m in materials]
-            selected_materials = []
-            
-            for _ in range(min(material_count, len(materials))):
-                if not materials:
-                    break
-                total_weight = sum(weights)
-                if total_weight <= 0:
-                    break
-                r = random.uniform(0, total_weight)
-                cumulative = 0
-                for i, (mat, weight) in enumerate(zip(materials, weights)):
-                    cumulative += weight
-                    if r <= cumulative:
-                        selected_materials.append(mat)
-                        materials.pop(i)
-                        weights.pop(i)
-                        break
+            selected_materials = self.shop_manager.weighted_sample(materials, weights, material_count)
             
             for mat in selected_materials:
                 items.append({
@@ -202,61 +181,49 @@ class ShopHandler:
         """根据技能属性推断品级"""
         required_level = skill.get('required_level_index', 0)
         price = skill.get('price', 0)
-        
-        if required_level >= 20 or price >= 50000:
-            return "仙品"
-        elif required_level >= 15 or price >= 20000:
-            return "帝品"
-        elif required_level >= 10 or price >= 10000:
-            return "皇品"
-        elif required_level >= 7 or price >= 5000:
-            return "天品"
-        elif required_level >= 4 or price >= 2000:
-            return "地品"
-        elif required_level >= 2 or price >= 1000:
-            return "灵品"
-        else:
-            return "凡品"
+        rank_index = max(
+            bisect_right(_SKILL_RANK_LEVEL_THRESHOLDS, required_level),
+            bisect_right(_SKILL_RANK_PRICE_THRESHOLDS, price),
+        )
+        return _SKILL_RANKS[rank_index]
 
     async def handle_pill_pavilion(self, event: AstrMessageEvent):
         """处理丹阁命令 - 展示丹药列表"""
         count = self.config.get("PAVILION_PILL_COUNT", 20)
-        await self._ensure_pavilion_refreshed("pill_pavilion", self.shop_manager.get_pills_for_display, count)
-        last_refresh, items = await self.db.get_shop_data("pill_pavilion")
+        now = int(time.time())
+        last_refresh, items = await self._ensure_pavilion_refreshed("pill_pavilion", self.shop_manager.get_pills_for_display, count, now)
         if not items:
             yield event.plain_result("丹阁暂无丹药出售。")
             return
         refresh_hours = self.config.get("PAVILION_REFRESH_HOURS", 1)
-        display = self.shop_manager.format_pavilion_display("丹阁", items, refresh_hours, last_refresh)
+        display = self.shop_manager.format_pavilion_display("丹阁", items, refresh_hours, last_refresh, now)
         yield event.plain_result(display)
 
     async def handle_weapon_pavilion(self, event: AstrMessageEvent):
         """处理器阁命令 - 展示武器列表"""
         count = self.config.get("PAVILION_WEAPON_COUNT", 20)
-        await self._ensure_pavilion_refreshed("weapon_pavilion", self.shop_manager.get_weapons_for_display, count)
-        last_refresh, items = await self.db.get_shop_data("weapon_pavilion")
+        now = int(time.time())
+        last_refresh, items = await self._ensure_pavilion_refreshed("weapon_pavilion", self.shop_manager.get_weapons_for_display, count, now)
         if not items:
             yield event.plain_result("器阁暂无武器出售。")
             return
         refresh_hours = self.config.get("PAVILION_REFRESH_HOURS", 1)
-        display = self.shop_manager.format_pavilion_display("器阁", items, refresh_hours, last_refresh)
+        display = self.shop_manager.format_pavilion_display("器阁", items, refresh_hours, last_refresh, now)
         yield event.plain_result(display)
 
     async def handle_treasure_pavilion(self, event: AstrMessageEvent):
         """处理百宝阁命令 - 展示技能书、功法和特殊物品"""
-        await self._ensure_treasure_pavilion_refreshed()
-        last_refresh, items = await self.db.get_shop_data("treasure_pavilion")
+        now = int(time.time())
+        last_refresh, items = await self._ensure_treasure_pavilion_refreshed(now)
         if not items:
             yield event.plain_result("百宝阁暂无物品出售。")
             return
         refresh_hours = self.config.get("PAVILION_REFRESH_HOURS", 1)
-        display = self._format_treasure_pavilion_display(items, refresh_hours, last_refresh)
+        display = self._format_treasure_pavilion_display(items, refresh_hours, last_refresh, now)
         yield event.plain_result(display)
 
-    def _format_treasure_pavilion_display(self, items: list, refresh_hours: int, last_refresh: int) -> str:
+    def _format_treasure_pavilion_display(self, items: list, refresh_hours: int, last_refresh: int, now: int) -> str:
         """格式化百宝阁显示"""
-        import time as time_module
-        
         lines = [
             "🏛️ 【百宝阁】",
             "━━━━━━━━━━━━━━━",
@@ -298,7 +265,6 @@ class ShopHandler:
             lines.append("")
         
         # 刷新时间
-        now = int(time_module.time())
         next_refresh = last_refresh + refresh_hours * 3600
         remaining = max(0, next_refresh - now)
         hours = remaining // 3600
@@ -312,8 +278,9 @@ class ShopHandler:
 
     async def _find_item_in_pavilions(self, item_name: str):
         """在所有阁楼中查找物品"""
-        for pavilion_id in ["pill_pavilion", "weapon_pavilion", "treasure_pavilion"]:
-            _, items = await self.db.get_shop_data(pavilion_id)
+        shops_data = await self.db.get_shops_data(PAVILION_IDS)
+        for pavilion_id in PAVILION_IDS:
+            _, items = shops_data.get(pavilion_id, (0, []))
             if items:
                 for item in items:
                     if item['name'] == item_name and item.get('stock', 0) > 0:
@@ -652,82 +619,47 @@ class ShopHandler:
         effect_msgs = []
         pill_name = item['name']
 
+        # 只保留该丹药实际配置的效果，普通属性的提示文本预先生成
+        active_effects = []
+        for key, attr, label in _LEGACY_PILL_EFFECTS:
+            if key not in effects:
+                continue
+            value = effects[key]
+            msg = None
+            if label:
+                msg = f"{label}+{value}" if value > 0 else f"{label}{value}"
+            active_effects.append((key, attr, value, msg))
+
         # 处理各种效果（乘以数量）
         for _ in range(quantity):
-            # 恢复/扣除气血
-            if 'add_hp' in effects:
-                hp_change = effects['add_hp']
-                if player.cultivation_type == "体修":
-                    old_blood = player.blood_qi
-                    player.blood_qi = max(0, min(player.max_blood_qi, player.blood_qi + hp_change))
-                    if hp_change > 0:
-                        effect_msgs.append(f"气血+{player.blood_qi - old_blood}")
+            for key, attr, value, msg in active_effects:
+                if attr is not None:
+                    setattr(player, attr, getattr(player, attr) + value)
+                    effect_msgs.append(msg)
+                elif key == 'add_hp':
+                    # 恢复/扣除气血
+                    if player.cultivation_type == "体修":
+                        old_blood = player.blood_qi
+                        player.blood_qi = max(0, min(player.max_blood_qi, player.blood_qi + value))
+                        if value > 0:
+                            effect_msgs.append(f"气血+{player.blood_qi - old_blood}")
+                        else:
+                            effect_msgs.append(f"气血{value}")
                     else:
-                        effect_msgs.append(f"气血{hp_change}")
+                        old_qi = player.spiritual_qi
+                        player.spiritual_qi = max(0, min(player.max_spiritual_qi, player.spiritual_qi + value))
+                        if value > 0:
+                            effect_msgs.append(f"灵气+{player.spiritual_qi - old_qi}")
+                        else:
+                            effect_msgs.append(f"灵气{value}")
                 else:
-                    old_qi = player.spiritual_qi
-                    player.spiritual_qi = max(0, min(player.max_spiritual_qi, player.spiritual_qi + hp_change))
-                    if hp_change > 0:
-                        effect_msgs.append(f"灵气+{player.spiritual_qi - old_qi}")
+                    # 增加最大气血/灵气上限
+                    if player.cultivation_type == "体修":
+                        player.max_blood_qi += value
+                        effect_msgs.append(f"最大气血+{value}")
                     else:
-                        effect_msgs.append(f"灵气{hp_change}")
-
-            # 增加修为
-            if 'add_experience' in effects:
-                exp_gain = effects['add_experience']
-                player.experience += exp_gain
-                effect_msgs.append(f"修为+{exp_gain}")
-
-            # 增加最大气血/灵气上限
-            if 'add_max_hp' in effects:
-                max_hp_gain = effects['add_max_hp']
-                if player.cultivation_type == "体修":
-                    player.max_blood_qi += max_hp_gain
-                    effect_msgs.append(f"最大气血+{max_hp_gain}")
-                else:
-                    player.max_spiritual_qi += max_hp_gain
-                    effect_msgs.append(f"最大灵气+{max_hp_gain}")
-
-            # 增加灵力（映射到法伤）
-            if 'add_spiritual_power' in effects:
-                sp_gain = effects['add_spiritual_power']
-                player.magic_damage += sp_gain
-                effect_msgs.append(f"法伤+{sp_gain}")
-
-            # 增加精神力
-            if 'add_mental_power' in effects:
-                mp_gain = effects['add_mental_power']
-                player.mental_power += mp_gain
-                effect_msgs.append(f"精神力+{mp_gain}")
-
-            # 增加攻击力（映射到物伤）
-            if 'add_attack' in effects:
-                atk_gain = effects['add_attack']
-                player.physical_damage += atk_gain
-                if atk_gain > 0:
-                    effect_msgs.append(f"物伤+{atk_gain}")
-                else:
-                    effect_msgs.append(f"物伤{atk_gain}")
-
-            # 增加防御力（映射到物防）
-            if 'add_defense' in effects:
-                def_gain = effects['add_defense']
-                player.physical_defense += def_gain
-                if def_gain > 0:
-                    effect_msgs.append(f"物防+{def_gain}")
-                else:
-                    effect_msgs.append(f"物防{def_gain}")
-
-            # 增加/扣除灵石
-            if 'add_gold' in effects:
-                gold_change = effects['add_gold']
-                player.gold += gold_change
-                if gold_change > 0:
-                    effect_msgs.append(f"灵石+{gold_change}")
-                else:
-                    effect_msgs.append(f"灵石{gold_change}")
-
-           
+                        player.max_spiritual_qi += value
+                        effect_msgs.append(f"最大灵气+{value}")
 
         # 确保属性不为负
         player.physical_damage = max(0, player.physical_damage)
@@ -742,9 +674,8 @@ class ShopHandler:
 
         # 去重效果消息
         unique_effects = list(dict.fromkeys(effect_msgs))
-        effects_str = "、".join(unique_effects[:5])  # 最多显示5个效果
-        if len(unique_effects) > 5:
-            effects_str += "..."
+        ellipsis = "..." if len(unique_effects) > 5 else ""
+        effects_str = "、".join(unique_effects[:5]) + ellipsis  # 最多显示5个效果
 
         qty_str = f"x{quantity}" if quantity > 1 else ""
         return True, f"服用【{pill_name}】{qty_str}成功！效果：{effects_str}"
@@ -10,6 +10,40 @@ from ..config_manager import ConfigManager
 from ..core.skill_manager import SkillManager
 from .utils import player_required
 
+# 分隔线与各命令的标题行
+_SEP = "━━━━━━━━━━━━━━━"
+_SKILL_LIST_HEADER = ("📚 【技能列表】", _SEP)
+_SKILL_INFO_HEADER = ("📜 【技能详情】", _SEP)
+_AVAILABLE_SKILLS_HEADER = ("📚 【可学技能】", _SEP)
+
+# 可学技能展示行模板
+_AVAILABLE_NAME_TEMPLATE = "  • {name}"
+_AVAILABLE_ROW_TEMPLATE = "    MP:{mp} | {lvl} | {price:,}灵石"
+
+# 技能效果描述模板：(数值<1时按百分比, 数值>=1时按整数)，无整数形式的为None
+_EFFECT_TEMPLATES = {
+    "stun": ("眩晕目标{d}回合", None),
+    "freeze": ("冰冻目标{d}回合", None),
+    "paralysis": ("麻痹目标{d}回合", None),
+    "confusion": ("使目标混乱{d}回合", None),
+    "bleed": ("使目标流血{d}回合，每回合损失{v:.0%}最大HP", "使目标流血{d}回合，每回合损失{v}HP"),
+    "burn": ("灼烧目标{d}回合，每回合损失{v:.0%}最大HP", "灼烧目标{d}回合，每回合损失{v}HP"),
+    "poison": ("使目标中毒{d}回合，每回合损失{v:.0%}最大HP", "使目标中毒{d}回合，每回合损失{v}HP"),
+    "slow": ("减速目标{d}回合，速度降低{v:.0%}", None),
+    "armor_break": ("破甲{d}回合，物防降低{v:.0%}", None),
+    "magic_break": ("破法{d}回合，法防降低{v:.0%}", None),
+    "defense_boost": ("提升自身防御{d}回合，防御提升{v:.0%}", None),
+    "attack_boost": ("提升自身攻击{d}回合，攻击提升{v:.0%}", None),
+    "dodge_boost": ("提升自身闪避{d}回合，闪避率提升{v:.0%}", None),
+    "critical_boost": ("提升自身暴击{d}回合，暴击率提升{v:.0%}", None),
+    "speed_boost": ("提升自身速度{d}回合，速度提升{v:.0%}", None),
+    "shield": ("获得护盾，吸收{v:.0%}最大HP的伤害", "获得{v}点护盾"),
+    "heal": ("恢复{v:.0%}最大HP", "恢复{v}HP"),
+    "self_damage": ("自身受到{v:.0%}最大HP的伤害", "自身受到{v}点伤害"),
+    "mp_burn": ("燃烧目标{v:.0%}最大MP", "燃烧目标{v}MP"),
+    "purify": ("净化自身一个负面效果", None),
+}
+
 
 class SkillHandler:
     """技能相关命令处理器"""
@@ -18,6 +52,10 @@ class SkillHandler:
         self.db = db
         self.config_manager = config_manager
         self.skill_manager = SkillManager(db, config_manager)
+        # 可学技能展示行缓存（skill_id -> 两行文本），技能配置为静态数据
+        self._available_row_cache = {}
+        # 灵修境界名称（按索引），缺少名称的为None
+        self._level_names = tuple(level.get("level_name") for level in config_manager.level_data)
     
     @player_required
     async def handle_skill_list(self, player: Player, event: AstrMessageEvent) -> str:
@@ -25,16 +63,11 @@ class SkillHandler:
         
         显示已学技能和已装备技能
         """
-        # 获取玩家技能概览
-        summary = self.skill_manager.get_player_skills_summary(player)
-        
-        lines = [
-            "📚 【技能列表】",
-            "━━━━━━━━━━━━━━━"
-        ]
+        lines = list(_SKILL_LIST_HEADER)
         
         # 已装备技能
         equipped_skills = player.get_equipped_skills()
+        equipped_set = frozenset(equipped_skills)
         equipped_configs = self.skill_manager.get_equipped_skill_configs(player)
         
         lines.append(f"⚔️ 已装备技能 ({len(equipped_skills)}/{SkillManager.MAX_EQUIPPED_SKILLS})：")
@@ -58,14 +91,7 @@ class SkillHandler:
         
         if learned_configs:
             # 按伤害类型分组
-            physical_skills = []
-            magic_skills = []
-            
-            for skill in learned_configs:
-                if skill.get("damage_type") == "physical":
-                    physical_skills.append(skill)
-                else:
-                    magic_skills.append(skill)
+            physical_skills, magic_skills = self.skill_manager.partition_skills(learned_configs)
             
             if physical_skills:
                 lines.append("  【物理技能】")
@@ -73,7 +99,7 @@ class SkillHandler:
                     skill_id = skill.get("id", "")
                     skill_name = skill.get("name", "未知")
                     mp_cost = skill.get("mp_cost", 0)
-                    is_equipped = skill_id in equipped_skills
+                    is_equipped = skill_id in equipped_set
                     equipped_mark = " ✓" if is_equipped else ""
                     lines.append(f"    • {skill_name} (MP:{mp_cost}){equipped_mark}")
             
@@ -83,14 +109,14 @@ class SkillHandler:
                     skill_id = skill.get("id", "")
                     skill_name = skill.get("name", "未知")
                     mp_cost = skill.get("mp_cost", 0)
-                    is_equipped = skill_id in equipped_skills
+                    is_equipped = skill_id in equipped_set
                     equipped_mark = " ✓" if is_equipped else ""
                     lines.append(f"    • {skill_name} (MP:{mp_cost}){equipped_mark}")
         else:
             lines.append("  (无)")
         
         lines.append("")
-        lines.append("━━━━━━━━━━━━━━━")
+        lines.append(_SEP)
         lines.append("💡 提示：")
         lines.append("  装备技能 <名称> - 装备技能")
         lines.append("  卸下技能 <名称> - 卸下技能")
@@ -193,10 +219,7 @@ class SkillHandler:
             return f"❌ 未找到名为【{skill_name}】的技能！"
         
         # 生成技能详细信息
-        lines = [
-            "📜 【技能详情】",
-            "━━━━━━━━━━━━━━━"
-        ]
+        lines = list(_SKILL_INFO_HEADER)
         
         # 基础信息
         name = skill_config.get("name", "未知")
@@ -207,35 +230,37 @@ class SkillHandler:
         type_text = "主动" if skill_type == "active" else "被动"
         damage_type_text = "物理" if damage_type == "physical" else "法术"
         
-        lines.append(f"📛 名称：{name}")
-        lines.append(f"🏷️ 类型：{type_text} | {damage_type_text}")
-        lines.append(f"📝 描述：{description}")
-        lines.append("")
+        lines.extend((
+            f"📛 名称：{name}",
+            f"🏷️ 类型：{type_text} | {damage_type_text}",
+            f"📝 描述：{description}",
+            "",
+        ))
         
         # 消耗与冷却
         mp_cost = skill_config.get("mp_cost", 0)
         cooldown = skill_config.get("cooldown", 0)
         
-        lines.append("⚡ 消耗与冷却：")
-        lines.append(f"  MP消耗：{mp_cost}")
-        if cooldown > 0:
-            lines.append(f"  冷却时间：{cooldown}回合")
-        else:
-            lines.append("  冷却时间：无")
-        lines.append("")
+        lines.extend((
+            "⚡ 消耗与冷却：",
+            f"  MP消耗：{mp_cost}",
+            f"  冷却时间：{cooldown}回合" if cooldown > 0 else "  冷却时间：无",
+            "",
+        ))
         
         # 伤害信息
         damage_config = skill_config.get("damage", {})
         base_damage = damage_config.get("base", 0)
         attack_ratio = damage_config.get("attack_ratio", 1.0)
         
-        lines.append("💥 伤害计算：")
-        lines.append(f"  基础伤害：{base_damage}")
-        lines.append(f"  攻击倍率：{attack_ratio:.1f}x")
-        
         atk_type = "物攻" if damage_type == "physical" else "法攻"
-        lines.append(f"  公式：{base_damage} + {atk_type} × {attack_ratio:.1f}")
-        lines.append("")
+        lines.extend((
+            "💥 伤害计算：",
+            f"  基础伤害：{base_damage}",
+            f"  攻击倍率：{attack_ratio:.1f}x",
+            f"  公式：{base_damage} + {atk_type} × {attack_ratio:.1f}",
+            "",
+        ))
         
         # 技能效果
         effects = skill_config.get("effects", [])
@@ -248,40 +273,30 @@ class SkillHandler:
                 chance = effect.get("chance", 1.0)
                 
                 effect_desc = self._get_effect_description(effect_type, value, duration)
-                if chance < 1.0:
-                    effect_desc += f" ({chance:.0%}概率)"
-                
-                lines.append(f"  • {effect_desc}")
+                chance_text = f" ({chance:.0%}概率)" if chance < 1.0 else ""
+                lines.append(f"  • {effect_desc}{chance_text}")
             lines.append("")
         
         # 生命偷取
         lifesteal = skill_config.get("lifesteal", 0)
         if lifesteal > 0:
-            lines.append(f"🩸 生命偷取：{lifesteal:.0%}")
-            lines.append("")
+            lines.extend((f"🩸 生命偷取：{lifesteal:.0%}", ""))
         
         # MP耗尽惩罚
         mp_penalty = skill_config.get("mp_exhausted_penalty", 0)
         if mp_penalty > 0:
-            lines.append(f"⚠️ MP耗尽惩罚：受到{mp_penalty:.0%}最大HP的反噬伤害")
-            lines.append("")
+            lines.extend((f"⚠️ MP耗尽惩罚：受到{mp_penalty:.0%}最大HP的反噬伤害", ""))
         
         # 学习要求
         required_level = skill_config.get("required_level_index", 0)
         price = skill_config.get("price", 0)
         
         lines.append("📋 学习要求：")
-        
-        # 获取境界名称
-        level_name = f"境界{required_level}"
-        if self.config_manager.level_data and required_level < len(self.config_manager.level_data):
-            level_name = self.config_manager.level_data[required_level].get("level_name", level_name)
-        
-        lines.append(f"  境界要求：{level_name}")
+        lines.append(f"  境界要求：{self._get_level_name(required_level)}")
         if price > 0:
             lines.append(f"  学习费用：{price:,} 灵石")
         
-        lines.append("━━━━━━━━━━━━━━━")
+        lines.append(_SEP)
         
         return "\n".join(lines)
     
@@ -302,84 +317,64 @@ class SkillHandler:
                 "💡 提升境界可解锁更多技能"
             )
         
-        lines = [
-            "📚 【可学技能】",
-            "━━━━━━━━━━━━━━━"
-        ]
+        lines = list(_AVAILABLE_SKILLS_HEADER)
         
         # 按伤害类型分组
-        physical_skills = []
-        magic_skills = []
-        
-        for skill in available_skills:
-            if skill.get("damage_type") == "physical":
-                physical_skills.append(skill)
-            else:
-                magic_skills.append(skill)
+        physical_skills, magic_skills = self.skill_manager.partition_skills(available_skills)
         
         if physical_skills:
             lines.append("⚔️ 【物理技能】")
             for skill in physical_skills:
-                name = skill.get("name", "未知")
-                mp_cost = skill.get("mp_cost", 0)
-                price = skill.get("price", 0)
-                
-                # 获取境界要求
-                required_level = skill.get("required_level_index", 0)
-                level_name = f"境界{required_level}"
-                if self.config_manager.level_data and required_level < len(self.config_manager.level_data):
-                    level_name = self.config_manager.level_data[required_level].get("level_name", level_name)
-                
-                lines.append(f"  • {name}")
-                lines.append(f"    MP:{mp_cost} | {level_name} | {price:,}灵石")
+                lines.extend(self._get_available_skill_rows(skill))
             lines.append("")
         
         if magic_skills:
             lines.append("✨ 【法术技能】")
             for skill in magic_skills:
-                name = skill.get("name", "未知")
-                mp_cost = skill.get("mp_cost", 0)
-                price = skill.get("price", 0)
-                
-                # 获取境界要求
-                required_level = skill.get("required_level_index", 0)
-                level_name = f"境界{required_level}"
-                if self.config_manager.level_data and required_level < len(self.config_manager.level_data):
-                    level_name = self.config_manager.level_data[required_level].get("level_name", level_name)
-                
-                lines.append(f"  • {name}")
-                lines.append(f"    MP:{mp_cost} | {level_name} | {price:,}灵石")
+                lines.extend(self._get_available_skill_rows(skill))
             lines.append("")
         
-        lines.append("━━━━━━━━━━━━━━━")
+        lines.append(_SEP)
         lines.append(f"💰 当前灵石：{player.gold:,}")
         lines.append("💡 使用 '学习技能 <名称>' 来学习")
         
         return "\n".join(lines)
     
+    def _get_level_name(self, level_index: int) -> str:
+        """获取境界名称，未配置时返回“境界N”"""
+        if 0 <= level_index < len(self._level_names):
+            level_name = self._level_names[level_index]
+            if level_name is not None:
+                return level_name
+        return f"境界{level_index}"
+    
+    def _get_available_skill_rows(self, skill: dict) -> tuple:
+        """获取技能在可学列表中的展示行（按技能ID缓存）"""
+        skill_id = skill.get("id", "")
+        rows = self._available_row_cache.get(skill_id)
+        if rows is not None:
+            return rows
+        
+        name = skill.get("name", "未知")
+        mp_cost = skill.get("mp_cost", 0)
+        price = skill.get("price", 0)
+        
+        level_name = self._get_level_name(skill.get("required_level_index", 0))
+        rows = (
+            _AVAILABLE_NAME_TEMPLATE.format(name=name),
+            _AVAILABLE_ROW_TEMPLATE.format(mp=mp_cost, lvl=level_name, price=price),
+        )
+        if skill_id:
+            self._available_row_cache[skill_id] = rows
+        return rows
+    
     def _get_effect_description(self, effect_type: str, value: float, duration: int) -> str:
         """获取效果描述文本"""
-        effect_descriptions = {
-            "stun": f"眩晕目标{duration}回合",
-            "freeze": f"冰冻目标{duration}回合",
-            "paralysis": f"麻痹目标{duration}回合",
-            "confusion": f"使目标混乱{duration}回合",
-            "bleed": f"使目标流血{duration}回合，每回合损失{value:.0%}最大HP" if value < 1 else f"使目标流血{duration}回合，每回合损失{int(value)}HP",
-            "burn": f"灼烧目标{duration}回合，每回合损失{value:.0%}最大HP" if value < 1 else f"灼烧目标{duration}回合，每回合损失{int(value)}HP",
-            "poison": f"使目标中毒{duration}回合，每回合损失{value:.0%}最大HP" if value < 1 else f"使目标中毒{duration}回合，每回合损失{int(value)}HP",
-            "slow": f"减速目标{duration}回合，速度降低{value:.0%}",
-            "armor_break": f"破甲{duration}回合，物防降低{value:.0%}",
-            "magic_break": f"破法{duration}回合，法防降低{value:.0%}",
-            "defense_boost": f"提升自身防御{duration}回合，防御提升{value:.0%}",
-            "attack_boost": f"提升自身攻击{duration}回合，攻击提升{value:.0%}",
-            "dodge_boost": f"提升自身闪避{duration}回合，闪避率提升{value:.0%}",
-            "critical_boost": f"提升自身暴击{duration}回合，暴击率提升{value:.0%}",
-            "speed_boost": f"提升自身速度{duration}回合，速度提升{value:.0%}",
-            "shield": f"获得护盾，吸收{value:.0%}最大HP的伤害" if value < 1 else f"获得{int(value)}点护盾",
-            "heal": f"恢复{value:.0%}最大HP" if value < 1 else f"恢复{int(value)}HP",
-            "self_damage": f"自身受到{value:.0%}最大HP的伤害" if value < 1 else f"自身受到{int(value)}点伤害",
-            "mp_burn": f"燃烧目标{value:.0%}最大MP" if value < 1 else f"燃烧目标{int(value)}MP",
-            "purify": "净化自身一个负面效果",
-        }
-        
-        return effect_descriptions.get(effect_type, f"未知效果({effect_type})")
+        templates = _EFFECT_TEMPLATES.get(effect_type)
+        if templates is None:
+            return f"未知效果({effect_type})"
+        
+        pct_template, int_template = templates
+        if value < 1 or int_template is None:
+            return pct_template.format(d=duration, v=value)
+        return int_template.format(d=duration, v=int(value))
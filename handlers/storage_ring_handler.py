@@ -1,5 +1,6 @@
 # handlers/storage_ring_handler.py
 
+from functools import wraps
 from astrbot.api.event import AstrMessageEvent
 from astrbot.api.all import At, Plain
 from ..data import DataBase
@@ -31,9 +32,66 @@ ITEM_CATEGORIES = {
     "其他": []
 }
 
+_SEPARATOR = "=" * 28
+
+# 赠予指令可带的前缀形式（依次尝试剥离）
+_GIFT_PREFIXES = (f"#{CMD_GIFT_ITEM}", f"/{CMD_GIFT_ITEM}", CMD_GIFT_ITEM)
+
+# 储物戒信息末尾的固定操作提示
+_STORAGE_RING_FOOTER = (
+    f"\n{_SEPARATOR}\n"
+    f"取出：{CMD_RETRIEVE_ITEM} 物品名 [数量]\n"
+    f"搜索：{CMD_SEARCH_ITEM} 关键词\n"
+    f"升级：{CMD_UPGRADE_RING} 储物戒名"
+)
+
 __all__ = ["StorageRingHandler"]
 
 
+def _parse_item_count(args: str) -> tuple:
+    """解析“物品名 [数量]”参数，未指定数量时默认为1"""
+    head, sep, tail = args.rpartition(" ")
+    if sep and tail.isdigit():
+        return head, int(tail)
+    return args, 1
+
+
+def _with_item_and_count(usage: str):
+    """装饰器：解析“物品名 [数量]”参数并校验，向被装饰方法注入 item_name 与 count"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(self, player: Player, event: AstrMessageEvent, args: str):
+            if not args or not args.strip():
+                yield event.plain_result(usage)
+                return
+
+            item_name, count = _parse_item_count(args.strip())
+            if count <= 0:
+                yield event.plain_result("数量必须大于0")
+                return
+
+            async for result in func(self, player, event, item_name, count):
+                yield result
+        return wrapper
+    return decorator
+
+
+def _parse_at_and_text(message_chain) -> tuple:
+    """从消息链中提取首个 At 目标ID 与合并后的纯文本"""
+    target_id = None
+    text_parts = []
+    for comp in message_chain:
+        if isinstance(comp, At):
+            # 兼容多种At属性名
+            if target_id is None:
+                qq = getattr(comp, 'qq', None) or getattr(comp, 'target', None) or getattr(comp, 'uin', None)
+                if qq is not None:
+                    target_id = str(qq)
+        elif isinstance(comp, Plain):
+            text_parts.append(comp.text)
+    return target_id, "".join(text_parts)
+
+
 class StorageRingHandler:
     """储物戒系统处理器"""
 
@@ -45,45 +103,40 @@ class StorageRingHandler:
     @player_required
     async def handle_storage_ring(self, player: Player, event: AstrMessageEvent):
         """显示储物戒信息"""
+        srm = self.storage_ring_manager
         display_name = event.get_sender_name()
 
         # 获取储物戒信息
-        ring_info = self.storage_ring_manager.get_storage_ring_info(player)
-
-        lines = [
-            f"=== {display_name} 的储物戒 ===\n",
-            f"【{ring_info['name']}】（{ring_info['rank']}）\n",
-            f"{ring_info['description']}\n",
-            f"\n容量：{ring_info['used']}/{ring_info['capacity']}格\n",
-            f"━━━━━━━━━━━━━━━\n",
-        ]
+        ring_info = srm.get_storage_ring_info(player)
+
+        header = (
+            f"=== {display_name} 的储物戒 ===\n"
+            f"【{ring_info['name']}】（{ring_info['rank']}）\n"
+            f"{ring_info['description']}\n"
+            f"\n容量：{ring_info['used']}/{ring_info['capacity']}格\n"
+            f"━━━━━━━━━━━━━━━\n"
+        )
 
-        # 按分类显示存储的物品
+        # 按分类显示存储的物品（物品数量可变，仍用列表拼接）
         items = ring_info['items']
         if items:
+            body_lines = []
             categorized = self._categorize_items(items)
             for category, cat_items in categorized.items():
-                if cat_items:
-                    lines.append(f"【{category}】\n")
-                    for item_name, count in cat_items:
-                        if count > 1:
-                            lines.append(f"  · {item_name}×{count}\n")
-                        else:
-                            lines.append(f"  · {item_name}\n")
+                body_lines.append(f"【{category}】\n")
+                body_lines.append("".join(
+                    f"  · {n}×{c}\n" if c > 1 else f"  · {n}\n"
+                    for n, c in cat_items
+                ))
+            body = "".join(body_lines)
         else:
-            lines.append("【存储物品】空\n")
+            body = "【存储物品】空\n"
 
         # 空间警告
-        warning = self.storage_ring_manager.get_space_warning(player)
-        if warning:
-            lines.append(f"\n{warning}\n")
-
-        lines.append(f"\n{'=' * 28}\n")
-        lines.append(f"取出：{CMD_RETRIEVE_ITEM} 物品名 [数量]\n")
-        lines.append(f"搜索：{CMD_SEARCH_ITEM} 关键词\n")
-        lines.append(f"升级：{CMD_UPGRADE_RING} 储物戒名")
+        warning = srm.get_space_warning(player)
+        warning_text = f"\n{warning}\n" if warning else ""
 
-        yield event.plain_result("".join(lines))
+        yield event.plain_result(header + body + warning_text + _STORAGE_RING_FOOTER)
 
     @player_required
     async def handle_store_item(self, player: Player, event: AstrMessageEvent, args: str):
@@ -100,31 +153,13 @@ class StorageRingHandler:
         )
 
     @player_required
-    async def handle_retrieve_item(self, player: Player, event: AstrMessageEvent, args: str):
+    @_with_item_and_count(
+        f"请指定要取出的物品\n"
+        f"用法：{CMD_RETRIEVE_ITEM} 物品名 [数量]\n"
+        f"示例：{CMD_RETRIEVE_ITEM} 精铁 5"
+    )
+    async def handle_retrieve_item(self, player: Player, event: AstrMessageEvent, item_name: str, count: int):
         """从储物戒取出物品"""
-        if not args or args.strip() == "":
-            yield event.plain_result(
-                f"请指定要取出的物品\n"
-                f"用法：{CMD_RETRIEVE_ITEM} 物品名 [数量]\n"
-                f"示例：{CMD_RETRIEVE_ITEM} 精铁 5"
-            )
-            return
-
-        args = args.strip()
-        parts = args.rsplit(" ", 1)
-
-        # 解析物品名和数量
-        if len(parts) == 2 and parts[1].isdigit():
-            item_name = parts[0]
-            count = int(parts[1])
-        else:
-            item_name = args
-            count = 1
-
-        if count <= 0:
-            yield event.plain_result("数量必须大于0")
-            return
-
         # 取出物品
         success, message = await self.storage_ring_manager.retrieve_item(player, item_name, count)
 
@@ -134,32 +169,14 @@ class StorageRingHandler:
             yield event.plain_result(f"❌ {message}")
 
     @player_required
-    async def handle_discard_item(self, player: Player, event: AstrMessageEvent, args: str):
+    @_with_item_and_count(
+        f"请指定要丢弃的物品\n"
+        f"用法：{CMD_DISCARD_ITEM} 物品名 [数量]\n"
+        f"示例：{CMD_DISCARD_ITEM} 精铁 5\n"
+        f"⚠️ 丢弃的物品将永久销毁！"
+    )
+    async def handle_discard_item(self, player: Player, event: AstrMessageEvent, item_name: str, count: int):
         """丢弃储物戒中的物品"""
-        if not args or args.strip() == "":
-            yield event.plain_result(
-                f"请指定要丢弃的物品\n"
-                f"用法：{CMD_DISCARD_ITEM} 物品名 [数量]\n"
-                f"示例：{CMD_DISCARD_ITEM} 精铁 5\n"
-                f"⚠️ 丢弃的物品将永久销毁！"
-            )
-            return
-
-        args = args.strip()
-        parts = args.rsplit(" ", 1)
-
-        # 解析物品名和数量
-        if len(parts) == 2 and parts[1].isdigit():
-            item_name = parts[0]
-            count = int(parts[1])
-        else:
-            item_name = args
-            count = 1
-
-        if count <= 0:
-            yield event.plain_result("数量必须大于0")
-            return
-
         # 丢弃物品
         success, message = await self.storage_ring_manager.discard_item(player, item_name, count)
 
@@ -171,30 +188,17 @@ class StorageRingHandler:
     @player_required
     async def handle_gift_item(self, player: Player, event: AstrMessageEvent, args: str):
         """赠予物品给其他玩家"""
-        target_id = None
+        srm = self.storage_ring_manager
         item_name = None
         count = 1
 
         # 从消息链中提取 At 组件和 Plain 文本
-        text_parts = []
         message_chain = event.message_obj.message if hasattr(event, 'message_obj') and event.message_obj else []
-        
-        for comp in message_chain:
-            if isinstance(comp, At):
-                # 兼容多种At属性名
-                if target_id is None:
-                    if hasattr(comp, 'qq'):
-                        target_id = str(comp.qq)
-                    elif hasattr(comp, 'target'):
-                        target_id = str(comp.target)
-                    elif hasattr(comp, 'uin'):
-                        target_id = str(comp.uin)
-            elif isinstance(comp, Plain):
-                text_parts.append(comp.text)
-
-        # 合并文本内容并移除命令前缀
-        text_content = "".join(text_parts).strip()
-        for prefix in ["#赠予", "/赠予", "赠予"]:
+        target_id, text_content = _parse_at_and_text(message_chain)
+
+        # 移除命令前缀
+        text_content = text_content.strip()
+        for prefix in _GIFT_PREFIXES:
             if text_content.startswith(prefix):
                 text_content = text_content[len(prefix):].strip()
                 break
@@ -203,19 +207,16 @@ class StorageRingHandler:
         if not target_id and text_content:
             parts = text_content.split(None, 1)
             if len(parts) >= 1:
-                potential_id = parts[0].lstrip('@')
+                first = parts[0]
+                potential_id = first[1:] if first.startswith('@') else first
                 if potential_id.isdigit() and len(potential_id) >= 5:
                     target_id = potential_id
                     text_content = parts[1].strip() if len(parts) > 1 else ""
 
         # 解析物品名和数量
         if text_content:
-            parts = text_content.rsplit(" ", 1)
-            if len(parts) == 2 and parts[1].isdigit():
-                item_name = parts[0].strip()
-                count = int(parts[1])
-            else:
-                item_name = text_content.strip()
+            item_name, count = _parse_item_count(text_content.strip())
+            item_name = item_name.strip()
 
         # 验证必要参数
         if not target_id:
@@ -227,6 +228,10 @@ class StorageRingHandler:
             )
             return
 
+        if target_id == player.user_id:
+            yield event.plain_result("不能赠予物品给自己")
+            return
+
         if not item_name:
             yield event.plain_result("请指定要赠予的物品名称")
             return
@@ -236,8 +241,8 @@ class StorageRingHandler:
             return
 
         # 检查物品是否在储物戒中
-        if not self.storage_ring_manager.has_item(player, item_name, count):
-            current = self.storage_ring_manager.get_item_count(player, item_name)
+        current = srm.get_item_count(player, item_name)
+        if current < count:
             if current == 0:
                 yield event.plain_result(f"储物戒中没有【{item_name}】")
             else:
@@ -249,12 +254,8 @@ class StorageRingHandler:
             yield event.plain_result(f"目标玩家（QQ:{target_id}）尚未开始修仙")
             return
 
-        if target_id == player.user_id:
-            yield event.plain_result("不能赠予物品给自己")
-            return
-
         # 先从储物戒中取出物品
-        success, _ = await self.storage_ring_manager.retrieve_item(player, item_name, count)
+        success, _ = await srm.retrieve_item(player, item_name, count)
         if not success:
             yield event.plain_result("赠予失败：无法取出物品")
             return
@@ -280,38 +281,36 @@ class StorageRingHandler:
     @player_required
     async def handle_accept_gift(self, player: Player, event: AstrMessageEvent):
         """接收赠予的物品"""
+        srm = self.storage_ring_manager
         user_id = player.user_id
 
-        # 从数据库获取待处理的赠予请求
-        gift = await self.db.ext.get_pending_gift(user_id)
+        # 从数据库取出待处理的赠予请求（取出即删除）
+        gift = await self.db.ext.pop_pending_gift(user_id)
         if not gift:
             yield event.plain_result("你没有待接收的赠予物品")
             return
 
         item_name = gift["item_name"]
         count = gift["count"]
+        sender_id = gift["sender_id"]
         sender_name = gift["sender_name"]
-        gift_id = gift["id"]
 
         # 尝试存入接收者的储物戒
-        success, message = await self.storage_ring_manager.store_item(player, item_name, count)
+        try:
+            success, message = await srm.store_item(player, item_name, count)
+        except Exception:
+            # 请求已删除，异常时物品返还给发送者
+            await srm.return_item_to_player(sender_id, item_name, count)
+            raise
 
         if success:
-            # 删除数据库中的赠予请求
-            await self.db.ext.delete_pending_gift(gift_id)
             yield event.plain_result(
                 f"✅ 已接收来自【{sender_name}】的赠予！\n"
                 f"获得：【{item_name}】x{count}"
             )
         else:
             # 存入失败，物品返还给发送者
-            sender_id = gift["sender_id"]
-            sender_player = await self.db.get_player_by_id(sender_id)
-            if sender_player:
-                await self.storage_ring_manager.store_item(sender_player, item_name, count, silent=True)
-
-            # 删除数据库中的赠予请求
-            await self.db.ext.delete_pending_gift(gift_id)
+            await srm.return_item_to_player(sender_id, item_name, count)
             yield event.plain_result(
                 f"❌ 接收失败：{message}\n"
                 f"物品已返还给【{sender_name}】"
@@ -322,8 +321,8 @@ class StorageRingHandler:
         """拒绝赠予的物品"""
         user_id = player.user_id
 
-        # 从数据库获取待处理的赠予请求
-        gift = await self.db.ext.get_pending_gift(user_id)
+        # 从数据库取出待处理的赠予请求（取出即删除）
+        gift = await self.db.ext.pop_pending_gift(user_id)
         if not gift:
             yield event.plain_result("你没有待处理的赠予请求")
             return
@@ -332,15 +331,9 @@ class StorageRingHandler:
         count = gift["count"]
         sender_id = gift["sender_id"]
         sender_name = gift["sender_name"]
-        gift_id = gift["id"]
 
         # 物品返还给发送者
-        sender_player = await self.db.get_player_by_id(sender_id)
-        if sender_player:
-            await self.storage_ring_manager.store_item(sender_player, item_name, count, silent=True)
-
-        # 删除数据库中的赠予请求
-        await self.db.ext.delete_pending_gift(gift_id)
+        await self.storage_ring_manager.return_item_to_player(sender_id, item_name, count)
         yield event.plain_result(
             f"已拒绝来自【{sender_name}】的赠予\n"
             f"【{item_name}】x{count} 已返还"
@@ -349,10 +342,10 @@ class StorageRingHandler:
     @player_required
     async def handle_upgrade_ring(self, player: Player, event: AstrMessageEvent, ring_name: str):
         """升级/更换储物戒"""
+        srm = self.storage_ring_manager
         if not ring_name or ring_name.strip() == "":
             # 显示可用的储物戒列表
-            rings = self.storage_ring_manager.get_all_storage_rings()
-            current_capacity = self.storage_ring_manager.get_ring_capacity(player.storage_ring)
+            current_capacity = srm.get_ring_capacity(player.storage_ring)
 
             lines = [
                 f"=== 储物戒列表 ===\n",
@@ -360,20 +353,16 @@ class StorageRingHandler:
                 f"━━━━━━━━━━━━━━━\n",
             ]
 
-            for ring in rings:
+            for name, capacity, row in srm.get_ring_listing():
                 # 标记当前装备
-                if ring["name"] == player.storage_ring:
+                if name == player.storage_ring:
                     marker = "✓ "
-                elif ring["capacity"] <= current_capacity:
+                elif capacity <= current_capacity:
                     marker = "✗ "  # 容量不高于当前的
                 else:
                     marker = "  "
 
-                level_name = self.storage_ring_manager._format_required_level(ring["required_level_index"])
-                lines.append(
-                    f"{marker}【{ring['name']}】({ring['rank']})\n"
-                    f"    容量：{ring['capacity']}格 | 需求：{level_name}\n"
-                )
+                lines.append(marker + row)
 
             lines.append(f"\n用法：{CMD_UPGRADE_RING} 储物戒名")
             lines.append("\n注：储物戒只能升级，不能卸下")
@@ -384,13 +373,13 @@ class StorageRingHandler:
         ring_name = ring_name.strip()
 
         # 检查是否为储物戒类型
-        ring_config = self.storage_ring_manager.get_storage_ring_config(ring_name)
+        ring_config = srm.get_storage_ring_config(ring_name)
         if not ring_config:
             yield event.plain_result(f"未找到储物戒：{ring_name}")
             return
 
         # 升级储物戒
-        success, message = await self.storage_ring_manager.upgrade_ring(player, ring_name)
+        success, message = await srm.upgrade_ring(player, ring_name)
 
         if success:
             yield event.plain_result(f"✅ {message}")
@@ -191,7 +191,8 @@ async def _check_loan_status(db, player: Player) -> dict:
         remaining_hours = (remaining_seconds % 86400) // 3600
         
         # 计算应还金额
-        days_borrowed = max(1, (now - loan["borrowed_at"]) // 86400)
+        elapsed = now - loan["borrowed_at"]
+        days_borrowed = elapsed // 86400 if elapsed >= 86400 else 1
         interest = int(loan["principal"] * loan["interest_rate"] * days_borrowed)
         total_due = loan["principal"] + interest
         
@@ -254,7 +254,11 @@ class XiuXianPlugin(Star):
         self.bounty_check_task = None  # 悬赏过期检查任务
 
         access_control_config = self.config.get("ACCESS_CONTROL", {})
-        self.whitelist_groups = [str(g) for g in access_control_config.get("WHITELIST_GROUPS", [])]
+        # 白名单集合，用于每条指令的 O(1) 权限检查
+        self.whitelist_groups = frozenset(str(g) for g in access_control_config.get("WHITELIST_GROUPS", []))
+        if not self.whitelist_groups:
+            # 未配置白名单时所有访问放行，直接替换为常量判断
+            self._check_access = lambda event: True
         self.boss_admins = [str(a) for a in access_control_config.get("BOSS_ADMINS", [])]
 
         logger.info(f"【修仙插件】XiuXianPlugin 初始化完成，数据库路径: {db_path}")
@@ -268,15 +272,8 @@ class XiuXianPlugin(Star):
         # 获取群组ID，私聊时为None
         group_id = event.get_group_id()
 
-        # 如果是私聊，允许访问
-        if not group_id:
-            return True
-
-        # 检查群组是否在白名单中
-        if str(group_id) in self.whitelist_groups:
-            return True
-
-        return False
+        # 私聊允许访问；群聊检查是否在白名单中
+        return not group_id or str(group_id) in self.whitelist_groups
 
     def _check_boss_admin(self, event: AstrMessageEvent) -> bool:
         """检查是否为Boss管理员"""
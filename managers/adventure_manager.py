@@ -3,10 +3,14 @@
 历练系统管理器 - 可配置路线、风险与奖励
 """
 
+import copy
 import json
 import random
+import sys
 import time
+from collections import namedtuple
 from pathlib import Path
+from types import MappingProxyType
 from typing import Tuple, Dict, Optional, List, TYPE_CHECKING
 
 from astrbot.api import logger
@@ -14,16 +18,61 @@ from astrbot.api import logger
 from ..data.data_manager import DataBase
 from ..models import Player
 from ..models_extended import UserStatus
+from ..utils import build_alias_table, load_json_cached, sample_alias
 
 if TYPE_CHECKING:
     from ..core import StorageRingManager
 
 
+def _freeze(obj):
+    """递归冻结配置：dict 转为只读 MappingProxyType，list 转为 tuple"""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+# 历练事件记录，加载配置时由事件字典转换并补全默认值
+AdventureEvent = namedtuple(
+    "AdventureEvent",
+    "key name desc exp_mult gold_mult item_chance bonus_progress injury drop_tier",
+)
+
+
+def _to_event(data: dict) -> AdventureEvent:
+    """将配置中的事件字典转换为 AdventureEvent"""
+    return AdventureEvent(
+        key=data.get("key"),
+        name=data.get("name", ""),
+        desc=data.get("desc", ""),
+        exp_mult=data.get("exp_mult", 1.0),
+        gold_mult=data.get("gold_mult", 1.0),
+        item_chance=data.get("item_chance", 40),
+        bonus_progress=data.get("bonus_progress", 0),
+        injury=bool(data.get("injury")),
+        drop_tier=data.get("drop_tier"),
+    )
+
+
+# 路线派生字段：(预计算键, 配置键, 默认值)，加载配置时展开为标量
+_ROUTE_DERIVED_FIELDS = (
+    ("_base_exp_per_min", "base_exp_per_min", 40),
+    ("_base_gold_per_min", "base_gold_per_min", 10),
+    ("_level_bonus_exp", "level_bonus_exp", 10),
+    ("_level_bonus_gold", "level_bonus_gold", 2),
+    ("_fatigue", "fatigue_cooldown", 0),
+    ("_duration", "duration", 3600),
+    ("_min_level", "min_level", 0),
+)
+
+
 class AdventureManager:
     """历练系统管理器"""
 
     CONFIG_FILE = Path(__file__).resolve().parents[1] / "config" / "adventure_config.json"
-    DEFAULT_CONFIG = {
+    # 默认配置（只读），配置文件缺失或加载失败时直接复用，无需拷贝
+    DEFAULT_CONFIG = _freeze({
         "routes": [
             {
                 "key": "scout",
@@ -88,16 +137,25 @@ class AdventureManager:
                 {"name": "灵石碎片", "weight": 20, "min": 2, "max": 5}
             ]
         }
-    }
+    })
 
     def __init__(self, db: DataBase, storage_ring_manager: "StorageRingManager" = None):
         self.db = db
         self.storage_ring_manager = storage_ring_manager
-        self._route_cooldowns: Dict[str, Dict[str, int]] = {}
+        # 独立随机数生成器，便于测试时设定种子复现
+        self._rng = random.Random()
+        # 路线休整结束时间，键为 (user_id, route_key)
+        self._route_cooldowns: Dict[Tuple[str, str], int] = {}
         self.routes: Dict[str, dict] = {}
         self.route_alias_index: Dict[str, str] = {}
-        self.event_groups: Dict[str, List[dict]] = {}
+        self.event_groups: Dict[str, Tuple[AdventureEvent, ...]] = {}
+        self._default_event_group: Tuple[AdventureEvent, ...] = ()
+        self._fallback_event_group: Tuple[AdventureEvent, ...] = ()
         self.drop_tables: Dict[str, List[dict]] = {}
+        # 预构建的别名抽样表：路线事件组、掉落表
+        self._event_alias: Dict[str, Optional[tuple]] = {}
+        self._drop_alias: Dict[str, Optional[tuple]] = {}
+        self._default_drop_alias: Optional[tuple] = None
         self.default_route_key: str = "scout"
         self.reload_config()
 
@@ -106,7 +164,16 @@ class AdventureManager:
     def reload_config(self):
         """重新加载配置文件"""
         config = self._load_config_file()
-        self.routes = {route["key"]: route for route in config.get("routes", [])}
+        self.routes = {route["key"]: dict(route) for route in config.get("routes", [])}
+        for route in self.routes.values():
+            for derived_key, config_key, default in _ROUTE_DERIVED_FIELDS:
+                route[derived_key] = route.get(config_key, default)
+            completion_bonus = route.get("completion_bonus", {})
+            route["_completion_exp"] = completion_bonus.get("exp", 0)
+            route["_completion_gold"] = completion_bonus.get("gold", 0)
+            # 开始历练时写入 user_cd 的额外数据，预先序列化
+            route["_extra_json"] = json.dumps({"route_key": route["key"]}, ensure_ascii=False)
+            route["_start_hint"] = self._build_start_hint(route)
         self.default_route_key = next(iter(self.routes.keys()), "scout")
 
         self.route_alias_index = {}
@@ -122,19 +189,54 @@ class AdventureManager:
             elif route["key"] == "peril":
                 aliases.update({"long", "长途"})
             for alias in aliases:
-                self.route_alias_index[alias.lower()] = key
+                self.route_alias_index[sys.intern(alias.casefold())] = key
 
-        self.event_groups = config.get("event_groups", self.DEFAULT_CONFIG["event_groups"])
+        self.event_groups = {
+            group_key: tuple(_to_event(event) for event in events)
+            for group_key, events in config.get("event_groups", self.DEFAULT_CONFIG["event_groups"]).items()
+        }
+        self._default_event_group = tuple(_to_event(event) for event in self.DEFAULT_CONFIG["event_groups"]["standard"])
         self.drop_tables = config.get("drop_tables", self.DEFAULT_CONFIG["drop_tables"])
 
+        # 事件组在加载时即解析好回退关系，别名表条目直接存放事件组
+        self._fallback_event_group = self.event_groups.get("standard") or self._default_event_group
+        self._event_alias = {}
+        for key, route in self.routes.items():
+            weights = route.get("event_weights", {})
+            self._event_alias[key] = build_alias_table(
+                [self.event_groups.get(group_key) or self._fallback_event_group for group_key in weights],
+                [max(0, w) for w in weights.values()]
+            )
+
+        self._drop_alias = {
+            tier: build_alias_table(drop_table, [item["weight"] for item in drop_table])
+            for tier, drop_table in self.drop_tables.items()
+        }
+        default_drop_table = self.DEFAULT_CONFIG["drop_tables"]["low"]
+        self._default_drop_alias = build_alias_table(
+            default_drop_table, [item["weight"] for item in default_drop_table]
+        )
+
+    @staticmethod
+    def _build_start_hint(route: dict) -> str:
+        """构建开始历练时的路线提示文本（仅依赖路线配置）"""
+        hint = [
+            f"✨ 你选择了「{route['name']}」——{route.get('description', '未知冒险')}",
+            f"路线风险：{route.get('risk', '未知')} | 历练时长：{route['_duration'] // 60} 分钟"
+        ]
+        if route["_min_level"]:
+            hint.append(f"建议境界：{route['_min_level']} 阶以上")
+        if route["_fatigue"]:
+            hint.append(f"（该路线完成后需要休整 {route['_fatigue'] // 60} 分钟）")
+        return "\n".join(hint)
+
     def _load_config_file(self) -> dict:
         """加载配置文件并在失败时回退到默认配置"""
         if self.CONFIG_FILE.exists():
             try:
-                with open(self.CONFIG_FILE, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    logger.info("已加载 adventure_config.json")
-                    return data
+                data = load_json_cached(str(self.CONFIG_FILE), self.CONFIG_FILE.stat().st_mtime_ns)
+                logger.info("已加载 adventure_config.json")
+                return copy.deepcopy(data)
             except Exception as exc:
                 logger.error(f"加载 adventure_config.json 失败，将使用默认配置: {exc}")
         return self.DEFAULT_CONFIG
@@ -163,45 +265,33 @@ class AdventureManager:
         if not player:
             return False, "❌ 你还未踏入修仙之路！"
 
-        user_cd = await self.db.ext.get_user_cd(user_id)
-        if not user_cd:
-            await self.db.ext.create_user_cd(user_id)
-            user_cd = await self.db.ext.get_user_cd(user_id)
+        user_cd = await self.db.ext.get_or_create_user_cd(user_id)
 
         if user_cd.type != UserStatus.IDLE:
             return False, f"❌ 你当前正{UserStatus.get_name(user_cd.type)}，无法开始历练！"
 
-        route_key = self._resolve_route(route_token)
+        # 解析路线别名，未指定或无法识别时使用默认路线
+        default_key = self.default_route_key
+        route_key = self.route_alias_index.get(route_token.strip().casefold(), default_key) if route_token else default_key
         route = self.routes.get(route_key)
         if not route:
             return False, "❌ 未找到对应的历练路线，请先发送 /历练信息 查看可选路线。"
 
-        if player.level_index < route.get("min_level", 0):
+        if player.level_index < route["_min_level"]:
             return False, "❌ 你的境界还不足以踏上这条路线，先提升境界吧！"
 
-        cooldown_end = self._route_cooldowns.get(user_id, {}).get(route_key, 0)
+        cooldown_end = self._route_cooldowns.get((user_id, route_key), 0)
         now = int(time.time())
         if cooldown_end > now:
             remaining = cooldown_end - now
             minutes = remaining // 60 or 1
             return False, f"⚠️ 该路线尚在休整中，请 {minutes} 分钟后再试。"
 
-        duration = route.get("duration", 3600)
+        duration = route["_duration"]
         scheduled_time = now + duration
-        extra = {"route_key": route_key}
-        await self.db.ext.set_user_busy(user_id, UserStatus.ADVENTURING, scheduled_time, extra_data=extra)
-
-        fatigue = route.get("fatigue_cooldown", 0)
-        hint = [
-            f"✨ 你选择了「{route['name']}」——{route.get('description', '未知冒险')}",
-            f"路线风险：{route.get('risk', '未知')} | 历练时长：{duration // 60} 分钟"
-        ]
-        if route.get("min_level", 0):
-            hint.append(f"建议境界：{route['min_level']} 阶以上")
-        if fatigue:
-            hint.append(f"（该路线完成后需要休整 {fatigue // 60} 分钟）")
+        await self.db.ext.set_user_busy(user_id, UserStatus.ADVENTURING, scheduled_time, extra_data=route["_extra_json"])
 
-        return True, "\n".join(hint)
+        return True, route["_start_hint"]
 
     async def finish_adventure(self, user_id: str) -> Tuple[bool, str, Optional[Dict]]:
         """结算历练"""
@@ -215,19 +305,10 @@ class AdventureManager:
 
         now = int(time.time())
         if now < user_cd.scheduled_time:
-            remaining = user_cd.scheduled_time - now
-            minutes = remaining // 60
-            seconds = remaining % 60
+            minutes, seconds = divmod(user_cd.scheduled_time - now, 60)
             return False, f"❌ 历练尚未完成！还需 {minutes}分{seconds}秒。", None
 
-        extra = {}
-        if hasattr(user_cd, "get_extra_data"):
-            extra = user_cd.get_extra_data()
-        else:
-            try:
-                extra = json.loads(getattr(user_cd, "extra_data", "{}") or "{}")
-            except Exception:
-                extra = {}
+        extra = self._get_extra(user_cd)
 
         route = self.routes.get(extra.get("route_key", self.default_route_key)) or self.routes.get(self.default_route_key)
         if not route:
@@ -243,40 +324,46 @@ class AdventureManager:
         # 开始事务
         await self.db.conn.execute("BEGIN IMMEDIATE")
         try:
-            # 重新获取玩家对象，确保在事务中
-            player = await self.db.get_player_by_id(user_id)
-            if not player:
+            # 在事务内重新读取玩家，掉落放入最新的储物戒，避免覆盖加载后发生的储物戒变更
+            fresh_player = await self.db.get_player_by_id(user_id)
+            if not fresh_player:
                 await self.db.conn.rollback()
                 return False, "❌ 你还未踏入修仙之路！", None
 
-            # 处理物品掉落，传递 external_transaction=True
-            dropped_items, item_msg = await self._handle_drops(player, route, event, external_transaction=True)
-
-            # 修改玩家属性
-            player.experience += rewards["exp"]
-            player.gold += rewards["gold"]
-            
-            # 一次更新玩家对象
-            await self.db.update_player(player)
-            await self.db.ext.set_user_free(user_id)
-            await self.db.conn.commit()
+            # 处理物品掉落（修改事务内读取的玩家对象），传递 external_transaction=True
+            # 无储物戒管理器时直接跳过
+            if self.storage_ring_manager:
+                dropped_items, item_msg = await self._handle_drops(fresh_player, route, event, external_transaction=True)
+            else:
+                dropped_items, item_msg = [], ""
+
+            # 单次提交：增量发放修为/灵石、同步储物戒并置为空闲
+            settled = await self.db.ext.finish_adventure_atomic(
+                user_id, rewards["exp"], rewards["gold"],
+                fresh_player.storage_ring_items if dropped_items else None
+            )
+            if not settled:
+                return False, "❌ 你当前不在历练中！", None
+            player.experience = fresh_player.experience + rewards["exp"]
+            player.gold = fresh_player.gold + rewards["gold"]
+            player.storage_ring_items = fresh_player.storage_ring_items
         except Exception:
             await self.db.conn.rollback()
             raise
 
-        fatigue = route.get("fatigue_cooldown", 0)
-        if event.get("injury"):
+        fatigue = route["_fatigue"]
+        if event.injury:
             # 受伤时增加额外休整时间
             fatigue += 600
         if fatigue:
-            self._route_cooldowns.setdefault(user_id, {})[route["key"]] = int(time.time()) + fatigue
+            self._route_cooldowns[(user_id, route["key"])] = now + fatigue
 
         fatigue_hint = f"\n⏳ 该路线休整：{fatigue // 60} 分钟" if fatigue else ""
         display_minutes = effective_duration // 60
         msg = (
             f"🚶 历练归来 · {route['name']}\n"
             f"━━━━━━━━━━━━━━━\n"
-            f"{event['desc']}\n\n"
+            f"{event.desc}\n\n"
             f"本次历练：{display_minutes} 分钟\n"
             f"获得修为：+{rewards['exp']:,}\n"
             f"获得灵石：+{rewards['gold']:,}"
@@ -290,14 +377,14 @@ class AdventureManager:
         reward_data = {
             "route_key": route["key"],
             "route_name": route["name"],
-            "event_key": event.get("key"),
-            "event_desc": event["desc"],
+            "event_key": event.key,
+            "event_desc": event.desc,
             "exp_reward": rewards["exp"],
             "gold_reward": rewards["gold"],
             "items": dropped_items,
             "duration": effective_duration,
             "bounty_tag": route.get("bounty_tag", "adventure"),
-            "bounty_progress": max(1, route.get("bounty_progress", 1) + event.get("bonus_progress", 0))
+            "bounty_progress": max(1, route.get("bounty_progress", 1) + event.bonus_progress)
         }
         return True, msg, reward_data
 
@@ -309,14 +396,7 @@ class AdventureManager:
 
         now = int(time.time())
         route_name = "未知路线"
-        extra = {}
-        if hasattr(user_cd, "get_extra_data"):
-            extra = user_cd.get_extra_data()
-        else:
-            try:
-                extra = json.loads(getattr(user_cd, "extra_data", "{}") or "{}")
-            except Exception:
-                extra = {}
+        extra = self._get_extra(user_cd)
         route = self.routes.get(extra.get("route_key", self.default_route_key))
         if route:
             route_name = route["name"]
@@ -324,11 +404,8 @@ class AdventureManager:
         if now >= user_cd.scheduled_time:
             return True, f"✅ {route_name} 已完成！使用 /完成历练 领取奖励。"
 
-        remaining = user_cd.scheduled_time - now
-        elapsed = now - user_cd.create_time
-        minutes = remaining // 60
-        seconds = remaining % 60
-        elapsed_minutes = elapsed // 60
+        minutes, seconds = divmod(user_cd.scheduled_time - now, 60)
+        elapsed_minutes = (now - user_cd.create_time) // 60
 
         msg = (
             f"📍 历练进度 · {route_name}\n"
@@ -341,68 +418,55 @@ class AdventureManager:
 
     # -------- 内部工具 --------
 
-    def _resolve_route(self, token: str) -> str:
-        if not token:
-            return self.default_route_key
-        normalized = token.strip().lower()
-        return self.route_alias_index.get(normalized, self.default_route_key)
-
-    def _trigger_route_event(self, route: dict) -> dict:
-        weights = route.get("event_weights", {})
-        if not weights:
-            group_key = "standard"
+    @staticmethod
+    def _get_extra(user_cd) -> dict:
+        """解析 user_cd 的额外数据，结果缓存在该对象上避免重复 JSON 解析"""
+        cached = user_cd.__dict__.get("_extra_cache")
+        if cached is not None:
+            return cached
+        if hasattr(user_cd, "get_extra_data"):
+            extra = user_cd.get_extra_data()
         else:
-            total_weight = sum(max(0, w) for w in weights.values()) or 1
-            roll = random.randint(1, total_weight)
-            upto = 0
-            group_key = "standard"
-            for key, weight in weights.items():
-                upto += max(0, weight)
-                if roll <= upto:
-                    group_key = key
-                    break
-
-        group = self.event_groups.get(group_key) or self.event_groups.get("standard") or self.DEFAULT_CONFIG["event_groups"]["standard"]
-        return random.choice(group)
-
-    def _calculate_rewards(self, player: Player, route: dict, duration: int, event: dict) -> Dict[str, int]:
-        duration_minutes = max(1, duration // 60)
-        base_exp = duration_minutes * route.get("base_exp_per_min", 40)
-        base_gold = duration_minutes * route.get("base_gold_per_min", 10)
+            try:
+                extra = json.loads(getattr(user_cd, "extra_data", "{}") or "{}")
+            except Exception:
+                extra = {}
+        user_cd._extra_cache = extra
+        return extra
 
-        level_bonus_exp = player.level_index * route.get("level_bonus_exp", 10)
-        level_bonus_gold = player.level_index * route.get("level_bonus_gold", 2)
+    def _trigger_route_event(self, route: dict) -> AdventureEvent:
+        table = self._event_alias.get(route["key"])
+        group = sample_alias(table, self._rng) if table else self._fallback_event_group
+        return self._rng.choice(group)
 
-        completion_bonus = route.get("completion_bonus", {})
-        exp_total = base_exp + level_bonus_exp + completion_bonus.get("exp", 0)
-        gold_total = base_gold + level_bonus_gold + completion_bonus.get("gold", 0)
+    def _calculate_rewards(self, player: Player, route: dict, duration: int, event: AdventureEvent) -> Dict[str, int]:
+        duration_minutes = max(1, duration // 60)
+        level_index = player.level_index
+        exp_total = duration_minutes * route["_base_exp_per_min"] + level_index * route["_level_bonus_exp"] + route["_completion_exp"]
+        gold_total = duration_minutes * route["_base_gold_per_min"] + level_index * route["_level_bonus_gold"] + route["_completion_gold"]
 
-        final_exp = max(0, int(exp_total * event.get("exp_mult", 1.0)))
-        final_gold = max(0, int(gold_total * event.get("gold_mult", 1.0)))
+        final_exp = max(0, int(exp_total * event.exp_mult))
+        final_gold = max(0, int(gold_total * event.gold_mult))
         return {"exp": final_exp, "gold": final_gold}
 
-    async def _handle_drops(self, player: Player, route: dict, event: dict, external_transaction: bool = False) -> Tuple[List[Tuple[str, int]], str]:
+    async def _handle_drops(self, player: Player, route: dict, event: AdventureEvent, external_transaction: bool = False) -> Tuple[List[Tuple[str, int]], str]:
         dropped_items: List[Tuple[str, int]] = []
         if not self.storage_ring_manager:
             return dropped_items, ""
 
-        item_chance = event.get("item_chance", 40)
-        if random.randint(1, 100) > item_chance:
+        item_chance = event.item_chance
+        rng = self._rng
+        if rng.randint(1, 100) > item_chance:
+            return dropped_items, ""
+
+        tier = event.drop_tier or route.get("drop_tier") or "low"
+        table = self._drop_alias[tier] if tier in self._drop_alias else self._default_drop_alias
+        if not table:
+            # 掉落表为空或总权重为0
             return dropped_items, ""
+        chosen = sample_alias(table, rng)
 
-        tier = event.get("drop_tier") or route.get("drop_tier") or "low"
-        drop_table = self.drop_tables.get(tier, self.DEFAULT_CONFIG["drop_tables"]["low"])
-        total_weight = sum(item["weight"] for item in drop_table)
-        roll = random.randint(1, total_weight)
-        upto = 0
-        chosen = drop_table[0]
-        for item in drop_table:
-            upto += item["weight"]
-            if roll <= upto:
-                chosen = item
-                break
-
-        count = random.randint(chosen["min"], chosen["max"])
+        count = rng.randint(chosen["min"], chosen["max"])
         dropped_items.append((chosen["name"], count))
 
         item_lines = []
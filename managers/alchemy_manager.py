@@ -3,10 +3,12 @@
 炼丹系统管理器 - 处理炼丹、配方等逻辑（简化版）
 """
 
+import asyncio
 import random
+from bisect import bisect_right
+from dataclasses import dataclass
 from typing import Tuple, List, Dict, Optional, TYPE_CHECKING
 from ..data.data_manager import DataBase
-from ..models import Player
 from ..models_extended import UserStatus
 
 if TYPE_CHECKING:
@@ -14,6 +16,46 @@ if TYPE_CHECKING:
     from ..core import StorageRingManager
 
 
+@dataclass(slots=True)
+class Recipe:
+    """标准化后的丹药配方"""
+    id: int
+    name: str
+    level_required: int
+    materials: Dict[str, int]
+    success_rate: int
+    desc: str
+    gold_cost: int  # 灵石消耗
+    other_materials: Tuple[Tuple[str, int], ...]  # 储物戒材料：((材料名, 数量), ...)
+    materials_str: str = ""  # 材料展示文本
+    block_text: str = ""  # 配方列表中的展示文本块
+
+
+# 炼丹成功判定使用的随机数生成器
+_rng = random.Random()
+
+# 丹药效果描述：(效果字段, 描述函数)，按展示顺序排列
+_EFFECT_DESCRIBERS = (
+    ("add_hp", lambda v: f"恢复{v}气血"),
+    ("add_experience", lambda v: f"增加{v}修为"),
+    ("add_breakthrough_bonus", lambda v: f"提升{int(v * 100)}%突破率"),
+)
+
+# 配方列表的固定头尾
+_RECIPE_HEADER = "🔥 丹药配方\n━━━━━━━━━━━━━━━\n\n"
+_RECIPE_FOOTER = "使用 /炼丹 <丹药ID> 开始炼制"
+
+# 炼丹结果消息的固定片段（与丹药名、消耗、成功率拼接）
+_CRAFT_OK_HEAD = "🎉 炼丹成功！\n━━━━━━━━━━━━━━━\n\n你成功炼制了【"
+_CRAFT_OK_MID = "】！\n丹药已存入丹药背包\n\n消耗："
+_CRAFT_OK_TAIL = "%\n\n💡 使用 /服用丹药 "
+_CRAFT_OK_HINT = " 可服用此丹药\n💡 使用 /丹药背包 查看所有丹药"
+_CRAFT_FAIL_HEAD = "💔 炼丹失败\n━━━━━━━━━━━━━━━\n\n炼制【"
+_CRAFT_FAIL_MID = "】失败了...\n\n材料已消耗\n消耗："
+_CRAFT_FAIL_TAIL = "%\n\n再接再厉！"
+_CRAFT_RATE = "\n成功率："
+
+
 class AlchemyManager:
     """炼丹系统管理器（简化版）"""
     
@@ -27,13 +69,44 @@ class AlchemyManager:
         if config_manager and hasattr(config_manager, 'alchemy_recipes') and config_manager.alchemy_recipes:
             raw_recipes = config_manager.alchemy_recipes
         
-        self.recipes = {}
+        self.recipes: Dict[int, Recipe] = {}
         for recipe in raw_recipes.values():
             if isinstance(recipe, dict) and recipe.get("id"):
                 recipe_id = int(recipe["id"])
                 self.recipes[recipe_id] = self._normalize_recipe(recipe_id, recipe)
+        
+        # 配方为静态数据：按需求境界排序后，某境界可用的配方恰为排序列表的前缀，
+        # 预渲染每个前缀长度对应的配方列表消息
+        self._sorted_recipes: List[Recipe] = sorted(
+            self.recipes.values(), key=lambda r: r.level_required
+        )
+        self._sorted_levels: List[int] = [r.level_required for r in self._sorted_recipes]
+        self._recipe_msg_by_count: Tuple[Optional[str], ...] = tuple(
+            self._render_recipe_list(self._sorted_recipes[:count])
+            for count in range(len(self._sorted_recipes) + 1)
+        )
+    
+    def _render_recipe_block(self, recipe: Recipe) -> str:
+        """渲染单个配方的展示文本块"""
+        return (
+            f"【{recipe.name}】(ID:{recipe.id})\n"
+            f"  需求境界：Lv.{recipe.level_required}\n"
+            f"  材料：{recipe.materials_str}\n"
+            f"  成功率：{recipe.success_rate}%\n"
+            f"  效果：{recipe.desc}\n\n"
+        )
+    
+    def _render_recipe_list(self, recipes: List[Recipe]) -> Optional[str]:
+        """渲染配方列表消息，无可用配方时返回None"""
+        if not recipes:
+            return None
+        
+        parts = [_RECIPE_HEADER]
+        parts.extend(recipe.block_text for recipe in recipes)
+        parts.append(_RECIPE_FOOTER)
+        return "".join(parts)
     
-    def _normalize_recipe(self, recipe_id: int, recipe: Dict) -> Dict:
+    def _normalize_recipe(self, recipe_id: int, recipe: Dict) -> Recipe:
         """标准化配方字段，兼容不同格式的配置"""
         name = recipe.get("name", f"丹药{recipe_id}")
         
@@ -45,14 +118,23 @@ class AlchemyManager:
         if not desc:
             desc = "丹药效果"
         
-        return {
-            "id": recipe.get("id", recipe_id),
-            "name": name,
-            "level_required": recipe.get("level_required", recipe.get("level", 0)),
-            "materials": recipe.get("materials", recipe.get("cost", {})),
-            "success_rate": recipe.get("success_rate", recipe.get("success", 50)),
-            "desc": desc
-        }
+        materials = recipe.get("materials", recipe.get("cost", {}))
+        normalized = Recipe(
+            id=recipe_id,
+            name=name,
+            level_required=recipe.get("level_required", recipe.get("level", 0)),
+            materials=materials,
+            success_rate=recipe.get("success_rate", recipe.get("success", 50)),
+            desc=desc,
+            gold_cost=materials.get("灵石", 0),
+            other_materials=tuple(
+                (material_name, count) for material_name, count in materials.items()
+                if material_name != "灵石"
+            ),
+            materials_str=", ".join(f"{k}×{v}" for k, v in materials.items()),
+        )
+        normalized.block_text = self._render_recipe_block(normalized)
+        return normalized
     
     def _generate_pill_desc(self, pill_config: Dict) -> str:
         """根据丹药配置生成描述"""
@@ -70,14 +152,9 @@ class AlchemyManager:
         
         effect = pill_config.get("effect", {})
         if effect:
-            effects = []
-            if effect.get("add_hp"):
-                effects.append(f"恢复{effect['add_hp']}气血")
-            if effect.get("add_experience"):
-                effects.append(f"增加{effect['add_experience']}修为")
-            if effect.get("add_breakthrough_bonus"):
-                bonus = int(effect["add_breakthrough_bonus"] * 100)
-                effects.append(f"提升{bonus}%突破率")
+            effects = [
+                describe(effect[key]) for key, describe in _EFFECT_DESCRIBERS if effect.get(key)
+            ]
             if effects:
                 return f"{'，'.join(effects)}（{rank}）"
         
@@ -124,27 +201,10 @@ class AlchemyManager:
         if not player:
             return False, "❌ 你还未踏入修仙之路！"
         
-        available_recipes = []
-        for recipe_id, recipe in self.recipes.items():
-            if player.level_index >= recipe.get("level_required", 0):
-                available_recipes.append(recipe)
-        
-        if not available_recipes:
+        msg = self._recipe_msg_by_count[bisect_right(self._sorted_levels, player.level_index)]
+        if msg is None:
             return False, "❌ 你当前境界无法炼制任何丹药！"
         
-        msg = "🔥 丹药配方\n"
-        msg += "━━━━━━━━━━━━━━━\n\n"
-        
-        for recipe in available_recipes:
-            materials_str = ", ".join([f"{k}×{v}" for k, v in recipe["materials"].items()])
-            msg += f"【{recipe['name']}】(ID:{recipe['id']})\n"
-            msg += f"  需求境界：Lv.{recipe['level_required']}\n"
-            msg += f"  材料：{materials_str}\n"
-            msg += f"  成功率：{recipe['success_rate']}%\n"
-            msg += f"  效果：{recipe['desc']}\n\n"
-        
-        msg += "使用 /炼丹 <丹药ID> 开始炼制"
-        
         return True, msg
     
     async def craft_pill(
@@ -162,42 +222,44 @@ class AlchemyManager:
         Returns:
             (成功标志, 消息, 结果数据)
         """
-        # 1. 检查用户
-        player = await self.db.get_player_by_id(user_id)
+        # 1. 检查配方（纯内存判断，先于数据库查询）
+        recipe = self.recipes.get(pill_id)
+        if recipe is None:
+            return False, "❌ 无效的丹药ID！", None
+        
+        # 2. 检查用户（玩家与状态两个查询互不依赖，并发发出）
+        player, user_cd = await asyncio.gather(
+            self.db.get_player_by_id(user_id),
+            self.db.ext.get_user_cd(user_id),
+        )
         if not player:
             return False, "❌ 你还未踏入修仙之路！", None
         
-        # 2. 检查用户状态（状态互斥）
-        user_cd = await self.db.ext.get_user_cd(user_id)
+        # 3. 检查境界要求
+        if player.level_index < recipe.level_required:
+            return False, f"❌ 炼制{recipe.name}需要达到境界等级 {recipe.level_required}！", None
+        
+        # 4. 检查用户状态（状态互斥）
         if user_cd and user_cd.type != UserStatus.IDLE:
             current_status = UserStatus.get_name(user_cd.type)
             return False, f"❌ 你当前正{current_status}，无法炼丹！", None
         
-        # 3. 检查配方
-        if pill_id not in self.recipes:
-            return False, "❌ 无效的丹药ID！", None
-        
-        recipe = self.recipes[pill_id]
-        
-        # 3. 检查境界要求
-        if player.level_index < recipe["level_required"]:
-            return False, f"❌ 炼制{recipe['name']}需要达到境界等级 {recipe['level_required']}！", None
-        
-        # 4. 检查所有材料
-        materials = recipe["materials"]
+        # 5. 检查所有材料
         missing_materials = []
         
         # 检查灵石
-        required_gold = materials.get("灵石", 0)
+        required_gold = recipe.gold_cost
         if player.gold < required_gold:
             missing_materials.append(f"灵石（需要{required_gold}，拥有{player.gold}）")
         
         # 检查储物戒中的材料
+        ring_materials = recipe.other_materials
         if self.storage_ring_manager:
-            for material_name, required_count in materials.items():
-                if material_name == "灵石":
-                    continue
-                current_count = self.storage_ring_manager.get_item_count(player, material_name)
+            counts = self.storage_ring_manager.get_item_counts(
+                player, [name for name, _ in ring_materials]
+            )
+            for material_name, required_count in ring_materials:
+                current_count = counts[material_name]
                 if current_count < required_count:
                     missing_materials.append(f"{material_name}（需要{required_count}，拥有{current_count}）")
         else:
@@ -207,16 +269,14 @@ class AlchemyManager:
         if missing_materials:
             return False, f"❌ 材料不足！\n" + "\n".join(f"  · {m}" for m in missing_materials), None
         
-        # 5. 扣除所有材料
+        # 6. 扣除所有材料
         player.gold -= required_gold
         
         # 扣除储物戒中的材料
         consumed_materials = []
         if self.storage_ring_manager:
             items = player.get_storage_ring_items()
-            for material_name, required_count in materials.items():
-                if material_name == "灵石":
-                    continue
+            for material_name, required_count in ring_materials:
                 if material_name in items and items[material_name] >= required_count:
                     if items[material_name] == required_count:
                         del items[material_name]
@@ -225,82 +285,46 @@ class AlchemyManager:
                     consumed_materials.append(f"{material_name}×{required_count}")
             player.set_storage_ring_items(items)
         
-        # 6. 判断成功率
-        success_rate = recipe["success_rate"]
+        # 7. 判断成功率
         # 境界加成：每高一级境界，成功率+2%
-        level_bonus = (player.level_index - recipe["level_required"]) * 2
-        final_success_rate = min(95, success_rate + level_bonus)
+        level_bonus = (player.level_index - recipe.level_required) * 2
+        final_success_rate = min(95, recipe.success_rate + level_bonus)
         
-        roll = random.randint(1, 100)
-        is_success = roll <= final_success_rate
+        is_success = _rng.random() * 100.0 < final_success_rate
+        pill_name = recipe.name
         
         if is_success:
             # 炼制成功 - 丹药存入丹药背包
-            pill_name = recipe["name"]
-            
-            # 将丹药存入丹药背包
             inventory = player.get_pills_inventory()
             inventory[pill_name] = inventory.get(pill_name, 0) + 1
             player.set_pills_inventory(inventory)
-            
-            await self.db.update_player(player)
-            
-            # 构建消耗材料显示
-            cost_lines = []
-            if required_gold > 0:
-                cost_lines.append(f"灵石 -{required_gold}")
-            cost_lines.extend(consumed_materials)
-            cost_str = "、".join(cost_lines) if cost_lines else "无"
-            
-            msg = f"""
-🎉 炼丹成功！
-━━━━━━━━━━━━━━━
-
-你成功炼制了【{pill_name}】！
-丹药已存入丹药背包
-
-消耗：{cost_str}
-成功率：{final_success_rate}%
-
-💡 使用 /服用丹药 {pill_name} 可服用此丹药
-💡 使用 /丹药背包 查看所有丹药
-            """.strip()
-            
-            result_data = {
-                "success": True,
-                "pill_name": pill_name,
-                "cost": required_gold,
-                "materials_consumed": consumed_materials
-            }
+        
+        await self.db.update_player(player)
+        
+        # 构建消耗材料显示
+        cost_lines = []
+        if required_gold > 0:
+            cost_lines.append(f"灵石 -{required_gold}")
+        cost_lines.extend(consumed_materials)
+        cost_str = "、".join(cost_lines) if cost_lines else "无"
+        
+        rate_str = str(final_success_rate)
+        if is_success:
+            msg = "".join((
+                _CRAFT_OK_HEAD, pill_name, _CRAFT_OK_MID, cost_str,
+                _CRAFT_RATE, rate_str, _CRAFT_OK_TAIL, pill_name, _CRAFT_OK_HINT,
+            ))
         else:
-            # 炼制失败
-            await self.db.update_player(player)
-            
-            # 构建消耗材料显示
-            cost_lines = []
-            if required_gold > 0:
-                cost_lines.append(f"灵石 -{required_gold}")
-            cost_lines.extend(consumed_materials)
-            cost_str = "、".join(cost_lines) if cost_lines else "无"
-            
-            msg = f"""
-💔 炼丹失败
-━━━━━━━━━━━━━━━
-
-炼制【{recipe['name']}】失败了...
-
-材料已消耗
-消耗：{cost_str}
-成功率：{final_success_rate}%
-
-再接再厉！
-            """.strip()
-            
-            result_data = {
-                "success": False,
-                "pill_name": recipe["name"],
-                "cost": required_gold,
-                "materials_consumed": consumed_materials
-            }
+            msg = "".join((
+                _CRAFT_FAIL_HEAD, pill_name, _CRAFT_FAIL_MID, cost_str,
+                _CRAFT_RATE, rate_str, _CRAFT_FAIL_TAIL,
+            ))
+        
+        result_data = {
+            "success": is_success,
+            "pill_name": pill_name,
+            "cost": required_gold,
+            "materials_consumed": consumed_materials
+        }
         
         return True, msg, result_data
@@ -2,6 +2,7 @@
 """洞天福地系统管理器"""
 import time
 import json
+from dataclasses import dataclass
 from typing import Tuple, Optional, Dict
 from ..data import DataBase
 from ..models import Player
@@ -9,13 +10,78 @@ from ..models import Player
 __all__ = ["BlessedLandManager"]
 
 # 洞天配置
-BLESSED_LANDS = {
-    1: {"name": "小洞天", "price": 10000, "exp_bonus": 0.05, "gold_per_hour": 100, "max_level": 5, "max_exp_per_hour": 5000},
-    2: {"name": "中洞天", "price": 30000, "exp_bonus": 0.10, "gold_per_hour": 500, "max_level": 10, "max_exp_per_hour": 15000},
-    3: {"name": "大洞天", "price": 80000, "exp_bonus": 0.20, "gold_per_hour": 2000, "max_level": 15, "max_exp_per_hour": 30000},
-    4: {"name": "福地", "price": 200000, "exp_bonus": 0.30, "gold_per_hour": 5000, "max_level": 20, "max_exp_per_hour": 50000},
-    5: {"name": "洞天福地", "price": 500000, "exp_bonus": 0.50, "gold_per_hour": 10000, "max_level": 30, "max_exp_per_hour": 100000},
-}
+@dataclass(slots=True, frozen=True)
+class LandConfig:
+    """洞天类型配置"""
+    name: str
+    price: int
+    exp_bonus: float
+    gold_per_hour: int
+    max_level: int
+    max_exp_per_hour: int
+    upgrade_cost: int  # 每级固定升级费用
+
+
+# 按洞天类型编号索引（0号位置空置）
+LAND_CONFIGS: Tuple[Optional[LandConfig], ...] = (
+    None,
+    LandConfig("小洞天", 10000, 0.05, 100, 5, 5000, 1000),
+    LandConfig("中洞天", 30000, 0.10, 500, 10, 15000, 2000),
+    LandConfig("大洞天", 80000, 0.20, 2000, 15, 30000, 3000),
+    LandConfig("福地", 200000, 0.30, 5000, 20, 50000, 5000),
+    LandConfig("洞天福地", 500000, 0.50, 10000, 30, 100000, 10000),
+)
+_MAX_LAND_TYPE = len(LAND_CONFIGS) - 1
+
+
+@dataclass(slots=True)
+class LandRow:
+    """玩家洞天记录（字段顺序与查询列一致）"""
+    land_type: int
+    land_name: str
+    level: int
+    exp_bonus: float
+    gold_per_hour: int
+    last_collect_time: int
+
+
+def _is_valid_land_type(land_type: int) -> bool:
+    """是否为有效的洞天类型编号"""
+    return 1 <= land_type <= _MAX_LAND_TYPE
+
+
+def _get_land_config(land_type: int) -> LandConfig:
+    """获取洞天类型配置，未知类型按小洞天处理"""
+    return LAND_CONFIGS[land_type] if _is_valid_land_type(land_type) else LAND_CONFIGS[1]
+
+
+# 洞天信息缓存有效期（秒），所有写操作都会主动失效
+_LAND_CACHE_TTL = 2.0
+# 洞天信息展示文本缓存有效期（秒），待收取灵石按整小时计，短时缓存不影响展示
+_INFO_CACHE_TTL = 30.0
+# 缓存条目数达到该值时，写入前先清理已过期的条目
+_CACHE_PRUNE_THRESHOLD = 256
+
+
+def _store_cached(cache: dict, user_id: str, value, now: float, ttl: float):
+    """写入按用户的缓存；条目较多时顺带清理过期条目，避免随用户数无限增长"""
+    if len(cache) >= _CACHE_PRUNE_THRESHOLD:
+        for key in [k for k, (ts, _) in cache.items() if now - ts >= ttl]:
+            del cache[key]
+    cache[user_id] = (now, value)
+
+# 尚未拥有洞天时的展示信息（由洞天配置生成，保持与价格同步）
+_NO_LAND_INFO = (
+    "🏔️ 洞天福地\n"
+    "━━━━━━━━━━━━━━━\n"
+    "你还没有洞天！\n\n"
+    "可购买的洞天：\n"
+    + "".join(
+        f"  {land_type}. {config.name} - {config.price:,}灵石\n"
+        for land_type, config in enumerate(LAND_CONFIGS) if config is not None
+    )
+    + "\n💡 使用 /购买洞天 <编号>"
+)
 
 
 class BlessedLandManager:
@@ -23,17 +89,47 @@ class BlessedLandManager:
     
     def __init__(self, db: DataBase):
         self.db = db
+        # 洞天信息短期缓存：user_id -> (缓存时间, 洞天信息)
+        self._land_cache: Dict[str, Tuple[float, Optional[LandRow]]] = {}
+        # 洞天信息展示文本缓存：user_id -> (缓存时间, 文本)
+        self._info_cache: Dict[str, Tuple[float, str]] = {}
+        # 玩家被删除（重入仙途、死亡等）时清理其缓存
+        db.add_player_delete_hook(self._evict_user)
+    
+    def _evict_user(self, user_id: str):
+        """清除用户的洞天缓存"""
+        self._land_cache.pop(user_id, None)
+        self._info_cache.pop(user_id, None)
     
-    async def get_user_blessed_land(self, user_id: str) -> Optional[Dict]:
+    async def get_user_blessed_land(self, user_id: str) -> Optional[LandRow]:
         """获取用户洞天信息"""
+        cached = self._land_cache.get(user_id)
+        now = time.monotonic()
+        if cached and now - cached[0] < _LAND_CACHE_TTL:
+            return cached[1]
+        
         async with self.db.conn.execute(
-            "SELECT * FROM blessed_lands WHERE user_id = ?",
+            "SELECT land_type, land_name, level, exp_bonus, gold_per_hour, last_collect_time "
+            "FROM blessed_lands WHERE user_id = ?",
             (user_id,)
         ) as cursor:
             row = await cursor.fetchone()
-            if row:
-                return dict(row)
-            return None
+            land = LandRow(*row) if row else None
+        _store_cached(self._land_cache, user_id, land, now, _LAND_CACHE_TTL)
+        return land
+    
+    async def _commit_with_player(self, player: Player, *statements: Tuple[str, tuple]):
+        """在同一事务内写入玩家数据与洞天数据，只提交一次"""
+        await self.db.conn.execute("BEGIN IMMEDIATE")
+        try:
+            await self.db.update_player(player, commit=False)
+            for sql, params in statements:
+                await self.db.conn.execute(sql, params)
+            await self.db.conn.commit()
+        except Exception:
+            await self.db.conn.rollback()
+            raise
+        self._evict_user(player.user_id)
     
     async def purchase_blessed_land(self, player: Player, land_type: int) -> Tuple[bool, str]:
         """购买洞天"""
@@ -41,41 +137,37 @@ class BlessedLandManager:
         if land_type != 1:
             return False, "❌ 初始只能购买小洞天，通过进阶系统提升洞天品质。"
         
-        if land_type not in BLESSED_LANDS:
+        if not _is_valid_land_type(land_type):
             return False, "❌ 无效的洞天类型。"
         
         # 检查是否已有洞天
         existing = await self.get_user_blessed_land(player.user_id)
         if existing:
-            return False, f"❌ 你已拥有【{existing['land_name']}】，请先升级而非重新购买。"
+            return False, f"❌ 你已拥有【{existing.land_name}】，请先升级而非重新购买。"
         
-        land_config = BLESSED_LANDS[land_type]
-        price = land_config["price"]
+        land_config = LAND_CONFIGS[land_type]
+        price = land_config.price
         
         if player.gold < price:
-            return False, f"❌ 灵石不足！购买{land_config['name']}需要 {price:,} 灵石。"
+            return False, f"❌ 灵石不足！购买{land_config.name}需要 {price:,} 灵石。"
         
-        # 扣除灵石
+        # 扣除灵石并创建洞天
         player.gold -= price
-        await self.db.update_player(player)
-        
-        # 创建洞天
-        await self.db.conn.execute(
+        await self._commit_with_player(player, (
             """
             INSERT INTO blessed_lands (user_id, land_type, land_name, level, exp_bonus, 
                                        gold_per_hour, last_collect_time)
             VALUES (?, ?, ?, 1, ?, ?, ?)
             """,
-            (player.user_id, land_type, land_config["name"], land_config["exp_bonus"],
-             land_config["gold_per_hour"], int(time.time()))
-        )
-        await self.db.conn.commit()
+            (player.user_id, land_type, land_config.name, land_config.exp_bonus,
+             land_config.gold_per_hour, int(time.time()))
+        ))
         
         return True, (
-            f"✨ 恭喜获得【{land_config['name']}】！\n"
+            f"✨ 恭喜获得【{land_config.name}】！\n"
             f"━━━━━━━━━━━━━━━\n"
-            f"修炼加成：+{land_config['exp_bonus']:.0%}\n"
-            f"每小时产出：{land_config['gold_per_hour']} 灵石\n"
+            f"修炼加成：+{land_config.exp_bonus:.0%}\n"
+            f"每小时产出：{land_config.gold_per_hour} 灵石\n"
             f"━━━━━━━━━━━━━━━\n"
             f"使用 /洞天收取 领取产出\n"
             f"💡 当小洞天达到5级时，可使用 /进阶洞天 2 提升到中洞天"
@@ -87,46 +179,35 @@ class BlessedLandManager:
         if not land:
             return False, "❌ 你还没有洞天！使用 /购买洞天 <类型> 获取。"
         
-        land_type = land["land_type"]
-        current_level = land["level"]
-        config = BLESSED_LANDS.get(land_type, BLESSED_LANDS[1])
+        land_type = land.land_type
+        current_level = land.level
+        config = _get_land_config(land_type)
         
-        if current_level >= config["max_level"]:
-            return False, f"❌ 你的{land['land_name']}已达最高等级 {config['max_level']}！"
+        if current_level >= config.max_level:
+            return False, f"❌ 你的{land.land_name}已达最高等级 {config.max_level}！"
         
         # 升级费用：使用固定每级费用，更线性增长
-        # 小洞天：每级 1000，中洞天：每级 2000，大洞天：每级 3000，福地：每级 4000，洞天福地：每级 3000
-        level_cost_map = {
-            1: 1000,  # 小洞天
-            2: 2000,  # 中洞天
-            3: 3000,  # 大洞天
-            4: 5000,  # 福地
-            5: 10000   # 洞天福地
-        }
-        upgrade_cost = level_cost_map.get(land_type, 1000)
+        upgrade_cost = config.upgrade_cost
         
         if player.gold < upgrade_cost:
             return False, f"❌ 灵石不足！升级需要 {upgrade_cost:,} 灵石。"
         
         # 升级加成
         new_level = current_level + 1
-        new_exp_bonus = config["exp_bonus"] * (1 + new_level * 0.1)
-        new_gold_per_hour = int(config["gold_per_hour"] * (1 + new_level * 0.15))
+        new_exp_bonus = config.exp_bonus * (1 + new_level * 0.1)
+        new_gold_per_hour = int(config.gold_per_hour * (1 + new_level * 0.15))
         
         player.gold -= upgrade_cost
-        await self.db.update_player(player)
-        
-        await self.db.conn.execute(
+        await self._commit_with_player(player, (
             """
             UPDATE blessed_lands SET level = ?, exp_bonus = ?, gold_per_hour = ?
             WHERE user_id = ?
             """,
             (new_level, new_exp_bonus, new_gold_per_hour, player.user_id)
-        )
-        await self.db.conn.commit()
+        ))
         
         return True, (
-            f"🎉 {land['land_name']}升级到 Lv.{new_level}！\n"
+            f"🎉 {land.land_name}升级到 Lv.{new_level}！\n"
             f"━━━━━━━━━━━━━━━\n"
             f"修炼加成：+{new_exp_bonus:.1%}\n"
             f"每小时产出：{new_gold_per_hour} 灵石\n"
@@ -139,35 +220,29 @@ class BlessedLandManager:
         if not land:
             return False, "❌ 你还没有洞天！"
         
-        last_collect = land["last_collect_time"]
         now = int(time.time())
-        hours_passed = (now - last_collect) / 3600
+        elapsed = now - land.last_collect_time
         
-        if hours_passed < 1:
-            remaining = int(3600 - (now - last_collect))
-            minutes = remaining // 60
+        if elapsed < 3600:
+            minutes = (3600 - elapsed) // 60
             return False, f"❌ 收取冷却中，还需 {minutes} 分钟。"
         
         # 计算产出（最多24小时）
-        hours = min(24, int(hours_passed))
-        gold_income = land["gold_per_hour"] * hours
+        hours = min(24, elapsed // 3600)
+        gold_income = land.gold_per_hour * hours
         
         # 计算修为收益，并限制上限防止高修为玩家收益无限增长
-        land_type = land["land_type"]
-        config = BLESSED_LANDS.get(land_type, BLESSED_LANDS[1])
-        max_exp_per_hour = config.get("max_exp_per_hour", 5000)
-        exp_income = int(player.experience * land["exp_bonus"] * hours * 0.01)
+        land_type = land.land_type
+        max_exp_per_hour = _get_land_config(land_type).max_exp_per_hour
+        exp_income = int(player.experience * land.exp_bonus * hours * 0.01)
         exp_income = min(exp_income, max_exp_per_hour * hours)
         
         player.gold += gold_income
         player.experience += exp_income
-        await self.db.update_player(player)
-        
-        await self.db.conn.execute(
+        await self._commit_with_player(player, (
             "UPDATE blessed_lands SET last_collect_time = ? WHERE user_id = ?",
             (now, player.user_id)
-        )
-        await self.db.conn.commit()
+        ))
         
         return True, (
             f"✅ 洞天收取成功！\n"
@@ -187,97 +262,93 @@ class BlessedLandManager:
             return False, "❌ 你还没有洞天！"
         
         # 检查目标类型是否有效
-        if target_type not in BLESSED_LANDS:
+        if not _is_valid_land_type(target_type):
             return False, "❌ 无效的洞天类型。"
         
         # 检查是否是下一级类型（只能层层进阶）
-        current_type = existing["land_type"]
+        current_type = existing.land_type
         if target_type != current_type + 1:
             next_type = current_type + 1
-            if next_type in BLESSED_LANDS:
-                next_name = BLESSED_LANDS[next_type]["name"]
+            if _is_valid_land_type(next_type):
+                next_name = LAND_CONFIGS[next_type].name
                 return False, f"❌ 只能层层进阶！当前只能进阶到{next_name}。"
             else:
                 return False, "❌ 你的洞天已达最高等级，无法继续进阶。"
         
         # 检查现有洞天是否满级
-        current_config = BLESSED_LANDS[current_type]
-        if existing["level"] < current_config["max_level"]:
-            return False, f"❌ 你的{existing['land_name']}需要达到满级 {current_config['max_level']} 才能进阶。"
+        current_config = _get_land_config(current_type)
+        if existing.level < current_config.max_level:
+            return False, f"❌ 你的{existing.land_name}需要达到满级 {current_config.max_level} 才能进阶。"
         
         # 计算进阶成本（新洞天价格 × 0.3）
-        target_config = BLESSED_LANDS[target_type]
-        advance_cost = int(target_config["price"])
+        target_config = LAND_CONFIGS[target_type]
+        advance_cost = target_config.price
         
         if player.gold < advance_cost:
             return False, f"❌ 灵石不足！进阶需要 {advance_cost:,} 灵石。"
         
         # 扣除灵石
         player.gold -= advance_cost
-        await self.db.update_player(player)
         
         # 取消等级保留，每次进阶后从1级开始
         initial_level = 1
         
         # 删除原洞天，创建新洞天
-        await self.db.conn.execute(
-            "DELETE FROM blessed_lands WHERE user_id = ?",
-            (player.user_id,)
+        await self._commit_with_player(
+            player,
+            (
+                "DELETE FROM blessed_lands WHERE user_id = ?",
+                (player.user_id,)
+            ),
+            (
+                """
+                INSERT INTO blessed_lands (user_id, land_type, land_name, level, exp_bonus, 
+                                           gold_per_hour, last_collect_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (player.user_id, target_type, target_config.name, initial_level, 
+                 target_config.exp_bonus, target_config.gold_per_hour, int(time.time()))
+            ),
         )
-        await self.db.conn.execute(
-            """
-            INSERT INTO blessed_lands (user_id, land_type, land_name, level, exp_bonus, 
-                                       gold_per_hour, last_collect_time)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (player.user_id, target_type, target_config["name"], initial_level, 
-             target_config["exp_bonus"], target_config["gold_per_hour"], int(time.time()))
-        )
-        await self.db.conn.commit()
         
         return True, (
-            f"✨ 恭喜进阶到【{target_config['name']}】！\n"
+            f"✨ 恭喜进阶到【{target_config.name}】！\n"
             f"━━━━━━━━━━━━━━━\n"
             f"初始等级：Lv.{initial_level}\n"
-            f"修炼加成：+{target_config['exp_bonus']:.0%}\n"
-            f"每小时产出：{target_config['gold_per_hour']} 灵石\n"
+            f"修炼加成：+{target_config.exp_bonus:.0%}\n"
+            f"每小时产出：{target_config.gold_per_hour} 灵石\n"
             f"━━━━━━━━━━━━━━━\n"
             f"花费：{advance_cost:,} 灵石"
         )
     
     async def get_blessed_land_info(self, user_id: str) -> str:
         """获取洞天信息展示"""
+        cached = self._info_cache.get(user_id)
+        if cached and time.monotonic() - cached[0] < _INFO_CACHE_TTL:
+            return cached[1]
+        
         land = await self.get_user_blessed_land(user_id)
         if not land:
-            return (
-                "🏔️ 洞天福地\n"
-                "━━━━━━━━━━━━━━━\n"
-                "你还没有洞天！\n\n"
-                "可购买的洞天：\n"
-                "  1. 小洞天 - 10,000灵石\n"
-                "  2. 中洞天 - 50,000灵石\n"
-                "  3. 大洞天 - 200,000灵石\n"
-                "  4. 福地 - 500,000灵石\n"
-                "  5. 洞天福地 - 1,000,000灵石\n\n"
-                "💡 使用 /购买洞天 <编号>"
-            )
+            return _NO_LAND_INFO
         
-        now = int(time.time())
-        hours_since = (now - land["last_collect_time"]) / 3600
-        pending_gold = int(min(24, hours_since) * land["gold_per_hour"])
+        # 与收取一致，按已满的整小时计算（最多24小时）
+        hours = min(24, (int(time.time()) - land.last_collect_time) // 3600)
+        pending_gold = hours * land.gold_per_hour
         
         # 检查是否可以进阶
-        current_config = BLESSED_LANDS[land["land_type"]]
-        can_advance = land["level"] >= current_config["max_level"] and land["land_type"] < 5
+        current_config = _get_land_config(land.land_type)
+        can_advance = land.level >= current_config.max_level and land.land_type < _MAX_LAND_TYPE
         advance_hint = "\n💡 已达满级，可使用 /进阶洞天 <类型> 提升洞天品质" if can_advance else ""
         
-        return (
-            f"🏔️ {land['land_name']} (Lv.{land['level']})\n"
+        info = (
+            f"🏔️ {land.land_name} (Lv.{land.level})\n"
             f"━━━━━━━━━━━━━━━\n"
-            f"修炼加成：+{land['exp_bonus']:.1%}\n"
-            f"每小时产出：{land['gold_per_hour']} 灵石\n"
+            f"修炼加成：+{land.exp_bonus:.1%}\n"
+            f"每小时产出：{land.gold_per_hour} 灵石\n"
             f"━━━━━━━━━━━━━━━\n"
             f"待收取：约 {pending_gold:,} 灵石\n"
             f"━━━━━━━━━━━━━━━\n"
             f"💡 /升级洞天 | /洞天收取{advance_hint}"
         )
+        _store_cached(self._info_cache, user_id, info, time.monotonic(), _INFO_CACHE_TTL)
+        return info
@@ -6,6 +6,8 @@ Boss系统管理器 - 处理Boss生成、战斗、奖励等逻辑
 
 import random
 import time
+from bisect import bisect_right
+from itertools import accumulate
 from typing import Tuple, Dict, Optional, List, TYPE_CHECKING
 from ..data.data_manager import DataBase
 from ..models_extended import Boss, UserStatus
@@ -19,11 +21,66 @@ if TYPE_CHECKING:
     from ..config_manager import ConfigManager
 
 
+# Boss消息模板，模块加载时解析一次，调用处只做 str.format 替换
+_SPAWN_MSG = (
+    "👹 Boss降临\n"
+    "━━━━━━━━━━━━━━━\n"
+    "\n"
+    "{boss_name}降临世间！\n"
+    "\n"
+    "境界：{level_name}\n"
+    "HP：{max_hp}\n"
+    "ATK：{atk}\n"
+    "防御：{defense}%减伤\n"
+    "奖励：{stone_reward}灵石\n"
+    "\n"
+    "快来挑战吧！"
+)
+_WIN_MSG = (
+    "🎉 挑战成功！\n"
+    "━━━━━━━━━━━━━━━\n"
+    "\n"
+    "你成功击败了『{boss_name}』！\n"
+    "\n"
+    "战斗回合数：{rounds}\n"
+    "获得灵石：{reward}{item_msg}\n"
+    "\n"
+    "{player_name}\n"
+    "HP：{hp}/{max_hp}"
+)
+_LOSE_MSG = (
+    "💀 挑战失败\n"
+    "━━━━━━━━━━━━━━━\n"
+    "\n"
+    "你被『{boss_name}』击败了！\n"
+    "\n"
+    "战斗回合数：{rounds}\n"
+    "安慰奖：{reward}灵石\n"
+    "\n"
+    "{boss_name} 剩余HP：{hp}/{max_hp}"
+)
+_INFO_MSG = (
+    "👹 当前Boss\n"
+    "━━━━━━━━━━━━━━━\n"
+    "\n"
+    "名称：{boss_name}\n"
+    "境界：{boss_level}\n"
+    "\n"
+    "HP：{hp}/{max_hp} ({hp_percent:.1f}%)\n"
+    "ATK：{atk}\n"
+    "防御：{defense}%减伤\n"
+    "\n"
+    "奖励：{stone_reward}灵石\n"
+    "\n"
+    "使用 /挑战Boss 来挑战！"
+)
+
+
 class BossManager:
     """Boss系统管理器"""
     
     # Boss境界配置
-    BOSS_LEVELS = [
+    BOSS_LEVELS = (
         {"name": "练气", "level_index": 0, "hp_mult": 1.0, "atk_mult": 1.0, "reward_mult": 1.0},
         {"name": "筑基", "level_index": 3, "hp_mult": 1.5, "atk_mult": 1.2, "reward_mult": 1.5},
         {"name": "金丹", "level_index": 6, "hp_mult": 2.0, "atk_mult": 1.5, "reward_mult": 2.0},
@@ -32,14 +89,14 @@ class BossManager:
         {"name": "炼虚", "level_index": 15, "hp_mult": 4.0, "atk_mult": 2.5, "reward_mult": 4.0},
         {"name": "合体", "level_index": 18, "hp_mult": 5.0, "atk_mult": 3.0, "reward_mult": 5.0},
         {"name": "大乘", "level_index": 21, "hp_mult": 6.0, "atk_mult": 3.5, "reward_mult": 6.0},
-    ]
+    )
     
     # Boss名称池
-    BOSS_NAMES = [
+    BOSS_NAMES = (
         "血魔", "邪修", "魔头", "妖王", "魔君",
         "异兽", "凶兽", "妖尊", "魔尊", "邪帝",
         "天魔", "地魔", "魔神", "妖神", "邪神"
-    ]
+    )
     
     # Boss物品掉落表
     BOSS_DROP_TABLE = {
@@ -62,6 +119,11 @@ class BossManager:
             {"name": "仙器碎片", "weight": 10, "min": 1, "max": 1},
         ],
     }
+    # 掉落表的累积权重，供 random.choices 直接使用
+    BOSS_DROP_CUM_WEIGHTS = {
+        tier: list(accumulate(item["weight"] for item in table))
+        for tier, table in BOSS_DROP_TABLE.items()
+    }
     
     def __init__(
         self, 
@@ -80,6 +142,22 @@ class BossManager:
         self.skill_manager = skill_manager
         self.config = config_manager.boss_config if config_manager else {}
         self.levels = self.config.get("levels", self.BOSS_LEVELS)
+        # 自动生成Boss时按平均修为选境界：按门槛升序排列，供 bisect 查找
+        self._spawn_levels = sorted(self.levels, key=lambda c: c.get("level_index", 0))
+        self._level_thresholds = [c.get("level_index", 0) * 10000 for c in self._spawn_levels]
+        # 境界名 -> level_index，同名时取第一个（与原顺序查找一致）
+        self._level_index_by_name: Dict[str, int] = {}
+        for level in self.levels:
+            self._level_index_by_name.setdefault(level["name"], level["level_index"])
+        # 境界名 -> 完整Boss名称池（名称·境界境），生成Boss时直接随机选取
+        self._names_by_level: Dict[str, Tuple[str, ...]] = {
+            level["name"]: self._build_boss_names(level["name"]) for level in self.levels
+        }
+    
+    @classmethod
+    def _build_boss_names(cls, level_name: str) -> Tuple[str, ...]:
+        """拼接指定境界的全部Boss名称"""
+        return tuple(f"{name}·{level_name}境" for name in cls.BOSS_NAMES)
     
     async def spawn_boss(
         self,
@@ -106,7 +184,10 @@ class BossManager:
             level_config = random.choice(self.levels)
         
         # 生成Boss名称
-        boss_name = random.choice(self.BOSS_NAMES) + f"·{level_config['name']}境"
+        names = self._names_by_level.get(level_config["name"])
+        if names is None:
+            names = self._build_boss_names(level_config["name"])
+        boss_name = random.choice(names)
         
         # 计算Boss属性
         hp_mult = level_config["hp_mult"]
@@ -142,20 +223,14 @@ class BossManager:
         boss_id = await self.db.ext.create_boss(boss)
         boss.boss_id = boss_id
         
-        msg = f"""
-👹 Boss降临
-━━━━━━━━━━━━━━━
-
-{boss_name}降临世间！
-
-境界：{level_config["name"]}
-HP：{max_hp}
-ATK：{atk}
-防御：{defense}%减伤
-奖励：{stone_reward}灵石
-
-快来挑战吧！
-        """.strip()
+        msg = _SPAWN_MSG.format(
+            boss_name=boss_name,
+            level_name=level_config["name"],
+            max_hp=max_hp,
+            atk=atk,
+            defense=defense,
+            stone_reward=stone_reward,
+        )
         
         return True, msg, boss
     
@@ -172,11 +247,7 @@ ATK：{atk}
         from ..core.battle_manager import CombatStats
         
         # 根据Boss境界计算属性
-        level_index = 0
-        for level in self.levels:
-            if level["name"] == boss.boss_level:
-                level_index = level["level_index"]
-                break
+        level_index = self._level_index_by_name.get(boss.boss_level, 0)
         
         # Boss的物理/法术攻击基于ATK
         physical_attack = boss.atk
@@ -240,14 +311,13 @@ ATK：{atk}
             return False, "❌ 当前没有Boss！", None
         
         # 3. 检查玩家状态
-        user_cd = await self.db.ext.get_user_cd(user_id)
-        if not user_cd:
-            await self.db.ext.create_user_cd(user_id)
-            user_cd = await self.db.ext.get_user_cd(user_id)
+        user_cd = await self.db.ext.get_or_create_user_cd(user_id)
         
         if user_cd.type != UserStatus.IDLE:
             return False, "❌ 你当前正忙，无法挑战Boss！", None
         
+        now = int(time.time())
+        
         # 4. 检查玩家血量，如果血量过低，需要冷却时间
         if player.hp <= 1:
             import json
@@ -258,8 +328,8 @@ ATK：{atk}
                 last_defeat_time = extra_data.get('last_boss_defeat_time', 0)
                 
                 if last_defeat_time:
-                    if int(time.time()) - last_defeat_time < cooldown_time:
-                        remaining_time = cooldown_time - (int(time.time()) - last_defeat_time)
+                    if now - last_defeat_time < cooldown_time:
+                        remaining_time = cooldown_time - (now - last_defeat_time)
                         minutes = remaining_time // 60
                         seconds = remaining_time % 60
                         return False, f"❌ 你当前血量过低，需要休息一段时间才能再次挑战Boss！\n\n💡 剩余冷却时间：{minutes}分{seconds}秒", None
@@ -314,15 +384,15 @@ ATK：{atk}
             if self.storage_ring_manager:
                 dropped_items = await self._roll_boss_drops(player, boss)
                 if dropped_items:
-                    item_lines = []
+                    # 标题与各物品行收集到同一列表，最后一次 join 完成拼接
+                    item_lines = ["\n\n📦 获得物品："]
                     for item_name, count in dropped_items:
                         success, _ = await self.storage_ring_manager.store_item(player, item_name, count, silent=True)
                         if success:
                             item_lines.append(f"  · {item_name} x{count}")
                         else:
                             item_lines.append(f"  · {item_name} x{count}（储物戒已满，丢失）")
-                    if item_lines:
-                        item_msg = "\n\n📦 获得物品：\n" + "\n".join(item_lines)
+                    item_msg = "\n".join(item_lines)
             
             # 更新玩家HP（按战斗结果比例）
             final_hp_ratio = battle_result["p1_final"]["hp"] / battle_result["p1_final"]["max_hp"]
@@ -330,18 +400,15 @@ ATK：{atk}
             player.mp = player.max_mp  # MP恢复满
             await self.db.update_player(player)
             
-            result_msg = f"""
-🎉 挑战成功！
-━━━━━━━━━━━━━━━
-
-你成功击败了『{boss.boss_name}』！
-
-战斗回合数：{battle_result['rounds']}
-获得灵石：{reward}{item_msg}
-
-{player_stats.name}
-HP：{battle_result['p1_final']['hp']}/{player_stats.max_hp}
-            """.strip()
+            result_msg = _WIN_MSG.format(
+                boss_name=boss.boss_name,
+                rounds=battle_result["rounds"],
+                reward=reward,
+                item_msg=item_msg,
+                player_name=player_stats.name,
+                hp=battle_result["p1_final"]["hp"],
+                max_hp=player_stats.max_hp,
+            )
             
             # 添加战斗结果信息供广播使用
             battle_result["reward"] = reward
@@ -362,27 +429,24 @@ HP：{battle_result['p1_final']['hp']}/{player_stats.max_hp}
             import json
             try:
                 extra_data = json.loads(user_cd.extra_data) if user_cd.extra_data else {}
-                extra_data['last_boss_defeat_time'] = int(time.time())
+                extra_data['last_boss_defeat_time'] = now
                 user_cd.extra_data = json.dumps(extra_data)
                 await self.db.ext.update_user_cd(user_cd)
             except Exception:
                 pass
             
-            result_msg = f"""
-💀 挑战失败
-━━━━━━━━━━━━━━━
-
-你被『{boss.boss_name}』击败了！
-
-战斗回合数：{battle_result['rounds']}
-安慰奖：{reward}灵石
-
-{boss.boss_name} 剩余HP：{boss.hp}/{boss.max_hp}
-            """.strip()
+            result_msg = _LOSE_MSG.format(
+                boss_name=boss.boss_name,
+                rounds=battle_result["rounds"],
+                reward=reward,
+                hp=boss.hp,
+                max_hp=boss.max_hp,
+            )
         
         # 生成战斗摘要
-        battle_summary = self.battle_mgr.generate_battle_summary(battle_result, include_full_log=False)
-        full_msg = battle_summary + "\n\n" + result_msg
+        full_msg = self.battle_mgr.generate_battle_summary(
+            battle_result, include_full_log=False, footer=result_msg
+        )
         
         return True, full_msg, battle_result
     
@@ -403,21 +467,16 @@ HP：{battle_result['p1_final']['hp']}/{player_stats.max_hp}
         
         hp_percent = (boss.hp / boss.max_hp) * 100
         
-        msg = f"""
-👹 当前Boss
-━━━━━━━━━━━━━━━
-
-名称：{boss.boss_name}
-境界：{boss.boss_level}
-
-HP：{boss.hp}/{boss.max_hp} ({hp_percent:.1f}%)
-ATK：{boss.atk}
-防御：{boss.defense}%减伤
-
-奖励：{boss.stone_reward}灵石
-
-使用 /挑战Boss 来挑战！
-        """.strip()
+        msg = _INFO_MSG.format(
+            boss_name=boss.boss_name,
+            boss_level=boss.boss_level,
+            hp=boss.hp,
+            max_hp=boss.max_hp,
+            hp_percent=hp_percent,
+            atk=boss.atk,
+            defense=boss.defense,
+            stone_reward=boss.stone_reward,
+        )
         
         return True, msg, boss
     
@@ -437,24 +496,19 @@ ATK：{boss.atk}
         if existing_boss:
             return False, "当前已有Boss存在", None
         
-        # 获取所有玩家的平均等级
-        all_players = await self.db.get_all_players()
-        if not all_players:
+        # 获取所有玩家的平均等级（数据库聚合，无需加载全部玩家）
+        player_total, total_exp = await self.db.get_player_exp_stats()
+        if not player_total:
             # 没有玩家，生成低级Boss
             level_config = self.levels[0]
             base_exp = 50000
         else:
             # 计算平均修为
-            total_exp = sum(p.experience for p in all_players)
-            avg_exp = total_exp // len(all_players) if all_players else 50000
+            avg_exp = total_exp // player_total
             
-            # 根据平均修为选择Boss等级
-            for config in reversed(self.levels):
-                if avg_exp >= config.get("level_index", 0) * 10000:
-                    level_config = config
-                    break
-            else:
-                level_config = self.levels[0]
+            # 根据平均修为选择Boss等级：门槛不超过平均修为的最高境界
+            idx = bisect_right(self._level_thresholds, avg_exp) - 1
+            level_config = self._spawn_levels[idx] if idx >= 0 else self.levels[0]
             
             # Boss修为比平均稍高
             base_exp = int(avg_exp * 1.2)
@@ -476,42 +530,26 @@ ATK：{boss.atk}
         dropped_items = []
         
         # 根据Boss等级确定掉落表
-        boss_level_index = 0
-        for level in self.levels:
-            if level["name"] == boss.boss_level:
-                boss_level_index = level["level_index"]
-                break
+        boss_level_index = self._level_index_by_name.get(boss.boss_level, 0)
         
         if boss_level_index <= 6:  # 练气-金丹
-            drop_table = self.BOSS_DROP_TABLE["low"]
+            tier = "low"
         elif boss_level_index <= 12:  # 元婴-化神
-            drop_table = self.BOSS_DROP_TABLE["mid"]
+            tier = "mid"
         else:  # 炼虚及以上
-            drop_table = self.BOSS_DROP_TABLE["high"]
-        
-        # Boss击杀100%掉落至少1件物品
-        total_weight = sum(item["weight"] for item in drop_table)
-        roll = random.randint(1, total_weight)
+            tier = "high"
+        drop_table = self.BOSS_DROP_TABLE[tier]
+        cum_weights = self.BOSS_DROP_CUM_WEIGHTS[tier]
         
-        current_weight = 0
-        for item in drop_table:
-            current_weight += item["weight"]
-            if roll <= current_weight:
-                count = random.randint(item["min"], item["max"])
-                dropped_items.append((item["name"], count))
-                break
-        
-        # 高级Boss有70%概率额外掉落
+        # Boss击杀100%掉落至少1件物品；高级Boss有概率额外掉落
+        rolls = 1
         if boss_level_index >= 9:  # 元婴及以上
             extra_chance = 50 if boss_level_index < 15 else 70
-            if random.randint(1, 100) <= extra_chance:
-                roll = random.randint(1, total_weight)
-                current_weight = 0
-                for item in drop_table:
-                    current_weight += item["weight"]
-                    if roll <= current_weight:
-                        count = random.randint(item["min"], item["max"])
-                        dropped_items.append((item["name"], count))
-                        break
+            if random.random() * 100 < extra_chance:
+                rolls = 2
+        
+        for item in random.choices(drop_table, cum_weights=cum_weights, k=rolls):
+            count = random.randint(item["min"], item["max"])
+            dropped_items.append((item["name"], count))
         
         return dropped_items
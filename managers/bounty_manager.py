@@ -4,6 +4,7 @@
 import json
 import random
 import time
+from collections import OrderedDict
 from pathlib import Path
 from typing import Tuple, List, Optional, Dict, TYPE_CHECKING
 
@@ -11,17 +12,32 @@ from astrbot.api import logger
 
 from ..data import DataBase
 from ..models import Player
+from ..utils import build_alias_table, load_json_cached, sample_alias
 
 if TYPE_CHECKING:
     from ..core import StorageRingManager
 
 __all__ = ["BountyManager"]
 
+_rng = random.Random()
+
+# 接取成功提示模板，生成悬赏榜时按条目预先填充
+_ACCEPT_MSG = (
+    "🎯 接取悬赏成功！\n"
+    "任务：{name}（{difficulty_name}）\n"
+    "目标：完成 {count} 次\n"
+    "奖励：{stone:,} 灵石 + {exp:,} 修为\n"
+    "时限：{minutes} 分钟"
+)
+
 
 class BountyManager:
     """悬赏令管理器"""
 
     BOUNTY_CACHE_DURATION = 600  # 任务列表缓存10分钟
+    BOUNTY_CACHE_SIZE = 64  # 最多缓存的境界悬赏池数量
+    BOUNTY_POOL_SIZE = 4  # 每个难度预先生成的悬赏条数
+    BOARD_PRUNE_THRESHOLD = 256  # 玩家悬赏榜达到该数量时顺带清理过期条目
     CONFIG_FILE = Path(__file__).resolve().parents[1] / "config" / "bounty_templates.json"
     ADVENTURE_CONFIG_FILE = Path(__file__).resolve().parents[1] / "config" / "adventure_config.json"
     DEFAULT_CONFIG = {
@@ -55,11 +71,21 @@ class BountyManager:
     def __init__(self, db: DataBase, storage_ring_manager: Optional["StorageRingManager"] = None):
         self.db = db
         self.storage_ring_manager = storage_ring_manager
-        self._bounty_cache: Dict[str, Dict] = {}
+        # 悬赏池只取决于境界，同境界玩家共享：level_index -> (过期时间, 各难度的预生成悬赏)，按LRU淘汰
+        self._bounty_pool_cache: "OrderedDict[int, Tuple[int, Tuple[Tuple[dict, ...], ...]]]" = OrderedDict()
+        # 玩家查看时从悬赏池抽取的悬赏榜：user_id -> (过期时间, 悬赏列表, 编号索引, 展示文本)
+        # 过期时间从玩家查看时起算，保证每位玩家都有完整的接取时限；展示文本在首次展示时填充
+        self._user_boards: Dict[str, Tuple[int, List[dict], Dict[int, dict], Optional[str]]] = {}
         self.difficulties: Dict[str, dict] = {}
         self.templates_by_id: Dict[int, dict] = {}
         self.templates_by_diff: Dict[str, List[dict]] = {}
         self.item_tables: Dict[str, List[dict]] = {}
+        # 各难度模板的别名表（Vose），生成悬赏时 O(1) 抽取
+        self._template_alias_by_diff: Dict[str, Optional[tuple]] = {}
+        # 各物品表的别名表（Vose），掉落时 O(1) 抽取；总权重非正的表为 None
+        self._item_alias_tables: Dict[str, Optional[tuple]] = {}
+        # 难度计划只随境界档位（<7、7-11、>=12）变化，配置加载时预先算好
+        self._difficulty_plans: Tuple[Tuple[str, ...], ...] = ()
         self.adventure_tag_meta: Dict[str, Dict[str, int]] = {}
         self.reload_config()
 
@@ -74,16 +100,42 @@ class BountyManager:
         for tpl in config.get("templates", []):
             tpl_copy = dict(tpl)
             tpl_copy["progress_tags"] = [str(tag).lower() for tag in tpl_copy.get("progress_tags", [])]
+            tpl_copy["_progress_tags_set"] = frozenset(tpl_copy["progress_tags"])
             self.templates_by_id[tpl_copy["id"]] = tpl_copy
             self.templates_by_diff.setdefault(tpl_copy["difficulty"], []).append(tpl_copy)
+            # 预乘难度系数：(灵石基数, 修为基数, 最低目标数)，生成悬赏时只需乘境界与进度系数
+            diff_cfg = self.difficulties.get(tpl_copy["difficulty"], {})
+            base_reward = tpl_copy.get("reward", {"stone": 200, "exp": 2000})
+            tpl_copy["_scaled_reward"] = (
+                base_reward.get("stone", 0) * diff_cfg.get("stone_scale", 1.0),
+                base_reward.get("exp", 0) * diff_cfg.get("exp_scale", 1.0),
+                max(1, tpl_copy.get("min_target", 1)),
+            )
+        self._template_alias_by_diff = {
+            diff: build_alias_table(templates, [max(1, tpl.get("weight", 1)) for tpl in templates])
+            for diff, templates in self.templates_by_diff.items()
+        }
+        self._item_alias_tables = {
+            name: build_alias_table(table, [item["weight"] for item in table])
+            for name, table in self.item_tables.items()
+        }
+        self._difficulty_plans = tuple(
+            tuple(diff for diff in plan if diff in self.difficulties)
+            for plan in (
+                ("easy", "normal"),
+                ("easy", "normal", "hard"),
+                ("easy", "normal", "hard", "elite"),
+            )
+        )
+        self._bounty_pool_cache.clear()
+        self._user_boards.clear()
         logger.info(f"悬赏配置加载完成：{len(self.templates_by_id)} 条模板")
         self._load_adventure_meta()
 
     def _load_config_file(self) -> dict:
         if self.CONFIG_FILE.exists():
             try:
-                with open(self.CONFIG_FILE, "r", encoding="utf-8") as f:
-                    return json.load(f)
+                return load_json_cached(str(self.CONFIG_FILE), self.CONFIG_FILE.stat().st_mtime_ns)
             except Exception as exc:
                 logger.error(f"加载 bounty_templates.json 失败，将使用默认配置: {exc}")
         return self.DEFAULT_CONFIG
@@ -93,8 +145,10 @@ class BountyManager:
         if not self.ADVENTURE_CONFIG_FILE.exists():
             return
         try:
-            with open(self.ADVENTURE_CONFIG_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            # 与历练管理器共享同一份解析结果（只读使用）
+            data = load_json_cached(
+                str(self.ADVENTURE_CONFIG_FILE), self.ADVENTURE_CONFIG_FILE.stat().st_mtime_ns
+            )
             for route in data.get("routes", []):
                 tag = str(route.get("bounty_tag", "")).lower()
                 if not tag:
@@ -109,88 +163,153 @@ class BountyManager:
 
     # -------- 列表 & 缓存 --------
 
-    def _get_cached_bounties(self, user_id: str) -> Optional[List[dict]]:
-        cache = self._bounty_cache.get(user_id)
-        if cache and cache["expire_time"] > int(time.time()):
-            return cache["bounties"]
+    def _get_bounty_pool(self, level_index: int, now: int) -> Tuple[Tuple[dict, ...], ...]:
+        """获取境界对应的悬赏池，过期或不存在时重新生成"""
+        cache = self._bounty_pool_cache.get(level_index)
+        if cache and cache[0] > now:
+            self._bounty_pool_cache.move_to_end(level_index)
+            return cache[1]
+
+        pool = []
+        for diff in self._get_difficulty_plan(level_index):
+            entries = []
+            for _ in range(self.BOUNTY_POOL_SIZE):
+                entry = self._build_bounty_entry(diff, level_index)
+                if entry:
+                    entries.append(entry)
+            if entries:
+                pool.append(tuple(entries))
+        pool = tuple(pool)
+
+        self._bounty_pool_cache[level_index] = (now + self.BOUNTY_CACHE_DURATION, pool)
+        self._bounty_pool_cache.move_to_end(level_index)
+        while len(self._bounty_pool_cache) > self.BOUNTY_CACHE_SIZE:
+            self._bounty_pool_cache.popitem(last=False)
+        return pool
+
+    def _get_user_board(self, user_id: str, now: int) -> Optional[tuple]:
+        board = self._user_boards.get(user_id)
+        if board and board[0] > now:
+            return board
         return None
 
-    def _set_cached_bounties(self, user_id: str, bounties: List[dict]):
-        self._bounty_cache[user_id] = {
-            "bounties": bounties,
-            "expire_time": int(time.time()) + self.BOUNTY_CACHE_DURATION
-        }
+    def _get_cached_bounty(self, user_id: str, bounty_id: int, now: int) -> Optional[dict]:
+        """按编号取玩家悬赏榜中的条目，悬赏榜已过期时返回None"""
+        board = self._get_user_board(user_id, now)
+        if board:
+            return board[2].get(bounty_id)
+        return None
+
+    def _set_user_board(self, user_id: str, bounties: List[dict], now: int):
+        boards = self._user_boards
+        if len(boards) >= self.BOARD_PRUNE_THRESHOLD:
+            for key in [k for k, board in boards.items() if board[0] <= now]:
+                del boards[key]
+        # 同编号出现多次时保留首条，与原先顺序查找的结果一致
+        by_id = {b["id"]: b for b in reversed(bounties)}
+        boards[user_id] = (now + self.BOUNTY_CACHE_DURATION, bounties, by_id, None)
 
     async def get_bounty_list(self, player: Player) -> List[dict]:
-        """获取悬赏列表"""
-        cached = self._get_cached_bounties(player.user_id)
-        if cached:
-            return cached
-
-        plan = self._get_difficulty_plan(player.level_index)
-        bounties: List[dict] = []
-        for diff in plan:
-            entry = self._build_bounty_entry(diff, player)
-            if entry:
-                bounties.append(entry)
-
-        self._set_cached_bounties(player.user_id, bounties)
+        """获取悬赏列表（从同境界共享的悬赏池中为玩家抽取，每个难度一条）"""
+        now = int(time.time())
+        board = self._get_user_board(player.user_id, now)
+        if board:
+            return board[1]
+
+        pool = self._get_bounty_pool(player.level_index, now)
+        bounties = [_rng.choice(entries) for entries in pool]
+        self._set_user_board(player.user_id, bounties, now)
         return bounties
 
-    def _get_difficulty_plan(self, level_index: int) -> List[str]:
-        plan = ["easy", "normal"]
-        if level_index >= 7:
-            plan.append("hard")
+    async def get_bounty_board(self, player: Player) -> str:
+        """获取悬赏榜展示文本（与玩家悬赏榜一同缓存，有效期内重复查看时直接复用）"""
+        bounties = await self.get_bounty_list(player)
+        board = self._user_boards.get(player.user_id)
+        if board and board[1] is bounties and board[3] is not None:
+            return board[3]
+
+        lines = ["📜 悬赏令 · 今日委托", "━━━━━━━━━━━━━━━"]
+        for b in bounties:
+            reward = b.get("reward", {})
+            lines.append(
+                f"[{b['id']}] {b['name']}（{b.get('difficulty_name', '未知')}·{b.get('category', '任务')}）\n"
+                f"  - 目标：完成 {b.get('count')} 次 | 时限：{b.get('time_limit', 0) // 60} 分钟\n"
+                f"  - 奖励：{reward.get('stone', 0):,} 灵石 + {reward.get('exp', 0):,} 修为\n"
+                f"  - 说明：{b.get('description', '')}"
+            )
+        lines.append("━━━━━━━━━━━━━━━")
+        lines.append("💡 使用 /接取悬赏 <编号> 接取任务")
+        text = "\n".join(lines)
+
+        if board and board[1] is bounties:
+            self._user_boards[player.user_id] = (board[0], bounties, board[2], text)
+        return text
+
+    def _get_difficulty_plan(self, level_index: int) -> Tuple[str, ...]:
         if level_index >= 12:
-            plan.append("elite")
-        return [diff for diff in plan if diff in self.difficulties]
+            return self._difficulty_plans[2]
+        if level_index >= 7:
+            return self._difficulty_plans[1]
+        return self._difficulty_plans[0]
 
     def _pick_template(self, difficulty: str) -> Optional[dict]:
-        templates = self.templates_by_diff.get(difficulty)
-        if not templates:
+        table = self._template_alias_by_diff.get(difficulty)
+        if not table:
             return None
-        total = sum(max(1, tpl.get("weight", 1)) for tpl in templates)
-        roll = random.randint(1, total)
-        upto = 0
-        for tpl in templates:
-            upto += max(1, tpl.get("weight", 1))
-            if roll <= upto:
-                return tpl
-        return templates[0]
-
-    def _build_bounty_entry(self, difficulty: str, player: Player) -> Optional[dict]:
+        return sample_alias(table, _rng)
+
+    def _build_bounty_entry(self, difficulty: str, level_index: int) -> Optional[dict]:
         template = self._pick_template(difficulty)
         if not template:
             return None
         diff_cfg = self.difficulties.get(difficulty, {})
-        target = random.randint(template.get("min_target", 1), template.get("max_target", 1))
-        reward = self._calculate_reward(template, diff_cfg, player, target)
-        progress_tags = [str(tag).lower() for tag in template.get("progress_tags", [])]
+        target = _rng.randint(template.get("min_target", 1), template.get("max_target", 1))
+        reward = self._calculate_reward(template, level_index, target)
+        progress_tags = list(template["progress_tags"])
         time_limit = self._calculate_time_limit(template, target)
-        return {
+        difficulty_name = diff_cfg.get("name", difficulty)
+        item_table = template.get("item_table", "gather")
+        description = template.get("description", "")
+        entry = {
             "id": template["id"],
             "name": template["name"],
             "category": template.get("category", "任务"),
             "difficulty": difficulty,
-            "difficulty_name": diff_cfg.get("name", difficulty),
-            "description": template.get("description", ""),
+            "difficulty_name": difficulty_name,
+            "description": description,
             "count": target,
             "reward": reward,
             "time_limit": time_limit,
             "progress_tags": progress_tags,
-            "item_table": template.get("item_table", "gather")
+            "item_table": item_table
         }
-
-    def _calculate_reward(self, template: dict, diff_cfg: dict, player: Player, target: int) -> Dict[str, int]:
-        base_reward = template.get("reward", {"stone": 200, "exp": 2000})
-        stone = base_reward.get("stone", 0)
-        exp = base_reward.get("exp", 0)
-        level_bonus = 1 + max(0, player.level_index - 3) * 0.06
-        progress_factor = max(1, target) / max(1, template.get("min_target", 1))
-        stone_scale = diff_cfg.get("stone_scale", 1.0)
-        exp_scale = diff_cfg.get("exp_scale", 1.0)
-        final_stone = int(stone * stone_scale * progress_factor * level_bonus)
-        final_exp = int(exp * exp_scale * progress_factor * level_bonus)
+        # 接取时写入的奖励JSON与成功提示只取决于本条悬赏，随悬赏榜一同生成，接取时直接复用
+        # rewards 列保留完整JSON供旧版本读取，读取路径使用独立列
+        entry["_rewards_json"] = json.dumps({
+            "stone": reward["stone"],
+            "exp": reward["exp"],
+            "difficulty": difficulty,
+            "difficulty_name": difficulty_name,
+            "item_table": item_table,
+            "description": description,
+            "progress_tags": progress_tags
+        }, ensure_ascii=False)
+        entry["_accept_msg"] = _ACCEPT_MSG.format(
+            name=template["name"],
+            difficulty_name=difficulty_name,
+            count=target,
+            stone=reward["stone"],
+            exp=reward["exp"],
+            minutes=time_limit // 60,
+        )
+        return entry
+
+    def _calculate_reward(self, template: dict, level_index: int, target: int) -> Dict[str, int]:
+        scaled_stone, scaled_exp, min_target = template["_scaled_reward"]
+        level_bonus = 1 + max(0, level_index - 3) * 0.06
+        progress_factor = max(1, target) / min_target
+        final_stone = int(scaled_stone * progress_factor * level_bonus)
+        final_exp = int(scaled_exp * progress_factor * level_bonus)
         return {"stone": final_stone, "exp": final_exp}
 
     def _calculate_time_limit(self, template: dict, target: int) -> int:
@@ -226,88 +345,55 @@ class BountyManager:
             return False, "该悬赏已失效，请刷新列表。"
 
         diff_key = template.get("difficulty", "easy")
-        diff_cfg = self.difficulties.get(diff_key, {})
-        cached_bounties = self._get_cached_bounties(player.user_id)
-        cached = None
-        if cached_bounties:
-            cached = next((b for b in cached_bounties if b["id"] == bounty_id), None)
+        now = int(time.time())
+        cached = self._get_cached_bounty(player.user_id, bounty_id, now)
         if not cached:
             return False, "⚠️ 悬赏列表已刷新，请先发送 /悬赏令 重新查看后再接取。"
 
-        now = int(time.time())
         time_limit = cached.get("time_limit", template.get("time_limit", 3600))
 
-        await self.db.conn.execute("BEGIN IMMEDIATE")
-        try:
+        # 放弃冷却随玩家数据一并加载，无需额外查询
+        cd_time = player.bounty_abandon_cd
+        if now < cd_time:
+            remaining = (cd_time - now) // 60 or 1
+            return False, f"你刚放弃过悬赏，还需等待 {remaining} 分钟才能再次接取。"
+
+        await self.db.ext.ensure_bounty_tables()
+        # 无进行中悬赏才插入，无需先查询再写入
+        created = await self.db.ext.create_bounty(
+            player.user_id,
+            bounty_id,
+            template["name"],
+            cached.get("category", template.get("category", "任务")),
+            cached["count"],
+            cached["_rewards_json"],
+            now,
+            now + time_limit,
+            cached["reward"]["stone"],
+            cached["reward"]["exp"],
+            cached.get("difficulty_name", diff_key),
+            cached.get("item_table") or "",
+            cached.get("description", ""),
+            ",".join(cached.get("progress_tags", []))
+        )
+        if not created:
             active = await self.db.ext.get_active_bounty(player.user_id)
-            if active:
-                await self.db.conn.rollback()
-                return False, f"你已有进行中的悬赏：{active['bounty_name']}，请先完成或放弃。"
-
-            cd_key = f"bounty_abandon_cd_{player.user_id}"
-            cd_value = await self.db.ext.get_system_config(cd_key)
-            if cd_value:
-                cd_time = int(cd_value)
-                if now < cd_time:
-                    await self.db.conn.rollback()
-                    remaining = (cd_time - now) // 60 or 1
-                    return False, f"你刚放弃过悬赏，还需等待 {remaining} 分钟才能再次接取。"
-
-            expire_time = now + time_limit
-            rewards_json = json.dumps({
-                "stone": cached["reward"]["stone"],
-                "exp": cached["reward"]["exp"],
-                "difficulty": diff_key,
-                "difficulty_name": cached.get("difficulty_name", diff_key),
-                "item_table": cached.get("item_table"),
-                "description": cached.get("description", ""),
-                "progress_tags": cached.get("progress_tags", [])
-            }, ensure_ascii=False)
+            active_name = active["bounty_name"] if active else template["name"]
+            return False, f"你已有进行中的悬赏：{active_name}，请先完成或放弃。"
 
-            await self.db.conn.execute(
-                """
-                INSERT INTO bounty_tasks (
-                    user_id, bounty_id, bounty_name, target_type,
-                    target_count, current_progress, rewards,
-                    start_time, expire_time, status
-                ) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, 1)
-                """,
-                (
-                    player.user_id,
-                    bounty_id,
-                    template["name"],
-                    cached.get("category", template.get("category", "任务")),
-                    cached["count"],
-                    rewards_json,
-                    now,
-                    expire_time
-                )
-            )
-            await self.db.conn.commit()
-        except Exception:
-            await self.db.conn.rollback()
-            raise
-
-        return True, (
-            f"🎯 接取悬赏成功！\n"
-            f"任务：{template['name']}（{cached.get('difficulty_name', diff_key)}）\n"
-            f"目标：完成 {cached['count']} 次\n"
-            f"奖励：{cached['reward']['stone']:,} 灵石 + {cached['reward']['exp']:,} 修为\n"
-            f"时限：{time_limit // 60} 分钟"
-        )
+        return True, cached["_accept_msg"]
 
     async def check_bounty_status(self, player: Player) -> Tuple[bool, str]:
         active = await self.db.ext.get_active_bounty(player.user_id)
         if not active:
             return False, "你当前没有进行中的悬赏任务。\n使用 /悬赏令 查看可接取的任务。"
 
-        rewards = json.loads(active["rewards"])
         remaining = max(0, active["expire_time"] - int(time.time()))
         progress = active.get("current_progress", 0)
         target = active.get("target_count", 1)
 
-        diff_name = rewards.get("difficulty_name", rewards.get("difficulty", "未知"))
-        desc = rewards.get("description", "")
+        diff_name = active["difficulty_name"] or "未知"
+        desc = active["description"]
 
         return True, (
             f"📜 当前悬赏（{diff_name}）\n"
@@ -315,48 +401,52 @@ class BountyManager:
             f"任务：{active['bounty_name']}\n"
             f"说明：{desc}\n"
             f"进度：{progress}/{target}\n"
-            f"奖励：{rewards.get('stone', 0):,} 灵石 + {rewards.get('exp', 0):,} 修为\n"
+            f"奖励：{active['reward_stone']:,} 灵石 + {active['reward_exp']:,} 修为\n"
             f"剩余时间：{remaining // 60} 分钟\n"
             f"━━━━━━━━━━━━━━━\n"
             f"💡 完成后使用 /完成悬赏 领取奖励"
         )
 
     async def complete_bounty(self, player: Player) -> Tuple[bool, str]:
-        await self.db.conn.execute("BEGIN IMMEDIATE")
-        try:
-            active = await self.db.ext.get_active_bounty(player.user_id)
-            if not active:
-                await self.db.conn.rollback()
-                return False, "你当前没有进行中的悬赏任务。"
+        active = await self.db.ext.get_active_bounty(player.user_id)
+        if not active:
+            return False, "你当前没有进行中的悬赏任务。"
 
-            if int(time.time()) > active["expire_time"]:
-                await self.db.conn.execute(
-                    "UPDATE bounty_tasks SET status = 0 WHERE user_id = ? AND status = 1",
-                    (player.user_id,)
-                )
-                await self.db.conn.commit()
-                return False, "悬赏任务已超时，自动取消。"
+        if int(time.time()) > active["expire_time"]:
+            await self.db.ext.cancel_bounty(player.user_id)
+            return False, "悬赏任务已超时，自动取消。"
 
-            progress = active.get("current_progress", 0)
-            target = active.get("target_count", 1)
-            if progress < target:
-                await self.db.conn.rollback()
-                return False, (
-                    f"❌ 任务尚未完成！\n"
-                    f"任务：{active['bounty_name']}\n"
-                    f"进度：{progress}/{target}\n"
-                    f"━━━━━━━━━━━━━━━\n"
-                    f"💡 通过历练或秘境推进悬赏进度"
-                )
+        progress = active.get("current_progress", 0)
+        target = active.get("target_count", 1)
+        if progress < target:
+            return False, (
+                f"❌ 任务尚未完成！\n"
+                f"任务：{active['bounty_name']}\n"
+                f"进度：{progress}/{target}\n"
+                f"━━━━━━━━━━━━━━━\n"
+                f"💡 通过历练或秘境推进悬赏进度"
+            )
 
-            rewards = json.loads(active["rewards"])
-            stone_reward = rewards.get("stone", 0)
-            exp_reward = rewards.get("exp", 0)
+        stone_reward = active["reward_stone"]
+        exp_reward = active["reward_exp"]
 
-            await self.db.conn.execute(
-                "UPDATE bounty_tasks SET status = 2 WHERE user_id = ? AND status = 1",
-                (player.user_id,)
+        dropped_items: List[Tuple[str, int]] = []
+        if self.storage_ring_manager:
+            item_table = active["item_table"] or active.get("target_type", "gather")
+            dropped_items = await self._roll_bounty_items(player, item_table)
+        stored: List[bool] = []
+
+        # 认领、灵石修为与掉落物品在同一事务内写入，只提交一次
+        await self.db.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 以条件更新认领奖励，rowcount 为0说明已被并发请求领取或取消
+            cursor = await self.db.conn.execute(
+                "UPDATE bounty_tasks SET status = 2 WHERE id = ? AND status = 1",
+                (active["id"],)
             )
+            if cursor.rowcount == 0:
+                await self.db.conn.rollback()
+                return False, "你当前没有进行中的悬赏任务。"
 
             MAX_VALUE = 2**63 - 1
             player.gold = min(player.gold + stone_reward, MAX_VALUE)
@@ -365,38 +455,40 @@ class BountyManager:
                 "UPDATE players SET gold = ?, experience = ? WHERE user_id = ?",
                 (player.gold, player.experience, player.user_id)
             )
+            # 在事务内读取最新储物戒，放入掉落后仅写回储物戒列
+            ring_owner = await self.db.get_player_by_id(player.user_id) if dropped_items else None
+            if ring_owner:
+                stored = await self.storage_ring_manager.store_items_bulk(
+                    ring_owner, dropped_items, external_transaction=True
+                )
+                if any(stored):
+                    player.storage_ring_items = ring_owner.storage_ring_items
+                    await self.db.conn.execute(
+                        "UPDATE players SET storage_ring_items = ? WHERE user_id = ?",
+                        (ring_owner.storage_ring_items, player.user_id)
+                    )
             await self.db.conn.commit()
         except Exception:
             await self.db.conn.rollback()
             raise
 
         item_msg = ""
-        if self.storage_ring_manager:
-            try:
-                rewards = json.loads(active["rewards"])
-                item_table = rewards.get("item_table") or active.get("target_type", "gather")
-                dropped_items = await self._roll_bounty_items(player, item_table)
-                if dropped_items:
-                    lines = []
-                    for item_name, count in dropped_items:
-                        success, _ = await self.storage_ring_manager.store_item(player, item_name, count, silent=True)
-                        if success:
-                            lines.append(f"  · {item_name} x{count}")
-                        else:
-                            lines.append(f"  · {item_name} x{count}（储物戒已满，丢失）")
-                    if lines:
-                        item_msg = "\n\n📦 获得物品：\n" + "\n".join(lines)
-            except Exception:
-                logger.warning("悬赏物品奖励发放异常", exc_info=True)
-
-        rewards = json.loads(active["rewards"])
-        diff_name = rewards.get("difficulty_name", rewards.get("difficulty", "未知"))
+        lines = []
+        for (item_name, count), success in zip(dropped_items, stored):
+            if success:
+                lines.append(f"  · {item_name} x{count}")
+            else:
+                lines.append(f"  · {item_name} x{count}（储物戒已满，丢失）")
+        if lines:
+            item_msg = "\n\n📦 获得物品：\n" + "\n".join(lines)
+
+        diff_name = active["difficulty_name"] or "未知"
         return True, (
             f"✅ 悬赏完成（{diff_name}）！\n"
             f"任务：{active['bounty_name']}\n"
             f"━━━━━━━━━━━━━━━\n"
-            f"获得灵石：+{rewards.get('stone', 0):,}\n"
-            f"获得修为：+{rewards.get('exp', 0):,}{item_msg}"
+            f"获得灵石：+{stone_reward:,}\n"
+            f"获得修为：+{exp_reward:,}{item_msg}"
         )
 
     async def abandon_bounty(self, player: Player) -> Tuple[bool, str]:
@@ -404,32 +496,25 @@ class BountyManager:
         if not active:
             return False, "你当前没有进行中的悬赏任务。"
 
-        await self.db.ext.cancel_bounty(player.user_id)
         abandon_cooldown = int(time.time()) + 1800
-        await self.db.ext.set_system_config(f"bounty_abandon_cd_{player.user_id}", str(abandon_cooldown))
+        await self.db.ext.abandon_bounty(player.user_id, abandon_cooldown)
+        player.bounty_abandon_cd = abandon_cooldown
         return True, f"已放弃悬赏：{active['bounty_name']}\n⚠️ 30分钟内无法接取新悬赏"
 
     # -------- 进度与奖励 --------
 
     async def _roll_bounty_items(self, player: Player, table_name: str) -> List[Tuple[str, int]]:
-        dropped_items: List[Tuple[str, int]] = []
-        drop_table = self.item_tables.get(table_name, self.item_tables.get("gather", []))
-        if not drop_table or random.randint(1, 100) > 70:
-            return dropped_items
-
-        total_weight = sum(item["weight"] for item in drop_table)
-        roll = random.randint(1, total_weight)
-        upto = 0
-        chosen = drop_table[0]
-        for item in drop_table:
-            upto += item["weight"]
-            if roll <= upto:
-                chosen = item
-                break
-
-        count = random.randint(chosen["min"], chosen["max"])
-        dropped_items.append((chosen["name"], count))
-        return dropped_items
+        # 70% 概率掉落；先掷概率，未掉落时不再查表
+        if _rng.random() >= 0.7:
+            return []
+        if table_name not in self.item_tables:
+            table_name = "gather"
+        alias_table = self._item_alias_tables.get(table_name)
+        if not alias_table:
+            return []
+
+        chosen = sample_alias(alias_table, _rng)
+        return [(chosen["name"], _rng.randint(chosen["min"], chosen["max"]))]
 
     async def add_bounty_progress(self, player: Player, activity_tag: str, count: int = 1) -> Tuple[bool, str]:
         """根据活动标签推进悬赏"""
@@ -440,55 +525,58 @@ class BountyManager:
         if not activity_tag:
             return False, ""
 
-        await self.db.conn.execute("BEGIN IMMEDIATE")
-        try:
-            active = await self.db.ext.get_active_bounty(player.user_id)
-            if not active:
-                await self.db.conn.rollback()
-                return False, ""
-
-            if int(time.time()) > active["expire_time"]:
-                await self.db.conn.rollback()
-                return False, ""
-
-            rewards_data = {}
-            try:
-                rewards_data = json.loads(active["rewards"])
-            except Exception:
-                rewards_data = {}
+        now = int(time.time())
+        active = await self.db.ext.get_active_bounty(player.user_id)
+        if not active or now > active["expire_time"]:
+            return False, ""
 
-            template = self.templates_by_id.get(active["bounty_id"])
-            if template:
-                allowed_tags = template.get("progress_tags", [])
-            else:
-                allowed_tags = [str(tag).lower() for tag in rewards_data.get("progress_tags", [])]
+        template = self.templates_by_id.get(active["bounty_id"])
+        if template:
+            allowed_tags = template["_progress_tags_set"]
+        else:
+            # 模板已下线的旧悬赏，使用任务记录中的标签
+            allowed_tags = active["progress_tags"].split(",")
 
-            if activity_tag not in allowed_tags:
-                await self.db.conn.rollback()
-                return False, ""
+        if activity_tag not in allowed_tags:
+            return False, ""
 
-            progress = active.get("current_progress", 0)
-            target = active.get("target_count", 1)
-            if progress >= target:
-                await self.db.conn.rollback()
-                return False, ""
+        progress = active.get("current_progress", 0)
+        target = active.get("target_count", 1)
+        if progress >= target:
+            return False, ""
 
-            new_progress = min(target, progress + count)
-            await self.db.conn.execute(
-                "UPDATE bounty_tasks SET current_progress = ? WHERE user_id = ? AND status = 1 AND current_progress = ?",
-                (new_progress, player.user_id, progress)
+        # 进度在SQL中累加并封顶，过期/已完成由WHERE条件过滤，无需显式事务
+        try:
+            cursor = await self.db.conn.execute(
+                """
+                UPDATE bounty_tasks
+                SET current_progress = MIN(target_count, current_progress + ?)
+                WHERE id = ? AND status = 1 AND current_progress < target_count AND expire_time >= ?
+                """,
+                (count, active["id"], now)
             )
             await self.db.conn.commit()
-
-            if new_progress >= target:
-                return True, f"\n\n📜 悬赏【{active['bounty_name']}】已完成！使用 /完成悬赏 领取奖励"
-            return True, f"\n\n📜 悬赏进度：{new_progress}/{target}"
         except Exception:
             await self.db.conn.rollback()
             raise
+        if cursor.rowcount == 0:
+            return False, ""
+
+        new_progress = min(target, progress + count)
+        if new_progress >= target:
+            return True, f"\n\n📜 悬赏【{active['bounty_name']}】已完成！使用 /完成悬赏 领取奖励"
+        return True, f"\n\n📜 悬赏进度：{new_progress}/{target}"
 
     async def check_and_expire_bounties(self) -> int:
         now = int(time.time())
+        await self.db.ext.ensure_bounty_tables()
+        # 先用部分索引探测，没有过期悬赏时不占用写锁也不提交
+        async with self.db.conn.execute(
+            "SELECT 1 FROM bounty_tasks WHERE status = 1 AND expire_time < ? LIMIT 1",
+            (now,)
+        ) as cursor:
+            if await cursor.fetchone() is None:
+                return 0
         cursor = await self.db.conn.execute(
             "UPDATE bounty_tasks SET status = 3 WHERE status = 1 AND expire_time < ?",
             (now,)
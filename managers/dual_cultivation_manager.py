@@ -1,8 +1,9 @@
 # managers/dual_cultivation_manager.py
 """双修系统管理器"""
+import heapq
 import time
 import json
-from typing import Tuple, Optional, Dict
+from typing import Tuple, Optional, Dict, List, Sequence, Set
 from ..data import DataBase
 from ..models import Player
 from ..models_extended import UserStatus
@@ -21,11 +22,29 @@ class DualCultivationManager:
     
     def __init__(self, db: DataBase):
         self.db = db
+        # 已创建请求的过期时间小顶堆：(过期时间, 请求ID)
+        # 初始哨兵保证启动后首次访问时清理一次重启前遗留的过期请求
+        self._expiry_heap: List[Tuple[int, int]] = [(0, 0)]
+        # 已确认在 dual_cultivation 表中有记录的用户，写入冷却时可直接 UPDATE
+        self._known_dual_users: Set[str] = set()
     
-    async def _create_request(self, from_id: str, from_name: str, target_id: str) -> int:
+    async def _prune_expired_requests(self, now: int):
+        """清理过期请求：仅当堆顶请求已过期时才执行删除，避免每次查询都写库"""
+        heap = self._expiry_heap
+        if not heap or heap[0][0] >= now:
+            return
+        while heap and heap[0][0] < now:
+            heapq.heappop(heap)
+        await self.db.conn.execute(
+            "DELETE FROM dual_cultivation_requests WHERE expires_at < ?",
+            (now,)
+        )
+        await self.db.conn.commit()
+    
+    async def _create_request(self, from_id: str, from_name: str, target_id: str, now: int) -> int:
         """创建双修请求（持久化到数据库）"""
-        now = int(time.time())
         expires_at = now + DUAL_CULT_REQUEST_EXPIRE
+        await self._prune_expired_requests(now)
         
         # 先清理该目标的旧请求
         await self.db.conn.execute(
@@ -44,18 +63,14 @@ class DualCultivationManager:
         
         async with self.db.conn.execute("SELECT last_insert_rowid()") as cursor:
             row = await cursor.fetchone()
-            return row[0] if row else 0
+            request_id = row[0] if row else 0
+        heapq.heappush(self._expiry_heap, (expires_at, request_id))
+        return request_id
     
-    async def _get_pending_request(self, target_id: str) -> Optional[Dict]:
+    async def _get_pending_request(self, target_id: str, now: int) -> Optional[Dict]:
         """获取待处理的双修请求"""
-        now = int(time.time())
-        
-        # 清理过期请求
-        await self.db.conn.execute(
-            "DELETE FROM dual_cultivation_requests WHERE expires_at < ?",
-            (now,)
-        )
-        await self.db.conn.commit()
+        # 清理过期请求（查询本身已按过期时间过滤，清理仅用于控制表大小）
+        await self._prune_expired_requests(now)
         
         async with self.db.conn.execute(
             """
@@ -78,13 +93,14 @@ class DualCultivationManager:
                 }
             return None
     
-    async def _delete_request(self, request_id: int):
-        """删除双修请求"""
+    async def _delete_request(self, request_id: int, commit: bool = True):
+        """删除双修请求（commit为False时由调用方负责提交事务）"""
         await self.db.conn.execute(
             "DELETE FROM dual_cultivation_requests WHERE id = ?",
             (request_id,)
         )
-        await self.db.conn.commit()
+        if commit:
+            await self.db.conn.commit()
     
     async def send_request(self, initiator: Player, target_id: str) -> Tuple[bool, str]:
         """发起双修请求"""
@@ -112,15 +128,18 @@ class DualCultivationManager:
         if target_cd and target_cd.type != UserStatus.IDLE:
             return False, "❌ 对方正忙，无法接受双修请求。"
         
+        # 双方冷却一次查询读取
+        last_duals = await self._get_last_dual_times(initiator.user_id, target_id)
+        last_dual = last_duals.get(initiator.user_id)
+        target_last_dual = last_duals.get(target_id)
+        
         # 检查发起者冷却
-        last_dual = await self._get_last_dual_time(initiator.user_id)
         now = int(time.time())
         if last_dual and (now - last_dual) < DUAL_CULT_COOLDOWN:
             remaining = DUAL_CULT_COOLDOWN - (now - last_dual)
             return False, f"❌ 双修冷却中，还需 {remaining // 60} 分钟。"
 
         # 检查目标冷却
-        target_last_dual = await self._get_last_dual_time(target_id)
         if target_last_dual and (now - target_last_dual) < DUAL_CULT_COOLDOWN:
             remaining = DUAL_CULT_COOLDOWN - (now - target_last_dual)
             return False, f"❌ 对方正在双修冷却，还需 {remaining // 60} 分钟。"
@@ -129,7 +148,8 @@ class DualCultivationManager:
         await self._create_request(
             initiator.user_id,
             initiator.user_name or initiator.user_id[:8],
-            target_id
+            target_id,
+            now
         )
         
         return True, (
@@ -140,7 +160,9 @@ class DualCultivationManager:
     
     async def accept_request(self, acceptor: Player) -> Tuple[bool, str]:
         """接受双修请求"""
-        request = await self._get_pending_request(acceptor.user_id)
+        # 请求有效期、冷却判断与冷却记录使用同一时间点
+        now = int(time.time())
+        request = await self._get_pending_request(acceptor.user_id, now)
         if not request:
             return False, "❌ 没有待处理的双修请求。"
         
@@ -155,16 +177,15 @@ class DualCultivationManager:
             await self._delete_request(request["id"])
             return False, f"❌ 双方修为差距已超过限制，双修取消。"
         
-        now = int(time.time())
-
-        # 检查双方冷却时间（防止请求期间冷却尚未结束）
-        acceptor_last_dual = await self._get_last_dual_time(acceptor.user_id)
+        # 检查双方冷却时间（防止请求期间冷却尚未结束），一次查询读取
+        last_duals = await self._get_last_dual_times(acceptor.user_id, initiator.user_id)
+        acceptor_last_dual = last_duals.get(acceptor.user_id)
         if acceptor_last_dual and (now - acceptor_last_dual) < DUAL_CULT_COOLDOWN:
             await self._delete_request(request["id"])
             remaining = DUAL_CULT_COOLDOWN - (now - acceptor_last_dual)
             return False, f"❌ 你的双修冷却中，还需 {remaining // 60} 分钟。"
 
-        initiator_last_dual = await self._get_last_dual_time(initiator.user_id)
+        initiator_last_dual = last_duals.get(initiator.user_id)
         if initiator_last_dual and (now - initiator_last_dual) < DUAL_CULT_COOLDOWN:
             await self._delete_request(request["id"])
             remaining = DUAL_CULT_COOLDOWN - (now - initiator_last_dual)
@@ -174,18 +195,22 @@ class DualCultivationManager:
         init_exp_gain = int(acceptor.experience * DUAL_CULT_EXP_BONUS)
         accept_exp_gain = int(initiator.experience * DUAL_CULT_EXP_BONUS)
         
-        # 应用收益
+        # 应用收益、记录冷却、清除请求在同一事务内完成，只提交一次
+        # （同一连接上的写入会被串行执行，并发提交并无收益）
         initiator.experience += init_exp_gain
         acceptor.experience += accept_exp_gain
-        await self.db.update_player(initiator)
-        await self.db.update_player(acceptor)
-        
-        # 记录冷却
-        await self._set_last_dual_time(initiator.user_id, now)
-        await self._set_last_dual_time(acceptor.user_id, now)
-        
-        # 清除请求
-        await self._delete_request(request["id"])
+        await self.db.conn.execute("BEGIN IMMEDIATE")
+        try:
+            await self.db.update_player(initiator, commit=False)
+            await self.db.update_player(acceptor, commit=False)
+            await self._set_last_dual_times(
+                ((initiator.user_id, now), (acceptor.user_id, now)), commit=False
+            )
+            await self._delete_request(request["id"], commit=False)
+            await self.db.conn.commit()
+        except Exception:
+            await self.db.conn.rollback()
+            raise
         
         return True, (
             f"💕 双修成功！\n"
@@ -199,7 +224,7 @@ class DualCultivationManager:
     
     async def reject_request(self, rejecter_id: str) -> Tuple[bool, str]:
         """拒绝双修请求"""
-        request = await self._get_pending_request(rejecter_id)
+        request = await self._get_pending_request(rejecter_id, int(time.time()))
         if not request:
             return False, "❌ 没有待处理的双修请求。"
         
@@ -208,23 +233,41 @@ class DualCultivationManager:
         
         return True, f"已拒绝【{from_name}】的双修请求。"
     
-    async def _get_last_dual_time(self, user_id: str) -> Optional[int]:
-        """获取上次双修时间"""
+    async def _get_last_dual_times(self, *user_ids: str) -> Dict[str, int]:
+        """批量获取上次双修时间，返回 {用户ID: 时间戳}，无记录的用户不在结果中"""
+        placeholders = ", ".join("?" * len(user_ids))
         async with self.db.conn.execute(
-            "SELECT last_dual_time FROM dual_cultivation WHERE user_id = ?",
-            (user_id,)
+            f"SELECT user_id, last_dual_time FROM dual_cultivation WHERE user_id IN ({placeholders})",
+            user_ids
         ) as cursor:
-            row = await cursor.fetchone()
-            return row[0] if row else None
+            rows = await cursor.fetchall()
+        result = {row[0]: row[1] for row in rows}
+        self._known_dual_users.update(result)
+        return result
     
-    async def _set_last_dual_time(self, user_id: str, timestamp: int):
-        """设置上次双修时间"""
-        await self.db.conn.execute(
-            """
-            INSERT INTO dual_cultivation (user_id, last_dual_time)
-            VALUES (?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET last_dual_time = excluded.last_dual_time
-            """,
-            (user_id, timestamp)
-        )
-        await self.db.conn.commit()
+    async def _set_last_dual_times(self, pairs: Sequence[Tuple[str, int]], commit: bool = True):
+        """批量设置上次双修时间，pairs 为 (用户ID, 时间戳)（commit为False时由调用方负责提交事务）"""
+        known = self._known_dual_users
+        updates = [(ts, user_id) for user_id, ts in pairs if user_id in known]
+        upserts = [(user_id, ts) for user_id, ts in pairs if user_id not in known]
+        if updates:
+            # 已有记录的用户（常见情形）直接更新，无需走冲突处理
+            cursor = await self.db.conn.executemany(
+                "UPDATE dual_cultivation SET last_dual_time = ? WHERE user_id = ?",
+                updates
+            )
+            if cursor.rowcount != len(updates):
+                # 记录已被外部删除，退回 UPSERT（对已更新的行是幂等的）
+                upserts.extend((user_id, ts) for ts, user_id in updates)
+        if upserts:
+            await self.db.conn.executemany(
+                """
+                INSERT INTO dual_cultivation (user_id, last_dual_time)
+                VALUES (?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET last_dual_time = excluded.last_dual_time
+                """,
+                upserts
+            )
+            known.update(user_id for user_id, _ in upserts)
+        if commit:
+            await self.db.conn.commit()
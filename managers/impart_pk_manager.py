@@ -1,7 +1,8 @@
 # managers/impart_pk_manager.py
 """传承PK系统管理器"""
 import random
-from typing import Tuple
+import time
+from typing import Tuple, Dict
 from ..data import DataBase
 from ..models import Player
 from ..core.battle_manager import BattleManager
@@ -11,6 +12,9 @@ from ..config_manager import ConfigManager
 
 __all__ = ["ImpartPkManager"]
 
+# 传承排行榜缓存有效期（秒）
+_RANKING_CACHE_TTL = 30.0
+
 
 class ImpartPkManager:
     """传承PK管理器 - 玩家间争夺传承的战斗"""
@@ -22,6 +26,8 @@ class ImpartPkManager:
         self.config_manager = config_manager
         self.equipment_mgr = equipment_mgr
         self.skill_mgr = skill_mgr
+        # 传承排行榜缓存：limit -> (生成时间, 排行数据)
+        self._ranking_cache: Dict[int, Tuple[float, list]] = {}
     
     async def challenge_impart(self, attacker: Player, defender: Player) -> Tuple[bool, str, dict]:
         """发起传承挑战
@@ -70,6 +76,8 @@ class ImpartPkManager:
                 defender_impart.impart_atk_per -= loss
                 await self.db.ext.update_impart_info(defender_impart)
                 rewards["defender_loss"] = loss
+            # 传承加成已变化，排行榜需重新生成
+            self._ranking_cache.clear()
         else:
             # 失败惩罚：损失修为
             exp_loss = int(attacker.experience * 0.01)  # 1%
@@ -80,29 +88,34 @@ class ImpartPkManager:
         return attacker_wins, battle_log, rewards
     
     async def get_impart_ranking(self, limit: int = 10) -> list:
-        """获取传承排行榜"""
-        # 查询所有传承数据，按攻击加成排序
+        """获取传承排行榜（短时缓存，其他途径的传承变化在缓存过期后体现）"""
+        cached = self._ranking_cache.get(limit)
+        if cached and time.monotonic() - cached[0] < _RANKING_CACHE_TTL:
+            return cached[1]
+        
+        # 联表查询传承数据与玩家名称，按攻击加成排序；无对应玩家的传承记录不上榜
         async with self.db.conn.execute(
             """
-            SELECT user_id, impart_hp_per, impart_mp_per, impart_atk_per, 
-                   impart_know_per, impart_burst_per
-            FROM impart_info 
-            ORDER BY impart_atk_per DESC 
+            SELECT i.user_id, i.impart_atk_per,
+                   i.impart_hp_per + i.impart_mp_per + i.impart_atk_per
+                   + i.impart_know_per + i.impart_burst_per AS total_per,
+                   p.user_name
+            FROM impart_info i
+            JOIN players p ON p.user_id = i.user_id
+            ORDER BY i.impart_atk_per DESC
             LIMIT ?
             """,
             (limit,)
         ) as cursor:
             rows = await cursor.fetchall()
-            results = []
-            for row in rows:
-                user_id = row[0]
-                player = await self.db.get_player_by_id(user_id)
-                if player:
-                    total_per = row[1] + row[2] + row[3] + row[4] + row[5]
-                    results.append({
-                        "user_id": user_id,
-                        "user_name": player.user_name or user_id[:8],
-                        "atk_per": row[3],
-                        "total_per": total_per
-                    })
-            return results
+        results = [
+            {
+                "user_id": user_id,
+                "user_name": user_name or user_id[:8],
+                "atk_per": atk_per,
+                "total_per": total_per
+            }
+            for user_id, atk_per, total_per, user_name in rows
+        ]
+        self._ranking_cache[limit] = (time.monotonic(), results)
+        return results
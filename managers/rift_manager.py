@@ -5,6 +5,7 @@
 
 import random
 import time
+from itertools import accumulate
 from typing import Tuple, List, Optional, Dict, TYPE_CHECKING
 from ..data.data_manager import DataBase
 from ..models_extended import Rift, UserStatus
@@ -13,6 +14,25 @@ from ..models import Player
 if TYPE_CHECKING:
     from ..core import StorageRingManager
 
+# 未加载境界配置时使用的默认境界名称
+_DEFAULT_LEVEL_NAMES = (
+    "炼气期一层", "炼气期二层", "炼气期三层", "炼气期四层", "炼气期五层",
+    "炼气期六层", "炼气期七层", "炼气期八层", "炼气期九层", "炼气期十层",
+    "筑基期初期", "筑基期中期", "筑基期后期", "金丹期初期", "金丹期中期", "金丹期后期",
+)
+
+# 秘境探索随机事件：(描述, 物品掉落概率%)
+_RIFT_EVENTS = (
+    ("你发现了一处灵泉，修为大增！", 70),
+    ("你在秘境中击败了一只妖兽！", 80),
+    ("你找到了一个隐藏的宝箱！", 100),
+    ("你领悟了一些修炼心得。", 40),
+    ("你在秘境中遇到了前辈留下的传承！", 90),
+)
+
+# 秘境列表展示文本缓存有效期（秒），秘境表仅在迁移/管理操作时变更
+_RIFT_LIST_CACHE_TTL = 60.0
+
 
 class RiftManager:
     """秘境系统管理器"""
@@ -43,6 +63,12 @@ class RiftManager:
         ],
     }
     
+    # 掉落表的累积权重，供 random.choices 直接使用
+    RIFT_DROP_CUM_WEIGHTS = {
+        level: list(accumulate(item["weight"] for item in table))
+        for level, table in RIFT_DROP_TABLE.items()
+    }
+    
     # 秘境稀有丹药掉落表（按秘境等级分组，低概率掉落通用增益丹）
     RIFT_PILL_DROP_TABLE = {
         1: [  # 低级秘境 - 3%概率掉落
@@ -61,6 +87,11 @@ class RiftManager:
         ],
     }
     
+    RIFT_PILL_DROP_CUM_WEIGHTS = {
+        level: list(accumulate(item["weight"] for item in table))
+        for level, table in RIFT_PILL_DROP_TABLE.items()
+    }
+    
     # 秘境丹药掉落概率（百分比）
     RIFT_PILL_DROP_CHANCE = {
         1: 3,   # 低级秘境 3%
@@ -74,20 +105,33 @@ class RiftManager:
         self.storage_ring_manager = storage_ring_manager
         self.config = config_manager.rift_config if config_manager else {}
         self.explore_duration = self.config.get("default_duration", self.DEFAULT_DURATION)
+        # 境界名称缓存（level_index -> 名称），境界配置运行期间不变
+        self._level_name_cache: Dict[int, str] = {}
+        # 秘境列表展示文本缓存：(生成时间, 文本)
+        self._rift_list_cache: Optional[Tuple[float, str]] = None
+        self.db.add_rift_change_hook(self.invalidate_rift_list)
     
     def _get_level_name(self, level_index: int) -> str:
-        """获取境界名称"""
+        """获取境界名称（按境界索引缓存）"""
+        name = self._level_name_cache.get(level_index)
+        if name is None:
+            name = self._resolve_level_name(level_index)
+            self._level_name_cache[level_index] = name
+        return name
+    
+    def _resolve_level_name(self, level_index: int) -> str:
+        """从境界配置解析境界名称，未加载配置时使用默认名称"""
         if self.config_manager and hasattr(self.config_manager, 'level_data'):
             if 0 <= level_index < len(self.config_manager.level_data):
                 return self.config_manager.level_data[level_index].get("level_name", f"境界{level_index}")
-        # 默认境界名称
-        level_names = ["炼气期一层", "炼气期二层", "炼气期三层", "炼气期四层", "炼气期五层",
-                       "炼气期六层", "炼气期七层", "炼气期八层", "炼气期九层", "炼气期十层",
-                       "筑基期初期", "筑基期中期", "筑基期后期", "金丹期初期", "金丹期中期", "金丹期后期"]
-        if 0 <= level_index < len(level_names):
-            return level_names[level_index]
+        if 0 <= level_index < len(_DEFAULT_LEVEL_NAMES):
+            return _DEFAULT_LEVEL_NAMES[level_index]
         return f"境界{level_index}"
     
+    def invalidate_rift_list(self):
+        """秘境数据变更后清除秘境列表缓存"""
+        self._rift_list_cache = None
+    
     async def list_rifts(self) -> Tuple[bool, str]:
         """
         列出所有秘境
@@ -95,30 +139,34 @@ class RiftManager:
         Returns:
             (成功标志, 消息)
         """
+        cached = self._rift_list_cache
+        if cached and time.monotonic() - cached[0] < _RIFT_LIST_CACHE_TTL:
+            return True, cached[1]
+        
         rifts = await self.db.ext.get_all_rifts()
         
         if not rifts:
             return False, "❌ 当前没有开放的秘境！"
         
-        msg = "🌀 秘境列表\n"
-        msg += "━━━━━━━━━━━━━━━\n"
+        parts = ["🌀 秘境列表\n", "━━━━━━━━━━━━━━━\n"]
         
         for rift in rifts:
             rewards_dict = rift.get_rewards()
             exp_range = rewards_dict.get("exp", [0, 0])
             gold_range = rewards_dict.get("gold", [0, 0])
-            level_name = self._get_level_name(rift.required_level)
             
-            msg += f"【{rift.rift_name}】(ID:{rift.rift_id})\n"
+            parts.append(f"【{rift.rift_name}】(ID:{rift.rift_id})\n")
             if rift.required_level == 0:
-                msg += f"  等级要求：无限制\n"
+                parts.append("  等级要求：无限制\n")
             else:
-                msg += f"  等级要求：{level_name} 及以上\n"
-            msg += f"  修为奖励：{exp_range[0]:,}-{exp_range[1]:,}\n"
-            msg += f"  灵石奖励：{gold_range[0]:,}-{gold_range[1]:,}\n\n"
+                parts.append(f"  等级要求：{self._get_level_name(rift.required_level)} 及以上\n")
+            parts.append(f"  修为奖励：{exp_range[0]:,}-{exp_range[1]:,}\n")
+            parts.append(f"  灵石奖励：{gold_range[0]:,}-{gold_range[1]:,}\n\n")
         
-        msg += "💡 使用 /探索秘境 <ID> 进入（如：/探索秘境 1）"
+        parts.append("💡 使用 /探索秘境 <ID> 进入（如：/探索秘境 1）")
+        msg = "".join(parts)
         
+        self._rift_list_cache = (time.monotonic(), msg)
         return True, msg
     
     async def enter_rift(
@@ -142,10 +190,7 @@ class RiftManager:
             return False, "❌ 你还未踏入修仙之路！"
         
         # 2. 检查用户状态
-        user_cd = await self.db.ext.get_user_cd(user_id)
-        if not user_cd:
-            await self.db.ext.create_user_cd(user_id)
-            user_cd = await self.db.ext.get_user_cd(user_id)
+        user_cd = await self.db.ext.get_or_create_user_cd(user_id)
         
         if user_cd.type != UserStatus.IDLE:
             return False, f"❌ 你当前正{UserStatus.get_name(user_cd.type)}，无法探索秘境！"
@@ -219,20 +264,13 @@ class RiftManager:
             exp_reward = random.randint(1000, 5000)
             gold_reward = random.randint(500, 2000)
         
-        # 随机事件
-        events = [
-            {"desc": "你发现了一处灵泉，修为大增！", "item_chance": 70},
-            {"desc": "你在秘境中击败了一只妖兽！", "item_chance": 80},
-            {"desc": "你找到了一个隐藏的宝箱！", "item_chance": 100},
-            {"desc": "你领悟了一些修炼心得。", "item_chance": 40},
-            {"desc": "你在秘境中遇到了前辈留下的传承！", "item_chance": 90}
-        ]
-        event = random.choice(events)
+        # 随机事件（等概率，直接按下标抽取）
+        event_desc, item_chance = _RIFT_EVENTS[random.randrange(len(_RIFT_EVENTS))]
         
         # 6. 物品掉落（根据秘境等级）
         dropped_items = []
         item_msg = ""
-        dropped_items = await self._roll_rift_drops(player, rift_level, event["item_chance"])
+        dropped_items = await self._roll_rift_drops(player, rift_level, item_chance)
         if dropped_items:
             item_lines = []
             for item_name, count in dropped_items:
@@ -267,7 +305,7 @@ class RiftManager:
 🌀 探索完成 - {rift_name}
 ━━━━━━━━━━━━━━━
 
-{event["desc"]}
+{event_desc}
 
 获得修为：+{exp_reward:,}
 获得灵石：+{gold_reward:,}{item_msg}
@@ -276,7 +314,7 @@ class RiftManager:
         reward_data = {
             "exp": exp_reward,
             "gold": gold_reward,
-            "event": event["desc"],
+            "event": event_desc,
             "items": dropped_items,
             "rift_name": rift_name
         }
@@ -339,34 +377,22 @@ class RiftManager:
         dropped_items = []
         
         # 检查是否触发物品掉落
-        if random.randint(1, 100) > item_chance:
+        if random.random() * 100 >= item_chance:
             return dropped_items
         
         # 获取对应等级的掉落表
-        drop_table = self.RIFT_DROP_TABLE.get(rift_level, self.RIFT_DROP_TABLE[1])
-        
-        # 加权随机选择物品（秘境保证至少掉落1件）
-        total_weight = sum(item["weight"] for item in drop_table)
-        roll = random.randint(1, total_weight)
-        
-        current_weight = 0
-        for item in drop_table:
-            current_weight += item["weight"]
-            if roll <= current_weight:
-                count = random.randint(item["min"], item["max"])
-                dropped_items.append((item["name"], count))
-                break
-        
-        # 高级秘境有50%概率额外掉落一件
-        if rift_level >= 2 and random.randint(1, 100) <= 50:
-            roll = random.randint(1, total_weight)
-            current_weight = 0
-            for item in drop_table:
-                current_weight += item["weight"]
-                if roll <= current_weight:
-                    count = random.randint(item["min"], item["max"])
-                    dropped_items.append((item["name"], count))
-                    break
+        table_level = rift_level if rift_level in self.RIFT_DROP_TABLE else 1
+        drop_table = self.RIFT_DROP_TABLE[table_level]
+        cum_weights = self.RIFT_DROP_CUM_WEIGHTS[table_level]
+        
+        # 加权随机选择物品（秘境保证至少掉落1件），高级秘境有50%概率额外掉落一件
+        rolls = 1
+        if rift_level >= 2 and random.random() < 0.5:
+            rolls = 2
+        
+        for item in random.choices(drop_table, cum_weights=cum_weights, k=rolls):
+            count = random.randint(item["min"], item["max"])
+            dropped_items.append((item["name"], count))
         
         # 稀有丹药掉落检测
         pill_drops = self._roll_pill_drops(rift_level)
@@ -385,28 +411,20 @@ class RiftManager:
         Returns:
             掉落丹药列表 [(丹药名, 数量), ...]
         """
-        dropped_pills = []
-        
         # 获取丹药掉落概率
         pill_chance = self.RIFT_PILL_DROP_CHANCE.get(rift_level, 3)
         
         # 检查是否触发丹药掉落
-        if random.randint(1, 100) > pill_chance:
-            return dropped_pills
+        if random.random() * 100 >= pill_chance:
+            return []
         
         # 获取对应等级的丹药掉落表
-        pill_table = self.RIFT_PILL_DROP_TABLE.get(rift_level, self.RIFT_PILL_DROP_TABLE[1])
+        table_level = rift_level if rift_level in self.RIFT_PILL_DROP_TABLE else 1
         
         # 加权随机选择丹药
-        total_weight = sum(item["weight"] for item in pill_table)
-        roll = random.randint(1, total_weight)
-        
-        current_weight = 0
-        for item in pill_table:
-            current_weight += item["weight"]
-            if roll <= current_weight:
-                count = random.randint(item["min"], item["max"])
-                dropped_pills.append((item["name"], count))
-                break
-        
-        return dropped_pills
+        item = random.choices(
+            self.RIFT_PILL_DROP_TABLE[table_level],
+            cum_weights=self.RIFT_PILL_DROP_CUM_WEIGHTS[table_level],
+            k=1
+        )[0]
+        return [(item["name"], random.randint(item["min"], item["max"]))]
@@ -486,10 +486,7 @@ class SectManager:
             return False, "❌ 你还未加入宗门！"
             
         # 检查CD
-        user_cd = await self.db.ext.get_user_cd(user_id)
-        if not user_cd:
-            await self.db.ext.create_user_cd(user_id)
-            user_cd = await self.db.ext.get_user_cd(user_id)
+        user_cd = await self.db.ext.get_or_create_user_cd(user_id)
             
         current_time = int(time.time())
         # 检查冷却时间
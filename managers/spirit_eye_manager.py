@@ -2,6 +2,8 @@
 """天地灵眼系统管理器"""
 import time
 import random
+from bisect import bisect_left
+from itertools import accumulate
 from typing import Tuple, Optional, Dict, List
 from ..data import DataBase
 from ..models import Player
@@ -16,6 +18,10 @@ SPIRIT_EYE_TYPES = {
     4: {"name": "极品灵眼", "exp_per_hour": 30000, "spawn_rate": 5},
 }
 
+# 预计算灵眼类型的累积生成概率，用于二分查找
+_SPIRIT_EYE_TYPE_IDS = tuple(SPIRIT_EYE_TYPES)
+_SPIRIT_EYE_CUM_RATES = tuple(accumulate(cfg["spawn_rate"] for cfg in SPIRIT_EYE_TYPES.values()))
+
 
 class SpiritEyeManager:
     """天地灵眼管理器"""
@@ -46,13 +52,8 @@ class SpiritEyeManager:
         """生成新灵眼（定时调用）"""
         # 随机生成灵眼类型
         roll = random.randint(1, 100)
-        eye_type = 1
-        cumulative = 0
-        for etype, config in SPIRIT_EYE_TYPES.items():
-            cumulative += config["spawn_rate"]
-            if roll <= cumulative:
-                eye_type = etype
-                break
+        idx = bisect_left(_SPIRIT_EYE_CUM_RATES, roll)
+        eye_type = _SPIRIT_EYE_TYPE_IDS[idx] if idx < len(_SPIRIT_EYE_TYPE_IDS) else 1
         
         config = SPIRIT_EYE_TYPES[eye_type]
         
@@ -152,19 +152,16 @@ class Player:
     learned_skills: str = "[]"  # 已学会的技能ID列表（JSON字符串）
     equipped_skills: str = "[]"  # 已装备的技能ID列表（JSON字符串，最多2个）
 
+    # 悬赏系统字段
+    bounty_abandon_cd: int = 0  # 放弃悬赏后的冷却截止时间（Unix时间戳，0表示无冷却）
+
     def get_level(self, config_manager: "ConfigManager") -> str:
         """获取境界名称"""
-        level_data = config_manager.get_level_data(self.cultivation_type)
-        if 0 <= self.level_index < len(level_data):
-            return level_data[self.level_index]["level_name"]
-        return "未知境界"
+        return config_manager.get_level_name(self.level_index, self.cultivation_type)
 
     def get_required_exp(self, config_manager: "ConfigManager") -> int:
         """获取突破到下一境界所需的总修为"""
-        level_data = config_manager.get_level_data(self.cultivation_type)
-        if self.level_index + 1 < len(level_data):
-            return level_data[self.level_index + 1].get("exp_needed", 0)
-        return 0
+        return config_manager.get_required_exp(self.level_index, self.cultivation_type)
 
     def get_techniques_list(self) -> List[str]:
         """获取功法列表"""
@@ -243,18 +240,13 @@ class Player:
         """设置已装备的技能ID列表"""
         self.equipped_skills = json.dumps(skills, ensure_ascii=False)
 
-    def get_total_attributes(self, equipped_items: List[Item], pill_multipliers: Optional[dict] = None) -> dict:
-        """计算包含装备加成和丹药效果的总属性
-
-        Args:
-            equipped_items: 已装备的物品列表
-            pill_multipliers: 丹药属性倍率（可选）
+    def get_base_attributes(self) -> dict:
+        """获取不含装备和丹药加成的基础属性
 
         Returns:
-            包含所有属性的字典
+            与 get_total_attributes 结构相同的属性字典
         """
-        # 基础属性
-        total = {
+        return {
             "spiritual_qi": self.spiritual_qi,
             "max_spiritual_qi": self.max_spiritual_qi,
             "blood_qi": self.blood_qi,
@@ -275,6 +267,19 @@ class Player:
             "dodge_rate": self.dodge_rate,
         }
 
+    def get_total_attributes(self, equipped_items: List[Item], pill_multipliers: Optional[dict] = None) -> dict:
+        """计算包含装备加成和丹药效果的总属性
+
+        Args:
+            equipped_items: 已装备的物品列表
+            pill_multipliers: 丹药属性倍率（可选）
+
+        Returns:
+            包含所有属性的字典
+        """
+        # 基础属性
+        total = self.get_base_attributes()
+
         # 叠加装备属性
         for item in equipped_items:
             total["magic_damage"] += item.magic_damage
@@ -1,3 +1,4 @@
-from .config_loader import ConfigLoader
+from .config_loader import ConfigLoader, load_json_cached
+from .sampling import build_alias_table, sample_alias
 
-__all__ = ["ConfigLoader"]
+__all__ = ["ConfigLoader", "load_json_cached", "build_alias_table", "sample_alias"]
@@ -1,8 +1,19 @@
 # utils/config_loader.py
+import functools
 import json
 import os
 from typing import Dict, Any
 
+
+@functools.lru_cache(maxsize=8)
+def load_json_cached(path: str, mtime_ns: int) -> Dict[str, Any]:
+    """解析JSON配置文件；以 (路径, 修改时间ns) 为键在所有调用方间共享，文件变更后自动失效
+
+    返回的对象由所有调用方共享，调用方需只读使用或自行拷贝
+    """
+    with open(path, "rb") as f:
+        return json.loads(f.read())
+
 class ConfigLoader:
     """通用配置加载器"""
     
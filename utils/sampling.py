@@ -0,0 +1,34 @@
+# utils/sampling.py
+"""加权随机抽样工具（Vose 别名法）"""
+
+import random
+from typing import Optional, Sequence
+
+
+def build_alias_table(entries: Sequence, weights: Sequence[float]) -> Optional[tuple]:
+    """使用 Vose 别名法构建加权抽样表，返回 (entries, prob, alias)；总权重非正时返回 None"""
+    n = len(entries)
+    total = sum(weights)
+    if n == 0 or total <= 0:
+        return None
+
+    scaled = [w * n / total for w in weights]
+    prob = [1.0] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] += scaled[s] - 1.0
+        (small if scaled[l] < 1.0 else large).append(l)
+    return tuple(entries), prob, alias
+
+
+def sample_alias(table: tuple, rng: random.Random):
+    """从别名表中 O(1) 抽取一个条目"""
+    entries, prob, alias = table
+    i = rng.randrange(len(entries))
+    return entries[i] if rng.random() < prob[i] else entries[alias[i]]